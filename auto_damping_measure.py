@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+auto_damping_measure.py
+
+功能：
+1. 无人值守的阻尼扫描：由脚本控制的激励源以若干恒定速度推动主手末端，代替人手拖动，
+   一次运行得到 6 个方向 (X+/X-/Y+/Y-/Z+/Z-) 在各速度下的阻尼 B(v)。
+2. 激励源 (Exciter 接口: attach / start / stop / retract)：
+   - SimExciter：模拟后端 (--sim)，直接设置 sim_robot 末端速度，不启动 Teleop；
+   - ActuatorExciter：外部执行机构 (--actuator <序列号>，另一台 Flexiv 机械臂，末端与主手末端连接，
+     两者世界坐标系同向)，以 MoveL 的 vel 参数恒速推动。
+3. 每个方向：停止 Teleop，主从同步到 drag_measure 中该方向的起始姿态，启动 Teleop；
+   对每个速度：激励源恒速推动 (finalDistM + 余量)，采样与分段分析复用 drag_measure.measure_damping_in_one_direction，
+   之后激励源退回起点，进入下一个速度 (同一方向内不重启 Teleop)。
+4. 采样数据与每次运行的分段结果写入 auto_damping_<时间>.csv (每次运行结束即落盘)，
+   最后写出 扫描表 (方向, 指令速度, 平均速度, 平均力, B, N) 与 方向 x 速度 的 B 矩阵，并在控制台打印。
+5. 每个方向汇总全部速度的采样，用 friction_fit 拟合 F = B*v + Fc*sign(v) (--stribeck 可加 Stribeck 项)，
+   得到与速度无关的 B、Fc 及其置信区间；扫描表中附每次运行相对拟合模型的平均残差，用于检查模型是否适用。
+   拟合前每次运行的投影先经零相位低通 (--fit-cutoff，同 drag_measure)。
+6. 采样由 drag_measure 的 watchdog 监控 (Teleop 进程、主从与激励机构的故障/非运行状态、位移停滞，--stall/--deadline)，
+   触发后停止激励并中止扫描，原因写入 CSV。
+
+用法示例：
+    python auto_damping_measure.py --sim --velocities 0.05,0.1,0.2
+    python auto_damping_measure.py -1 Rizon4s-123456 -2 Rizon4s-123457 -p <sudo密码> --actuator Rizon4-000001
+"""
+
+import argparse
+import math
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import drag_measure as dm
+from drag_measure import DAMPING_COLUMNS, DIRECTION_CONFIG, measure_damping_in_one_direction, direction_projection
+from friction_fit import fit_friction, fit_rows, format_fit, predict
+from bootstrap_stats import bootstrap_ratio_ci, format_ci, ci_header, ci_cells
+from result_writer import ResultWriter
+from motion_timing import MotionTimeEstimator, move_and_wait
+import instrumentation as instr
+from measurement_watchdog import MeasurementAborted, add_watchdog_arguments
+from robot_daemon import connect
+import state_bus
+
+DIRECTION_ORDER = ["X+", "X-", "Y+", "Y-", "Z+", "Z-"]
+DEFAULT_VELOCITIES = "0.05,0.1,0.2,0.3"
+OVERTRAVEL_M = 0.03    # 激励行程在 finalDistM 之外的余量 (米)
+RETRACT_VEL = 0.1      # 退回起点速度 (m/s)
+SYNC_VEL_SCALE = 25
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Automated scripted-excitation damping sweep")
+    p.add_argument("-1", "--leader", help="主机械臂序列号")
+    p.add_argument("-2", "--follower", help="从机械臂序列号")
+    p.add_argument("-p", "--password", help="用于启动和停止 Teleop 程序的 sudo 密码")
+    p.add_argument("--sim", action="store_true", help="使用模拟后端 sim_robot (不启动 Teleop)")
+    p.add_argument("--actuator", help="外部执行机构 (Flexiv 机械臂) 序列号")
+    p.add_argument("--velocities", default=DEFAULT_VELOCITIES, help=f"激励速度列表 m/s (默认 {DEFAULT_VELOCITIES})")
+    p.add_argument("--directions", default=",".join(DIRECTION_ORDER), help="测量方向 (默认全部6个)")
+    p.add_argument("--settle", type=float, default=7.0, help="启动 Teleop 后的等待时间 s (默认7)")
+    p.add_argument("--stribeck", action="store_true", help="摩擦拟合中加入 Stribeck 项")
+    p.add_argument("--fit-cutoff", type=float, default=dm.fit_cutoff,
+                   help=f"摩擦拟合前零相位低通截止频率 Hz (默认 {dm.fit_cutoff:g}，0 为不滤波)")
+    add_watchdog_arguments(p)
+    state_bus.add_bus_argument(p)
+    instr.add_profile_argument(p)
+    args = p.parse_args(argv)
+    if not args.sim:
+        if not (args.leader and args.follower and args.password):
+            p.error("真机模式需要 -1 -2 -p")
+        if not args.actuator:
+            p.error("真机模式需要 --actuator 指定激励机构，或使用 --sim")
+    args.velocities = [float(v) for v in args.velocities.split(",") if v.strip()]
+    args.directions = [d.strip() for d in args.directions.split(",") if d.strip()]
+    for d in args.directions:
+        if d not in DIRECTION_CONFIG:
+            p.error(f"未知方向 {d}")
+    return args
+
+
+def quaternion_to_euler(qw, qx, qy, qz):
+    t0 = +2.0 * (qw * qx + qy * qz)
+    t1 = +1.0 - 2.0 * (qx * qx + qy * qy)
+    roll = math.atan2(t0, t1)
+
+    t2 = +2.0 * (qw * qy - qz * qx)
+    t2 = max(-1.0, min(1.0, t2))
+    pitch = math.asin(t2)
+
+    t3 = +2.0 * (qw * qz + qx * qy)
+    t4 = +1.0 - 2.0 * (qy * qy + qz * qz)
+    yaw = math.atan2(t3, t4)
+    return [math.degrees(roll), math.degrees(pitch), math.degrees(yaw)]
+
+
+# =========== 激励源 ===========
+
+class SimExciter:
+    """模拟后端：直接设置主手末端笛卡尔速度。"""
+
+    def __init__(self, robot):
+        self.robot = robot
+        self.home = None
+
+    def attach(self):
+        self.home = list(self.robot.states().tcp_pose)
+
+    def start(self, unit_dir, speed, distance):
+        self.robot.set_tcp_velocity([speed * u for u in unit_dir])
+
+    def stop(self):
+        self.robot.set_tcp_velocity([0.0] * 6)
+
+    def retract(self):
+        self.robot.set_tcp_pose(self.home)
+
+
+class ActuatorExciter:
+    """外部 Flexiv 机械臂：MoveL 以恒定 vel 沿方向推动，结束后 MoveL 退回 attach 时的位置。"""
+
+    def __init__(self, robot, rdk):
+        self.robot = robot
+        self.rdk = rdk
+        self.home = None
+
+    def attach(self):
+        self.home = list(self.robot.states().tcp_pose)
+
+    def _move_l(self, position, vel):
+        self.robot.SwitchMode(self.rdk.Mode.NRT_PRIMITIVE_EXECUTION)
+        euler = quaternion_to_euler(*self.home[3:7])
+        target = self.rdk.Coord(position, euler, ["WORLD", "WORLD_ORIGIN"])
+        self.robot.ExecutePrimitive("MoveL", {"target": target, "vel": vel})
+
+    def start(self, unit_dir, speed, distance):
+        self._move_l([self.home[i] + unit_dir[i] * distance for i in range(3)], speed)
+
+    def stop(self):
+        self.robot.Stop()
+
+    def retract(self, tol=0.002):
+        self._move_l(self.home[:3], RETRACT_VEL)
+        pos = self.robot.states().tcp_pose
+        timeout = math.dist(pos[:3], self.home[:3]) / RETRACT_VEL * 2 + 3.0
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < timeout:
+            if math.dist(self.robot.states().tcp_pose[:3], self.home[:3]) <= tol:
+                break
+            instr.sleep(0.05)
+        else:
+            print("[Exciter] 退回起点超时")
+        self.robot.Stop()
+
+
+# =========== 扫描 ===========
+
+def run_summary(chunk_info):
+    """按采样数加权合并各分段，返回 (平均速度, 平均力, B, N)。"""
+    n = sum(c[6] for c in chunk_info)
+    if n == 0:
+        return 0.0, 0.0, 0.0, 0
+    v = sum(c[3] * c[6] for c in chunk_info) / n
+    f = sum(c[4] * c[6] for c in chunk_info) / n
+    return v, f, (f / v if v > 1e-6 else 0.0), n
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.sim:
+        import sim_robot as rdk
+        leader = rdk.Robot(args.leader or "Sim-Leader")
+        follower = rdk.Robot(args.follower or "Sim-Follower")
+        exciter = SimExciter(leader)
+        exe_path = None
+    else:
+        import flexivrdk as rdk
+        dm.leader_robot_sn, dm.follower_robot_sn, dm.SUDO_PASSWORD = args.leader, args.follower, args.password
+        exe_list = dm.find_executables_in_current_dir()
+        if not exe_list:
+            print("No test_ executables found in current dir.")
+            sys.exit(1)
+        for i, (fn, _) in enumerate(exe_list):
+            print(f"  {i}: {fn}")
+        exe_path = exe_list[int(input("请选择要测试的程序序号: "))][1]
+        print("连接到 Robot...")
+        leader = connect(args.leader, rdk)
+        follower = connect(args.follower, rdk)
+        exciter = ActuatorExciter(connect(args.actuator, rdk), rdk)
+    state_bus.open_from_args(args)
+    leader = state_bus.tap(instr.instrument_robot(leader, "leader"), "leader")
+    follower = state_bus.tap(instr.instrument_robot(follower, "follower"), "follower")
+    robots = {"leader": leader, "follower": follower}
+    if not args.sim:
+        robots["actuator"] = exciter.robot
+    dm.wd.configure_from_args(args, robots).start()
+    estimators = [MotionTimeEstimator(args.leader or "Sim-Leader"), MotionTimeEstimator(args.follower or "Sim-Follower")]
+
+    def send_movej(robot, pose_deg):
+        robot.SwitchMode(rdk.Mode.NRT_PRIMITIVE_EXECUTION)
+        robot.ExecutePrimitive("MoveJ", {"target": rdk.JPos(pose_deg, [0] * 6), "jntVelScale": SYNC_VEL_SCALE})
+
+    profiler = instr.Profiler(args.profile).start()
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_name = f"auto_damping_{now_str}.csv"
+    writer = ResultWriter(csv_name)
+    writer.writerow(["Auto Damping Sweep", now_str, "sim" if args.sim else f"actuator={args.actuator}"])
+    writer.writerow(["finalDistM(cm)", f"{dm.finalDistM*100:.1f}"])
+    writer.writerow([])
+
+    stroke = dm.finalDistM + OVERTRAVEL_M
+    sweep = []  # (方向, 指令速度, 平均速度, 平均力, B, N, B 的置信区间)
+    samples = {}  # 方向 -> [(|v|, |F|)]，每次运行一项
+    fits = {}
+    completed = False
+    try:
+        for dname in args.directions:
+            dcfg = DIRECTION_CONFIG[dname]
+            L = math.sqrt(sum(x * x for x in dcfg["vector"]))
+            unit_dir = [x / L for x in dcfg["vector"]]
+            print(f"\n========== 方向 {dname} ===========")
+            if exe_path:
+                dm.stop_teleop()
+            move_and_wait([leader, follower], estimators, dcfg["jpos_start_deg"], SYNC_VEL_SCALE, send_movej)
+            leader.Stop()
+            follower.Stop()
+            exciter.attach()
+            if exe_path:
+                dm.start_teleop(exe_path)
+                time.sleep(args.settle)
+
+            for speed in args.velocities:
+                print(f"[{dname}] 激励速度 {speed:.3f} m/s")
+                writer.writerow([f"Direction={dname}", f"CmdVel={speed}"])
+                writer.writerow(list(DAMPING_COLUMNS))
+                exciter.start(unit_dir, speed, stroke)
+                try:
+                    _, data_recs, chunk_info = measure_damping_in_one_direction(
+                        leader, dname, dcfg["vector"], writer, timeout_s=stroke / speed * 2 + 5.0)
+                finally:
+                    exciter.stop()
+                v, f, b, n = run_summary(chunk_info)
+                used = [c for c in chunk_info if c[6] > 0]
+                b_ci = bootstrap_ratio_ci([c[4] * c[6] for c in used], [c[3] * c[6] for c in used])
+                print(f"[{dname} v={speed}] B = {format_ci(b_ci)}")
+                samples.setdefault(dname, []).append(direction_projection(data_recs, dcfg["vector"], args.fit_cutoff))
+                sweep.append((dname, speed, v, f, b, n, b_ci))
+                writer.writerow([])
+                writer.writerow(["ChunkIndex","DistStart_m","DistEnd_m","avgV","avgF","Bchunk","N"])
+                for idx, ds, de, avV, avF, bc, nm in chunk_info:
+                    writer.writerow([idx, f"{ds:.3f}", f"{de:.3f}", f"{avV:.4f}", f"{avF:.4f}", f"{bc:.4f}", nm])
+                writer.writerow(["B_run", f"{b:.4f}"])
+                writer.writerow([])
+                writer.mark_trial_done()
+                exciter.retract()
+            if exe_path:
+                dm.stop_teleop()
+            runs = samples.get(dname, [])
+            fits[dname] = fit_friction(np.concatenate([r[0] for r in runs]), np.concatenate([r[1] for r in runs]),
+                                       stribeck=args.stribeck) if runs else None
+            print(f"[{dname}] friction fit: {format_fit(fits[dname])}")
+
+        writer.writerow(["SweepResults"])
+        writer.writerow(["Direction","CmdVel(m/s)","MeanV(m/s)","MeanF(N)","B(N*s/m)"] +
+                        ci_header("B ", with_n=False) + ["N","FitResidual(N)"])
+        run_index = {}
+        for dname, speed, v, f, b, n, b_ci in sweep:
+            k = run_index[dname] = run_index.get(dname, -1) + 1
+            resid = ""
+            if fits[dname] is not None and samples[dname][k][0].size:
+                rv, rf = samples[dname][k]
+                resid = f"{float(np.mean(rf - predict(fits[dname], rv))):.4f}"
+            writer.writerow([dname, speed, f"{v:.4f}", f"{f:.4f}", f"{b:.4f}"] + ci_cells(b_ci, with_n=False) +
+                            [n, resid])
+        writer.writerow([])
+        writer.writerow(["B matrix"] + [f"v={s}" for s in args.velocities])
+        print("\n========== B(v) (N*s/m) ===========")
+        print(f"{'':<6}" + "".join(f"{s:>10.3f}" for s in args.velocities))
+        for dname in args.directions:
+            row = [r[4] for r in sweep if r[0] == dname]
+            writer.writerow([dname] + [f"{b:.4f}" for b in row])
+            print(f"{dname:<6}" + "".join(f"{b:>10.3f}" for b in row))
+        writer.writerow([])
+        print("\n========== 摩擦模型拟合 ===========")
+        for dname in args.directions:
+            writer.writerows(fit_rows(dname, fits[dname]))
+            print(f"{dname:<6}{format_fit(fits[dname])}")
+        completed = True
+    except MeasurementAborted as e:
+        print(f"\n[Watchdog] 扫描中止: {e.reason} ({e.detail})")
+        writer.writerow(["Aborted", e.reason, e.detail])
+    finally:
+        dm.wd.stop()
+        if exe_path:
+            dm.stop_teleop()
+        saved = writer.close(complete=completed)
+        print(f"数据已写入 {saved}")
+        profiler.stop(saved)
+        instr.write_report(saved)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_analysis.py
+
+功能：
+1. 各测量脚本的分析部分，作为对已记录数据的纯函数 (只依赖 numpy 与本仓库的分析模块，不导入 flexivrdk、不访问机器人)；
+   测量脚本在采集后调用同一函数，reanalyze.py 对归档的记录离线重新分析，参数相同则结果一致。
+   data 参数均为"按列名取一维数组"的对象：SampleBuffer，或 {列名: np.ndarray} 字典。
+2. 阻尼 (drag_measure / auto_damping_measure)：direction_projection 速度/外力沿方向投影；
+   chunk_damping 按位移分段 (默认 5cm) 计算 Bchunk = avgF / avgV 与 B_dir (Bchunk > 0 的段平均)。
+3. 跟踪刚度 (tracking_stiffness_measure)：segment_stiffness 单段主从插值到同一网格后的 K = 平均 F_slave / 平均 Δ；
+   is_stable 连续段刚度的稳定判据；stiffness_from_samples 对一次测试的全部采样按时间重新分段并找第一个稳定窗口，
+   可选 filter_cutoff 由原始列重新做与在线相同的流式滤波。
+4. 透明度 (transparency_measure)：wrench_arrays / force_lag 保持区间的对齐与时延；
+   staircase_results 阶梯记录的平台分割、逐档位透明度与时延 (差分互相关)。
+5. 最大接触力误差 (maxcontactwrench_error_measure)：contact_error 有效区间 (可去掉开头 trim_s 秒) 的平均从侧力与误差。
+6. ANALYSIS_VERSION 标识分析算法版本，算法改变时递增；reanalyze.py 以其与参数一起命名输出文件。
+"""
+
+import math
+
+import numpy as np
+
+from timebase import align, estimate_delay, median_interval
+from signal_filter import Biquad, FilterChain, SpikeRejector, filtfilt
+from wrench_analysis import WRENCH_AXES, parse_axis, analyze
+from plateau_detect import find_plateaus, longest_per_level
+
+ANALYSIS_VERSION = 2
+
+# ---------- 阻尼 ----------
+
+START_DIST = 0.05    # 开始分段的位移 (m)
+FINAL_DIST = 0.30    # 结束位移 (m)
+CHUNK_M = 0.05       # 分段宽度 (m)
+
+
+def direction_vector(axis):
+    """'X+' -> (1, 0, 0)。"""
+    idx, sign = parse_axis(axis)
+    vec = [0.0, 0.0, 0.0]
+    vec[idx] = sign
+    return tuple(vec)
+
+
+def direction_projection(data_records, dir_vec, cutoff_hz=0.0):
+    """
+    返回 (|v|, |F|)：各采样速度与外力在 dir_vec 方向上投影的绝对值。
+    cutoff_hz > 0 且采样率足够时，投影先经零相位低通 (采样率由 time_s 的采样间隔中位数估计)。
+    """
+    L = math.sqrt(dir_vec[0]**2 + dir_vec[1]**2 + dir_vec[2]**2)
+    ux, uy, uz = dir_vec[0]/L, dir_vec[1]/L, dir_vec[2]/L
+    vdir = data_records["vx"]*ux + data_records["vy"]*uy + data_records["vz"]*uz
+    fdir = data_records["fx"]*ux + data_records["fy"]*uy + data_records["fz"]*uz
+    if cutoff_hz > 0 and len(vdir) > 1:
+        fs = 1.0 / median_interval(data_records["time_s"])
+        if fs > 2 * cutoff_hz:
+            vdir, fdir = filtfilt(np.column_stack([vdir, fdir]), cutoff_hz, fs).T
+    return np.abs(vdir), np.abs(fdir)
+
+
+def chunk_damping(data_records, dir_vec, start_dist=START_DIST, final_dist=FINAL_DIST, chunk_m=CHUNK_M):
+    """
+    分段计算 B，返回 (B_dir, chunks)；chunks 每项为 (段号, 起始位移, 结束位移, avgV, avgF, Bchunk, N)。
+    采样少于 5 条时返回 (0.0, [])。
+    """
+    if len(data_records["time_s"]) < 5:
+        return 0.0, []
+    n_chunks = int(math.floor((final_dist - start_dist) / chunk_m + 1e-9))
+    vdir, fdir = direction_projection(data_records, dir_vec)
+    chunk_idx = np.floor((data_records["dist_abs"] - start_dist) / chunk_m).astype(int)
+    chunks = []
+    valid = []
+    for i in range(n_chunks):
+        ds = start_dist + chunk_m * i
+        de = ds + chunk_m
+        mask = chunk_idx == i
+        N = int(np.count_nonzero(mask))
+        if N == 0:
+            chunks.append((i, ds, de, 0.0, 0.0, 0.0, 0))
+            continue
+        avgV = float(vdir[mask].mean())
+        avgF = float(fdir[mask].mean())
+        bc = avgF / avgV if avgV >= 1e-6 else 0.0
+        chunks.append((i, ds, de, avgV, avgF, bc, N))
+        if bc > 0 and avgV > 1e-6:
+            valid.append(bc)
+    return (sum(valid) / len(valid) if valid else 0.0), chunks
+
+
+# ---------- 跟踪刚度 ----------
+
+SEGMENT_DURATION = 0.1   # 段时长 (秒)
+STABLE_COUNT = 20        # 连续稳定段数
+MIN_STIFFNESS = 10.0     # 段刚度下限
+MAX_FLUCTUATION = 20.0   # 连续段刚度最大-最小之差上限
+SPIKE_WINDOW = 5         # 尖峰剔除窗口 (采样数)
+
+
+def segment_stiffness(t_leader, master_pos, t_follower, slave_pos, F_slave):
+    """单段刚度：返回 (K_seg, 平均 Δ)。主从两路插值到同一网格，无重叠时按采样直接相减。"""
+    grid, master_g, slave_g = align(t_leader, master_pos, t_follower, np.column_stack([slave_pos, F_slave]))
+    if grid.size:
+        avg_delta = float((slave_g[:, 0] - master_g).mean())
+        avg_F = float(slave_g[:, 1].mean())
+    else:
+        avg_delta = float((np.asarray(slave_pos) - np.asarray(master_pos)).mean())
+        avg_F = float(np.mean(F_slave))
+    K = avg_F / avg_delta if abs(avg_delta) >= 1e-6 else float("inf")
+    return K, avg_delta
+
+
+def is_stable(window, min_stiffness=MIN_STIFFNESS, max_fluctuation=MAX_FLUCTUATION):
+    """连续段刚度 window 均大于 min_stiffness 且波动 (最大-最小) 小于 max_fluctuation。"""
+    return all(v > min_stiffness for v in window) and max(window) - min(window) < max_fluctuation
+
+
+def refilter_stiffness(data, cutoff_hz, spike_window=SPIKE_WINDOW):
+    """由原始列按与在线相同的流式滤波 (Hampel + Butterworth) 重新计算 (master_f, slave_f, F_f)。"""
+    master = np.asarray(data["master_pos"], dtype=np.float64)
+    slave = np.column_stack([data["slave_pos"], data["F_slave"]])
+    if cutoff_hz <= 0 or master.size < 2:
+        return master, slave[:, 0], slave[:, 1]
+    fs = 1.0 / median_interval(data["t_follower"])
+    mf = FilterChain(SpikeRejector(spike_window, channels=1), Biquad.lowpass(cutoff_hz, fs, channels=1))
+    sf = FilterChain(SpikeRejector(spike_window, channels=2), Biquad.lowpass(cutoff_hz, fs, channels=2))
+    master_f = np.array([mf.process(x) for x in master], dtype=np.float64).reshape(-1)
+    slave_f = np.array([sf.process(tuple(x)) for x in slave], dtype=np.float64).reshape(-1, 2)
+    return master_f, slave_f[:, 0], slave_f[:, 1]
+
+
+def stiffness_from_samples(data, segment_duration=SEGMENT_DURATION, stable_count=STABLE_COUNT,
+                           min_stiffness=MIN_STIFFNESS, max_fluctuation=MAX_FLUCTUATION, filter_cutoff=None):
+    """
+    一次测试的全部采样 (列见 tracking_stiffness_measure.STIFFNESS_COLUMNS) 按 t_leader 每 segment_duration 秒分段，
+    返回 (稳定窗口平均刚度, 窗口末段平均 Δ, 段刚度列表, 稳定时刻 (秒, 自首个采样))；没有稳定窗口时刚度为 nan。
+    filter_cutoff 为 None 时使用记录的滤波列，否则由原始列重新滤波。
+    """
+    t_m = np.asarray(data["t_leader"], dtype=np.float64)
+    t_s = np.asarray(data["t_follower"], dtype=np.float64)
+    if filter_cutoff is None:
+        master_f, slave_f, F_f = data["master_pos_f"], data["slave_pos_f"], data["F_slave_f"]
+    else:
+        master_f, slave_f, F_f = refilter_stiffness(data, filter_cutoff)
+    if t_m.size == 0:
+        return float("nan"), float("nan"), [], float("nan")
+    seg = np.floor((t_m - t_m[0]) / segment_duration).astype(int)
+    edges = np.flatnonzero(np.diff(seg)) + 1
+    starts = np.concatenate(([0], edges))
+    stops = np.concatenate((edges, [seg.size]))
+    logs = []
+    for s, e in zip(starts, stops):
+        K, avg_delta = segment_stiffness(t_m[s:e], master_f[s:e], t_s[s:e], slave_f[s:e], F_f[s:e])
+        logs.append(K)
+        window = logs[-stable_count:]
+        if len(window) == stable_count and is_stable(window, min_stiffness, max_fluctuation):
+            return sum(window) / stable_count, avg_delta, logs, float(t_m[e - 1] - t_m[0])
+    return float("nan"), float("nan"), logs, float("nan")
+
+
+# ---------- 透明度 ----------
+
+LAG_DIFF_S = 0.2     # 阶梯记录估计时延时差分的时间跨度 (秒)
+
+
+def wrench_arrays(valid_data):
+    """主从两路插值到同一时间网格，返回 (grid, master, slave)，master/slave 为 len(grid) x 6 数组。"""
+    master = np.column_stack([valid_data[f"m_{a}"] for a in WRENCH_AXES])
+    slave = np.column_stack([valid_data[f"s_{a}"] for a in WRENCH_AXES])
+    return align(valid_data["t_leader"], master, valid_data["t_follower"], slave)
+
+
+def force_lag(valid_data, contact_axis):
+    """主侧接触轴力相对从侧的时延 (秒)；主侧力与从侧反向，取负后再做互相关。"""
+    name = contact_axis[0].lower()
+    return estimate_delay(valid_data["t_follower"], valid_data[f"s_F{name}"],
+                          valid_data["t_leader"], -valid_data[f"m_F{name}"])
+
+
+def hold_transparency(valid_data, contact_axis):
+    """保持区间：返回 (T_avg, WrenchTransparency, master, slave, 时延秒)；区间无法对齐时 WrenchTransparency 为 None。"""
+    idx, _ = parse_axis(contact_axis)
+    name = contact_axis[0].lower()
+    avg_m = float(np.mean(valid_data[f"m_F{name}"]))
+    avg_s = float(np.mean(valid_data[f"s_F{name}"]))
+    T_avg = -avg_m / avg_s if abs(avg_s) >= 1e-6 else float("inf")
+    _, master, slave = wrench_arrays(valid_data)
+    res = analyze(master, slave, idx) if len(master) else None
+    return T_avg, res, master, slave, force_lag(valid_data, contact_axis)
+
+
+def staircase_results(rec, contact_axis, levels, lag_diff_s=LAG_DIFF_S, **plateau_kwargs):
+    """
+    离线分割阶梯记录：返回 ({档位下标: (Plateau, WrenchTransparency, F_slave 均值, F_master 均值)}, 时延秒)。
+    plateau_kwargs 传给 plateau_detect.find_plateaus (band_min / band_rel / max_std / window_s / min_duration)。
+    """
+    idx, sign = parse_axis(contact_axis)
+    grid, master, slave = wrench_arrays(rec)
+    if grid.size == 0:
+        return {}, float("nan")
+    best = longest_per_level(find_plateaus(grid, sign * slave[:, idx], levels, **plateau_kwargs))
+    out = {}
+    for k, p in best.items():
+        m, s = master[p.start:p.stop], slave[p.start:p.stop]
+        out[k] = (p, analyze(m, s, idx), float(s[:, idx].mean()), float(m[:, idx].mean()))
+    # 阶梯记录大部分时间力几乎不变，互相关峰很宽；用 lag_diff_s 跨度的差分 (档位切换处的变化) 估计时延
+    w = max(1, int(round(lag_diff_s / (grid[1] - grid[0])))) if grid.size > 1 else 1
+    if grid.size <= w:
+        return out, float("nan")
+    f_s, f_m = slave[:, idx], -master[:, idx]
+    return out, estimate_delay(grid[w:], f_s[w:] - f_s[:-w], grid[w:], f_m[w:] - f_m[:-w])
+
+
+# ---------- 最大接触力误差 ----------
+
+def contact_error(time_s, F_slave_z, set_value, trim_s=0.0):
+    """有效区间 (去掉开头 trim_s 秒) 的平均从侧力与相对设定值的误差 (%)，返回 (avg, error_percent)。"""
+    t = np.asarray(time_s, dtype=np.float64)
+    f = np.asarray(F_slave_z, dtype=np.float64)
+    if trim_s > 0 and t.size:
+        f = f[t - t[0] >= trim_s]
+    avg = float(f.mean()) if f.size else 0.0
+    error = abs(avg - set_value) / set_value * 100 if set_value != 0 else float("inf")
+    return avg, error
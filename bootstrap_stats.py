@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bootstrap_stats.py
+
+功能：
+1. bootstrap_ci：对一组测量值 (每次测试/每段/每方向的结果) 做非参数 bootstrap，给出统计量 (默认均值) 的百分位置信区间；
+   bootstrap_ratio_ci：成对重采样 (num, den)，给出比值 sum(num)/sum(den) 的置信区间 (如按采样数加权的 B = F/v)。
+   全部重采样一次性生成为 (重采样次数 x n) 的下标矩阵，用 NumPy 沿 axis=1 计算统计量；
+   n 较大时按块生成，单块元素数不超过 MAX_BLOCK。非有限值 (nan/inf) 不参与计算。
+2. 固定随机种子，同一组数据每次得到相同的区间，便于比较不同版本/构建的结果。
+3. 结果以 BootstrapCI 返回；format_ci / ci_header / ci_cells 用于控制台输出和汇总 CSV。
+   n < 2 时区间无定义，low/high 为 nan。
+4. 各测量脚本汇总中的 95% 置信区间均由本模块给出，重采样单元为各次测试结果：float_offset 的平均位移与成功率、
+   maxcontactwrench_error 各设定值的平均从侧力与误差、min_drag_ft 与 tracking_stiffness 各方向的平均值、
+   transparency 的平均透明度、交叉泄漏与时延。drag_measure 的 B_dir 基于该方向各有效分段的 Bchunk，
+   Mean(|B_dir|) 基于各方向 |B_dir|；auto_damping 每次运行的 B 按分段成对重采样 sum(F*N)/sum(v*N)。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+N_RESAMPLES = 10000
+CONFIDENCE = 0.95
+SEED = 0
+MAX_BLOCK = 4_000_000  # 单块重采样矩阵的元素数上限
+
+BootstrapCI = namedtuple("BootstrapCI", ["estimate", "low", "high", "n", "confidence"])
+
+
+def _resampled(n, stat_of_index, n_resamples, seed):
+    """stat_of_index(idx) 对 (m x n) 下标矩阵逐行计算统计量，返回长度 n_resamples 的数组。"""
+    rng = np.random.default_rng(seed)
+    stats = np.empty(n_resamples)
+    block = max(1, MAX_BLOCK // n)
+    for start in range(0, n_resamples, block):
+        m = min(block, n_resamples - start)
+        stats[start:start + m] = stat_of_index(rng.integers(0, n, size=(m, n)))
+    return stats
+
+
+def _interval(estimate, stats, n, confidence):
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(stats, [alpha, 1 - alpha])
+    return BootstrapCI(estimate, float(low), float(high), n, confidence)
+
+
+def bootstrap_ci(values, stat=np.mean, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=SEED):
+    """stat 须支持 axis 参数 (如 np.mean, np.median)。"""
+    x = np.asarray(values, dtype=np.float64).ravel()
+    x = x[np.isfinite(x)]
+    n = x.size
+    if n == 0:
+        return BootstrapCI(float("nan"), float("nan"), float("nan"), 0, confidence)
+    estimate = float(stat(x))
+    if n < 2:
+        return BootstrapCI(estimate, float("nan"), float("nan"), n, confidence)
+    stats = _resampled(n, lambda idx: stat(x[idx], axis=1), n_resamples, seed)
+    return _interval(estimate, stats, n, confidence)
+
+
+def bootstrap_ratio_ci(num, den, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=SEED):
+    """成对重采样的 sum(num)/sum(den)；分母和为 0 的重采样不计入区间。"""
+    num = np.asarray(num, dtype=np.float64).ravel()
+    den = np.asarray(den, dtype=np.float64).ravel()
+    ok = np.isfinite(num) & np.isfinite(den)
+    num, den = num[ok], den[ok]
+    n = num.size
+    total = den.sum()
+    estimate = float(num.sum() / total) if n and total != 0 else float("nan")
+    if n < 2:
+        return BootstrapCI(estimate, float("nan"), float("nan"), n, confidence)
+
+    def ratio(idx):
+        d = den[idx].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(d != 0, num[idx].sum(axis=1) / d, np.nan)
+
+    return _interval(estimate, _resampled(n, ratio, n_resamples, seed), n, confidence)
+
+
+def format_ci(ci, fmt=".4f"):
+    """'12.3400 [95% CI 11.9000, 12.8000, n=5]'。"""
+    if ci.n < 2:
+        return f"{ci.estimate:{fmt}} [CI n/a, n={ci.n}]"
+    return f"{ci.estimate:{fmt}} [{ci.confidence*100:.0f}% CI {ci.low:{fmt}}, {ci.high:{fmt}}, n={ci.n}]"
+
+
+def ci_header(prefix="", with_n=True, confidence=CONFIDENCE):
+    pct = f"{confidence*100:.0f}"
+    return [f"{prefix}CI{pct}_low", f"{prefix}CI{pct}_high"] + (["N"] if with_n else [])
+
+
+def ci_cells(ci, fmt=".4f", with_n=True):
+    cells = ["", ""] if ci.n < 2 else [f"{ci.low:{fmt}}", f"{ci.high:{fmt}}"]
+    return cells + ([ci.n] if with_n else [])
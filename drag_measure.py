@@ -8,26 +8,47 @@ drag_measure.py
 1) 在脚本开始时，列出当前目录可执行的 "test_" 开头文件，让用户选择一个要测试的 Teleop 可执行文件。
 2) 对 (X+/X-/Y+/Y-/Z+/Z-) 六方向循环测量阻尼：
    - (a) 同步到预设Pose (关节角度)
-   - (b) 启动Teleop进程 (sudo + Popen)，创建新会话
+   - (b) 启动Teleop进程 (sudo + Popen, 密码经 stdin 传入)，创建新会话
    - (c) 分段阻尼测量 (末端 5cm~finalDistM, 每5cm一段)
-   - (d) 测量完毕后, 首先 killpg(进程组)，然后使用 pkill -f 强制结束剩余进程
-3) 将测量数据与结果写到同目录下的CSV文件。
+   - (d) 测量完毕后, 按记录的精确进程树结束 Teleop (SIGTERM, 超时才 SIGKILL)，进程树退出即返回
+3) 将测量数据与结果写到同目录下的CSV文件：采样数据在测量过程中由后台线程分批写入，每个方向结束时落盘 (fsync)，
+   会话正常结束后原子重命名为最终文件名；异常中断时保留 .partial 文件，已完成方向的数据不会丢失。
+4) 每个方向在分段 B 之外，用 friction_fit 对全部采样拟合 F = B*v + Fc*sign(v) (--stribeck 可加 Stribeck 项)，
+   写出参数、95% 置信区间、RMSE 与 R^2；最终结果表同时给出分段平均 B_dir 与拟合的 B、Fc。
+5) 流程以 stage_pipeline 阶段图执行：同步/启动 Teleop/采样在主线程串行，上一方向的分析、拟合与写盘
+   在后台与下一方向的同步姿态、Teleop 启动并行；结束时打印并写出各阶段耗时与重叠节省的时间。
+6) 采样时间 time_s 为单调时钟下 states() 调用前后的中点 (timebase)，不受系统时钟调整影响。
+7) 摩擦拟合前对速度与外力的方向投影做零相位低通 (signal_filter.filtfilt，--fit-cutoff，默认 10Hz，0 为不滤波)，
+   降低噪声对回归量 v 的偏置且不引入 v/F 之间的时延；分段 B 仍使用原始采样。
 """
 
 import os
 import sys
 import time
 import math
-import csv
 import signal
-import subprocess
 from datetime import datetime
 import argparse
-import flexivrdk
+
+from result_writer import ResultWriter
+from teleop_process import TeleopProcess
+from sample_buffer import SampleBuffer
+import instrumentation as instr
+from friction_fit import fit_friction, fit_rows, format_fit
+from stage_pipeline import Pipeline
+from timebase import Timebase, timed_states
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from session_state import SessionState, add_resume_argument
+from measurement_watchdog import Watchdog, MeasurementAborted, add_watchdog_arguments
+from robot_daemon import connect
+from benchmark_analysis import direction_projection, chunk_damping
+from motion_timing import MotionTimeEstimator, move_and_wait, format_result, RDK_DEFAULT_VEL_SCALE
+import state_bus
 
 # ========== 全局变量 ==========
-teleop_pid = None            
-teleop_pattern = None        # 供 pkill -f
+teleop = TeleopProcess()
+tb = Timebase()
+wd = Watchdog(teleop)
 leader_robot_sn   = None
 follower_robot_sn = None
 SUDO_PASSWORD = None
@@ -35,6 +56,14 @@ SUDO_PASSWORD = None
 finalDistM = 0.30
 startDist  = 0.05
 sample_period = 0.01
+fit_cutoff = 10.0  # 摩擦拟合前零相位低通截止频率 (Hz)，0 为不滤波
+
+# 单方向采样记录的列
+DAMPING_COLUMNS = ("time_s","px","py","pz","vx","vy","vz","fx","fy","fz","dist_abs")
+
+_T_LOOP   = instr.site("damping.loop")
+_T_APPEND = instr.site("damping.append")
+_T_PRINT  = instr.site("damping.print")
 
 
 # =========== 各方向起始关节姿态 (单位:度) ===========
@@ -71,75 +100,58 @@ def find_executables_in_current_dir():
                 candidates.append((f, f"./{f}"))
     return candidates
 
-# =========== 2) 启动 & 停止 Teleop (进程树 + pkill) ===========
+# =========== 2) 启动 & 停止 Teleop (精确进程树) ===========
 
 def start_teleop(executable_path):
     """
-    启动 Teleop 程序，并使其成为新会话的组长。
+    启动 Teleop 程序 (sudo, 新会话)，并记录其进程树。
     若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。
     返回 Teleop 进程的 PID。
     """
-    global teleop_pid, teleop_pattern
-    teleop_pattern = os.path.basename(executable_path)
-    if "high_transparency" in teleop_pattern:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -l {leader_robot_sn} -r {follower_robot_sn}"
-    else:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -1 {leader_robot_sn} -2 {follower_robot_sn}"
-    pid = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid).pid
-    teleop_pid = pid
-    print(f"[StartTeleop] pattern=({teleop_pattern}), cmd=({cmd}), pid={pid}")
+    pid = teleop.start(executable_path, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD)
     time.sleep(2.0)
+    teleop.refresh_tree()
     return pid
 
 def stop_teleop():
     """
-    结束 Teleop 程序：先通过 killpg(SIGTERM+SIGKILL) 结束进程组，
-    然后使用 pkill -9 -f 以确保所有相关进程被关闭。
+    结束 Teleop 进程树：SIGTERM 后等待其全部退出即返回，超时才升级为 SIGKILL。
+    返回 TeardownReport (未启动时为 None)。
     """
-    global teleop_pid, teleop_pattern
-
-    if teleop_pid is not None and teleop_pid > 0:
-        try:
-            pgid = os.getpgid(teleop_pid)
-        except ProcessLookupError:
-            print(f"[stop_teleop] pid {teleop_pid} not found. Possibly ended.")
-            pgid = None
-
-        if pgid is not None:
-            print(f"[stop_teleop] killpg(SIGTERM) pgid={pgid}")
-            try:
-                os.killpg(pgid, signal.SIGTERM)
-                time.sleep(1.0)
-            except ProcessLookupError:
-                print("[stop_teleop] Group not found, likely ended.")
-            else:
-                try:
-                    os.killpg(pgid, 0)
-                    print(f"[stop_teleop] Still alive => killpg(SIGKILL) pgid={pgid}")
-                    os.killpg(pgid, signal.SIGKILL)
-                except ProcessLookupError:
-                    print("[stop_teleop] Group ended after SIGTERM.")
-        teleop_pid = None
-
-    if teleop_pattern:
-        print(f"[stop_teleop] pkill -9 -f {teleop_pattern}")
-        try:
-            subprocess.run(["pkill", "-9", "-f", teleop_pattern], check=False)
-        except Exception as e:
-            print(f"[stop_teleop] pkill error: {e}")
-    teleop_pattern = None
-
-
-def sync_pose(robot, jpos_deg):
+    return teleop.stop()
+
+
+def send_movej(robot, jpos_deg):
+    import flexivrdk
     robot.SwitchMode(flexivrdk.Mode.NRT_PRIMITIVE_EXECUTION)
     target = flexivrdk.JPos(jpos_deg, [0,0,0,0,0,0])
     robot.ExecutePrimitive("MoveJ", {"target": target})
+
+def sync_pose(robots, jpos_deg):
+    """主从同时 MoveJ 到 jpos_deg，稳定到达 (或超时) 后返回是否全部到达。"""
     print(f"[SyncPose] Send MoveJ command to {jpos_deg}")
+    estimators = [MotionTimeEstimator(sn) for sn in (leader_robot_sn, follower_robot_sn)]
+    results = move_and_wait(robots, estimators, jpos_deg, RDK_DEFAULT_VEL_SCALE, send_movej, label="SyncPose")
+    for est, res in zip(estimators, results):
+        print(f"  {format_result(est.key, res)}")
+    return all(res.reached for res in results)
 
 # =========== 分段测量阻尼 ===========
-def measure_damping_in_one_direction(robot, dname, dir_vec):
-    start_time = time.time()
-    data_records = []
+def measure_damping_in_one_direction(robot, dname, dir_vec, writer=None, batch_size=50, timeout_s=None):
+    """采样 + 分段分析，返回 (B_dir, data_records, chunk_result_list)。"""
+    data_records = acquire_damping_samples(robot, dname, dir_vec, writer, batch_size, timeout_s)
+    B_dir, chunk_result_list = analyze_damping(data_records, dname, dir_vec)
+    return B_dir, data_records, chunk_result_list
+
+def acquire_damping_samples(robot, dname, dir_vec, writer=None, batch_size=50, timeout_s=None):
+    """
+    采样数据记录在 SampleBuffer (列见 DAMPING_COLUMNS) 中并返回；
+    若提供 writer (ResultWriter)，采样数据每 batch_size 条提交一次给后台线程写盘。
+    timeout_s 不为 None 时，超过该时间仍未走完 finalDistM 则结束采样 (无人值守的自动激励用)。
+    """
+    start_time = tb.now()
+    data_records = SampleBuffer(DAMPING_COLUMNS, capacity=int(60.0/sample_period))
+    n_written = 0
     reachedStart = False
     doneFinal    = False
 
@@ -148,104 +160,78 @@ def measure_damping_in_one_direction(robot, dname, dir_vec):
     L = math.sqrt(dir_vec[0]**2 + dir_vec[1]**2 + dir_vec[2]**2)
     if L<1e-9:
         print(f"{dname} direction invalid.")
-        return 0.0, [], []
+        return data_records
 
     unit_dir = (dir_vec[0]/L, dir_vec[1]/L, dir_vec[2]/L)
 
-    while True:
-        states = robot.states()
-        pose   = states.tcp_pose
-        vel    = states.tcp_vel
-        wrench = states.ext_wrench_in_world
-
-        px, py, pz = pose[0], pose[1], pose[2]
-        vx, vy, vz = vel[0], vel[1], vel[2]
-        fx, fy_, fz_ = wrench[0], wrench[1], wrench[2]
-
-        dx = px - ix
-        dy = py - iy
-        dz = pz - iz
-        dist_dir = dx*unit_dir[0] + dy*unit_dir[1] + dz*unit_dir[2]
-        dist_abs = abs(dist_dir)
-
-        if not reachedStart and dist_abs >= startDist:
-            print("  -> Reached 5cm, start recording data.")
-            reachedStart = True
-
-        if reachedStart and not doneFinal:
-            if dist_abs <= finalDistM:
-                t_now = time.time() - start_time
-                data_records.append((t_now, px, py, pz, vx, vy, vz, fx, fy_, fz_, dist_abs))
-            else:
-                print(f"  -> Reached {int(finalDistM*100)}cm, stop recording.")
-                doneFinal = True
-                break
-
-        time.sleep(sample_period)
-        if doneFinal:
-            break
+    try:
+        with wd.watch(f"acquire {dname}", min_delta=0.001):
+            while True:
+                wd.check()
+                t_loop = instr.now()
+                t_state, states = timed_states(robot, tb)
+                pose   = states.tcp_pose
+                vel    = states.tcp_vel
+                wrench = states.ext_wrench_in_world
+
+                px, py, pz = pose[0], pose[1], pose[2]
+                vx, vy, vz = vel[0], vel[1], vel[2]
+                fx, fy_, fz_ = wrench[0], wrench[1], wrench[2]
+
+                dx = px - ix
+                dy = py - iy
+                dz = pz - iz
+                dist_dir = dx*unit_dir[0] + dy*unit_dir[1] + dz*unit_dir[2]
+                dist_abs = abs(dist_dir)
+                wd.progress(dist_abs)
+
+                if not reachedStart and dist_abs >= startDist:
+                    t0 = instr.now()
+                    print("  -> Reached 5cm, start recording data.")
+                    _T_PRINT.record(instr.now() - t0)
+                    reachedStart = True
+
+                if reachedStart and not doneFinal:
+                    if dist_abs <= finalDistM:
+                        t_now = t_state - start_time
+                        t0 = instr.now()
+                        data_records.append(t_now, px, py, pz, vx, vy, vz, fx, fy_, fz_, dist_abs)
+                        _T_APPEND.record(instr.now() - t0)
+                        if writer is not None and len(data_records) - n_written >= batch_size:
+                            writer.write_samples(data_records.rows(n_written))
+                            n_written = len(data_records)
+                    else:
+                        print(f"  -> Reached {int(finalDistM*100)}cm, stop recording.")
+                        doneFinal = True
+                        break
+
+                instr.sleep(sample_period)
+                _T_LOOP.record(instr.now() - t_loop)
+                if doneFinal:
+                    break
+                if timeout_s is not None and tb.now() - start_time > timeout_s:
+                    print(f"  -> Timeout after {timeout_s:.1f}s at {dist_abs*100:.1f}cm, stop recording.")
+                    break
+    finally:
+        if writer is not None and n_written < len(data_records):
+            writer.write_samples(data_records.rows(n_written))
+    return data_records
 
+def analyze_damping(data_records, dname, dir_vec):
+    """分段 (5cm 一段) 计算 B，返回 (B_dir, chunk_result_list)。不访问机器人，可与下一方向的运动并行。"""
     if len(data_records)<5:
         print(f"[Warning] {dname} data <5 => B_dir=0.")
-        return 0.0, data_records, []
-
-    # 分段: [5cm, finalDistM], step=5cm
-    maxRange = finalDistM - startDist
-    nChunks = int(math.floor(maxRange/0.05))
-    chunkRecords = [[] for _ in range(nChunks)]
-
-    for rec in data_records:
-        dist_abs = rec[10]
-        offset = dist_abs - startDist
-        idx = int(offset//0.05)
-        if idx<0 or idx>=nChunks:
-            continue
-        chunkRecords[idx].append(rec)
-
-    chunk_result_list = []
-    validSumB = 0.0
-    validCount= 0
-
-    for i in range(nChunks):
-        ds = startDist + 0.05*i
-        de = ds + 0.05
-        samples = chunkRecords[i]
-        if len(samples)==0:
-            chunk_result_list.append((i, ds, de, 0.0,0.0,0.0,0))
-            continue
-        sumV=0.0
-        sumF=0.0
-        N=len(samples)
-        for r in samples:
-            vx, vy, vz = r[4], r[5], r[6]
-            fx, fy_, fz_ = r[7], r[8], r[9]
-            vdir = vx*unit_dir[0] + vy*unit_dir[1] + vz*unit_dir[2]
-            fdir = fx*unit_dir[0] + fy_*unit_dir[1] + fz_*unit_dir[2]
-            sumV += abs(vdir)
-            sumF += abs(fdir)
-        avgV = sumV/N
-        avgF = sumF/N
-        if avgV<1e-6:
-            bc=0.0
-        else:
-            bc= avgF / avgV
-
-        chunk_result_list.append((i, ds, de, avgV, avgF, bc, N))
-        if bc>0 and avgV>1e-6:
-            validSumB += bc
-            validCount +=1
+        return 0.0, []
 
-    if validCount==0:
-        B_dir=0.0
-    else:
-        B_dir= validSumB/validCount
+    # 分段: [5cm, finalDistM], step=5cm (benchmark_analysis.chunk_damping，reanalyze.py 离线重算用同一函数)
+    B_dir, chunk_result_list = chunk_damping(data_records, dir_vec, startDist, finalDistM)
 
-    print(f"  => {dname} {nChunks} chunk(s).")
+    print(f"  => {dname} {len(chunk_result_list)} chunk(s).")
     for (i, ds, de, avV, avF, bc, nm) in chunk_result_list:
         print(f"     Chunk {i}: [{ds*100:.0f}-{de*100:.0f}cm], N={nm}, V={avV:.4f}, F={avF:.4f}, B={bc:.4f}")
 
     print(f"  ==> {dname} overall B_dir={B_dir:.4f}\n")
-    return B_dir, data_records, chunk_result_list
+    return B_dir, chunk_result_list
 
 def safe_exit():
     stop_teleop()
@@ -258,14 +244,21 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 
-def main():
-    global teleop_pid, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
+def main(argv=None):
+    global leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
 
     parser = argparse.ArgumentParser(description="Transparency Measurement for Master Force Feedback")
     parser.add_argument("-1", "--leader", required=True, help="主机械臂序列号")
     parser.add_argument("-2", "--follower", required=True, help="从机械臂序列号")
     parser.add_argument("-p", "--password", required=True, help="用于启动和停止 Teleop 程序的 sudo 密码")
-    args = parser.parse_args()
+    parser.add_argument("--stribeck", action="store_true", help="摩擦拟合中加入 Stribeck 项")
+    parser.add_argument("--fit-cutoff", type=float, default=fit_cutoff,
+                        help=f"摩擦拟合前零相位低通截止频率 Hz (默认 {fit_cutoff:g}，0 为不滤波)")
+    add_resume_argument(parser)
+    add_watchdog_arguments(parser, progress="末端位移未增加 1mm")
+    state_bus.add_bus_argument(parser)
+    instr.add_profile_argument(parser)
+    args = parser.parse_args(argv)
 
     leader_robot_sn = args.leader
     follower_robot_sn = args.follower
@@ -292,89 +285,153 @@ def main():
     print(f"\n已选择: {chosen_name}\n路径: {exe_path}\n")
 
     print("连接到 Robot...")
-    leader_robot = flexivrdk.Robot(leader_robot_sn)
-    follower_robot = flexivrdk.Robot(follower_robot_sn)
+    import flexivrdk  # 只在真机路径导入，auto_damping_measure --sim 复用本模块时不需要 SDK
+    state_bus.open_from_args(args)
+    leader_robot = state_bus.tap(instr.instrument_robot(connect(leader_robot_sn, flexivrdk), "leader"), "leader")
+    follower_robot = state_bus.tap(instr.instrument_robot(connect(follower_robot_sn, flexivrdk), "follower"), "follower")
     # robot.enable()
+    wd.configure_from_args(args, {"leader": leader_robot, "follower": follower_robot}).start()
+    profiler = instr.Profiler(args.profile).start()
 
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    state = SessionState.open("drag_measure", args.resume, stamp=now_str,
+                              meta={"leader": args.leader, "follower": args.follower,
+                                    "teleop": chosen_name, "finalDistM": finalDistM})
     csv_name = f"damping_data_{now_str}.csv"
-    fcsv = open(csv_name, mode="w", newline='', encoding="utf-8")
-    writer = csv.writer(fcsv)
+    writer = ResultWriter(csv_name)
     writer.writerow(["Damping Measurement w/ Teleop", now_str])
     writer.writerow(["finalDistM(cm)", f"{finalDistM*100:.1f}"])
+    writer.writerow(["Session state", state.path])
     writer.writerow([])
 
     direction_order = ["X+", "X-", "Y+", "Y-", "Z+", "Z-"]
-    results = []
-
-    try:
-        for dname in direction_order:
-            dcfg = DIRECTION_CONFIG[dname]
-            dvec = dcfg["vector"]
-            jpos_deg = dcfg["jpos_start_deg"]
-
-            print(f"\n========== 测量方向 {dname} ===========")
-            # (a) 同步Pose
-            input("[STEP]按回车键同步到起始姿态...")
-            sync_pose(leader_robot, jpos_deg)
-            sync_pose(follower_robot, jpos_deg)
-            input(f"[STEP]位置就绪后，按回车启动teleop并开始测量 [{dname}]...")
-            leader_robot.Stop()
-            follower_robot.Stop()
-            time.sleep(1.0)
-
-            # (b) 启动teleop
-            start_teleop(exe_path)
-            time.sleep(7.0)
-
-            # (c) 分段测量
-            print(f"[STEP]现在请向{dname}方向开始移动大约 {int(finalDistM*100)}cm...")
-            B_dir, data_recs, chunk_info = measure_damping_in_one_direction(leader_robot, dname, dvec)
-            results.append(B_dir)
-
-            # (d) 停止teleop
-            stop_teleop()
-            leader_robot.Stop()
-            follower_robot.Stop()
-
-            # (e) 写CSV
-            writer.writerow([f"Direction={dname}"])
-            writer.writerow(["time_s","px","py","pz","vx","vy","vz","fx","fy","fz","dist_abs"])
-            for rec in data_recs:
-                writer.writerow([f"{x:.4f}" for x in rec])
-            writer.writerow([])
-
-            writer.writerow(["ChunkIndex","DistStart_m","DistEnd_m","avgV","avgF","Bchunk","N"])
-            for ci in chunk_info:
-                idx, ds, de, avV, avF, bc, nm = ci
-                writer.writerow([idx, f"{ds:.3f}", f"{de:.3f}",
-                                 f"{avV:.4f}", f"{avF:.4f}", f"{bc:.4f}", nm])
-            writer.writerow(["B_dir", f"{B_dir:.4f}"])
-            writer.writerow([])
-
+    completed = False
+
+    # ---- 阶段定义: 同步/采样为机器人阶段 (串行)，分析/写盘与下一方向的同步、Teleop 启动重叠 ----
+    def sync_stage(dname):
+        jpos_deg = DIRECTION_CONFIG[dname]["jpos_start_deg"]
+        print(f"\n========== 测量方向 {dname} ===========")
+        # (a) 同步Pose
+        input("[STEP]按回车键同步到起始姿态...")
+        sync_pose([leader_robot, follower_robot], jpos_deg)
+        input(f"[STEP]位置就绪后，按回车启动teleop并开始测量 [{dname}]...")
+        leader_robot.Stop()
+        follower_robot.Stop()
+        time.sleep(1.0)
+
+        # (b) 启动teleop
+        start_teleop(exe_path)
+        time.sleep(7.0)
+
+    def acquire_stage(dname):
+        # (c) 采样 (采样数据边测边写)；上一方向的结果表已写完 (依赖其 write 阶段)
+        writer.writerow([f"Direction={dname}"])
+        writer.writerow(list(DAMPING_COLUMNS))
+        print(f"[STEP]现在请向{dname}方向开始移动大约 {int(finalDistM*100)}cm...")
+        data_recs = acquire_damping_samples(leader_robot, dname, DIRECTION_CONFIG[dname]["vector"], writer)
+        writer.writerow([])
+        state.complete_unit(dname, arrays={"samples": data_recs.array()})
+
+        # (d) 停止teleop
+        stop_teleop()
+        leader_robot.Stop()
+        follower_robot.Stop()
+        return data_recs
+
+    def load_stage(dname):
+        # 已完成的方向：从检查点读出原始采样，按采样时的格式写入本次 CSV
+        arr = state.arrays(dname)["samples"]
+        data_recs = SampleBuffer(DAMPING_COLUMNS, capacity=len(arr))
+        data_recs.extend(arr)
+        print(f"[Resume] {dname} 已完成，使用检查点中的 {len(data_recs)} 条采样")
+        writer.writerow([f"Direction={dname}"])
+        writer.writerow(list(DAMPING_COLUMNS))
+        writer.write_samples(data_recs.rows())
+        writer.writerow([])
+        return data_recs
+
+    def analyze_stage(dname, data_recs):
+        dvec = DIRECTION_CONFIG[dname]["vector"]
+        B_dir, chunk_info = analyze_damping(data_recs, dname, dvec)
+        fit = fit_friction(*direction_projection(data_recs, dvec, args.fit_cutoff), stribeck=args.stribeck) \
+            if len(data_recs) else None
+        print(f"  ==> {dname} friction fit: {format_fit(fit)}")
+        return B_dir, chunk_info, fit
+
+    def write_stage(dname, analysis):
+        # (e) 写CSV
+        B_dir, chunk_info, fit = analysis
+        writer.writerow(["ChunkIndex","DistStart_m","DistEnd_m","avgV","avgF","Bchunk","N"])
+        for ci in chunk_info:
+            idx, ds, de, avV, avF, bc, nm = ci
+            writer.writerow([idx, f"{ds:.3f}", f"{de:.3f}",
+                             f"{avV:.4f}", f"{avF:.4f}", f"{bc:.4f}", nm])
+        writer.writerow(["B_dir", f"{B_dir:.4f}"])
+        writer.writerows(fit_rows(dname, fit))
+        writer.writerow([])
+        writer.mark_trial_done()
+        return analysis
+
+    def summary_stage(*analyses):
+        results = [a[0] for a in analyses]
+        fits = [a[2] for a in analyses]
+        # 与 analyze_damping 一致：只有 Bchunk > 0 的分段计入 B_dir
+        b_cis = [bootstrap_ci([c[5] for c in a[1] if c[5] > 0 and c[3] > 1e-6]) for a in analyses]
         valid_b = [abs(x) for x in results if x>1e-9]
         if not valid_b:
             print("\n[Warning] 所有方向均无有效数据.")
+            return
+        mean_abs = sum(valid_b)/len(valid_b)
+        mean_ci = bootstrap_ci(valid_b)
+        print("\n========== 6方向阻尼结果 ===========")
+        for i, dname in enumerate(direction_order):
+            print(f"  {dname}: B_dir={format_ci(b_cis[i])}, fit: {format_fit(fits[i])}")
+        print(f"  => 绝对值平均 = {format_ci(mean_ci)}")
+        print("====================================\n")
+
+        writer.writerow(["FinalResults"])
+        writer.writerow(["Direction", "B_dir"] + ci_header() + ["B_fit", "Fc_fit", "RMSE_fit"])
+        for i, dn in enumerate(direction_order):
+            fit = fits[i]
+            writer.writerow([dn, f"{results[i]:.4f}"] + ci_cells(b_cis[i]) +
+                            ([f"{fit.B:.4f}", f"{fit.Fc:.4f}", f"{fit.rmse:.4f}"] if fit else []))
+        writer.writerow(["Mean(|B_dir|)", f"{mean_abs:.4f}"] + ci_cells(mean_ci))
+
+    pipe = Pipeline()
+    writes = []
+    for dname in direction_order:
+        if state.done(dname):
+            acq = pipe.add(f"load:{dname}", lambda *_, d=dname: load_stage(d), deps=writes[-1:])
         else:
-            mean_abs = sum(valid_b)/len(valid_b)
-            print("\n========== 6方向阻尼结果 ===========")
-            for i, dname in enumerate(direction_order):
-                print(f"  {dname}: B_dir={results[i]:.4f}")
-            print(f"  => 绝对值平均 = {mean_abs:.4f}")
-            print("====================================\n")
-
-            writer.writerow(["FinalResults"])
-            for i, dn in enumerate(direction_order):
-                writer.writerow([dn, f"{results[i]:.4f}"])
-            writer.writerow(["Mean(|B_dir|)", f"{mean_abs:.4f}"])
+            pipe.add(f"sync:{dname}", lambda d=dname: sync_stage(d), robot=True)
+            acq = pipe.add(f"acquire:{dname}", lambda *_, d=dname: acquire_stage(d),
+                           deps=writes[-1:], robot=True)
+        ana = pipe.add(f"analyze:{dname}", lambda recs, d=dname: analyze_stage(d, recs), deps=[acq])
+        writes.append(pipe.add(f"write:{dname}", lambda res, d=dname: write_stage(d, res), deps=[ana]))
+    pipe.add("summary", summary_stage, deps=writes)
+
+    try:
+        pipe.run()
+        writer.writerow([])
+        writer.writerows(pipe.report())
+        completed = True
+        state.finish()
 
     except Exception as e:
-        print(f"[Error] 发生异常: {e}")
+        if isinstance(e, MeasurementAborted):
+            print(f"[Watchdog] 测量中止: {e.reason} ({e.detail})")
+            writer.writerow(["Aborted", e.reason, e.detail])
+        else:
+            print(f"[Error] 发生异常: {e}")
+        print(f"已完成方向已保存到 {state.path}，可使用 --resume 继续。")
         safe_exit()
     finally:
+        wd.stop()
         stop_teleop()
-        fcsv.close()
-        print(f"数据已写入 {csv_name}")
+        saved = writer.close(complete=completed)
+        print(f"数据已写入 {saved}")
+        profiler.stop(saved)
+        instr.write_report(saved)
 
 
 if __name__ == "__main__":
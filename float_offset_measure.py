@@ -9,19 +9,37 @@ float_offset_measure.py
    需要 sudo 密码的原因：启动和停止 Teleop 程序时必须以 root 权限执行 kill 命令，以确保彻底终止 Teleop 及其所有子进程。
 2. 从当前目录列出所有以 "test_" 开头的可执行文件，由用户选择后启动遥操作程序（只启动一次）。
 3. 同步主从机械臂到 Home Pose，然后等待用户按 Enter 开始测试。
-4. 自动（tdk1.2.2）或手动（TransparencyCart）移动机械臂到测试Pose，踩下踏板后记录 1 秒前后 TCP 位移（mm），并判断 <10mm 为成功。
-5. 输出每次位移、成功/失败；最后计算成功率和平均位移，保存所有结果到 CSV。
+4. 测试 Pose 的访问顺序与中间过渡点由 pose_planner 按关节空间运动时间最短规划 (结果按 Pose 集合缓存)；
+   每段 MoveJ 的超时由 motion_timing 按预计运动时间给出 (模型随实际耗时在线更新)，超时未到达会打印报告；
+   自动（tdk1.2.2）或手动（TransparencyCart）移动机械臂到测试Pose，踩下踏板后记录 1 秒前后 TCP 位移（mm），并判断 <10mm 为成功。
+5. 输出每次位移、成功/失败，每次测试完成即追加写入 CSV 并落盘；最后计算成功率和平均位移。
 6. 停止遥操作程序，优雅退出。
+7. 工作空间漂移图 (--map N / --map-grid K)：由 pose_planner.sample_poses 在关节限位内围绕 Home Pose 生成构型
+   (N 个 Halton 低差异点，或每个关节 K 个等间距值的网格；--map-joints 指定改变的关节，--map-span 为范围)，
+   访问顺序按运动时间最短规划，无人值守逐个 Pose：MoveJ 稳定到达 -> 切回遥操作模式 -> --map-settle 秒后测 1 秒漂移。
+   踏板需全程保持踩下 (如用固定装置)，仅支持可自动 MoveJ 的 Teleop。
+   每个 Pose 的关节角、TCP 位置、漂移向量与成功与否写入 hover_map_<时间>.csv，
+   最后按各关节取值分箱给出平均漂移与成功率 (漂移图)，并列出漂移最大的 Pose。
 
 """
 
-import argparse, time, signal, sys, csv, os, subprocess
+import argparse, time, signal, sys, os
 from datetime import datetime
 import flexivrdk
 import math
 
-teleop_pid = None
-teleop_pattern = None
+from result_writer import ResultWriter
+from teleop_process import TeleopProcess
+import instrumentation as instr
+from pose_planner import plan_sequence, sequential_time, leg, sample_poses
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from motion_timing import MotionTimeEstimator, move_and_wait, max_joint_error_deg
+from measurement_watchdog import Watchdog, MeasurementAborted, add_watchdog_arguments
+from robot_daemon import connect
+import state_bus
+
+teleop = TeleopProcess()
+wd = Watchdog(teleop)
 
 HOME_POSE = [-5.6850536735238373e-05, -39.999988598597405, -7.796941005345694e-05,
              89.99967467229428, -1.394160247868911e-05, 39.99993054198945, -1.9290991341998603e-06]
@@ -39,96 +57,176 @@ test_pose = [
     [-72.04356496363411, -89.724056048665, 86.44702007673688, 66.80374435974011, -2.3625400227927327, -6.845101608690083, -59.72234766091402],
 ]
 
-def parse_args():
+MOVEJ_VEL_SCALE = 25
+HOVER_TOL_MM = 10.0
+MAP_BINS = 4            # 漂移图每个关节的分箱数
+MAP_WORST = 5           # 列出漂移最大的 Pose 数
+# 可安全中转的过渡 Pose：大幅度重新配置时经由这些 Pose，避免直接 MoveJ 扫过不安全区域
+SAFE_WAYPOINTS = [test_pose[1], HOME_POSE]
+
+def parse_args(argv=None):
     p = argparse.ArgumentParser(description="Float Offset (Hover) Success Rate Measurement")
     p.add_argument("-1","--leader", required=True, help="主机械臂序列号")
     p.add_argument("-2","--follower", required=True, help="从机械臂序列号")
     p.add_argument("-p","--password", required=True, help="sudo 密码，用以开启关闭遥操作")
     p.add_argument("-n","--num", type=int, default=10, help="测试次数 (默认10次)")
-    return p.parse_args()
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--map", type=int, default=0, metavar="N",
+                   help="工作空间漂移图：在关节限位内生成 N 个 Halton 构型，无人值守逐个测量 (忽略 -n)")
+    g.add_argument("--map-grid", type=int, default=0, metavar="K",
+                   help="工作空间漂移图：每个改变的关节取 K 个等间距值的全组合网格")
+    p.add_argument("--map-joints", default="2,3,4,5,6",
+                   help="漂移图中改变的关节 (1 起，逗号分隔，默认 2,3,4,5,6)，其余关节保持 Home Pose")
+    p.add_argument("--map-span", type=float, default=30.0, help="漂移图各关节相对 Home Pose 的范围 (±度，默认 30)")
+    p.add_argument("--map-settle", type=float, default=1.0,
+                   help="漂移图中切回遥操作模式后等待重力补偿接管的时间 (秒，默认 1)")
+    add_watchdog_arguments(p, progress="踏板无操作")
+    state_bus.add_bus_argument(p)
+    instr.add_profile_argument(p)
+    return p.parse_args(argv)
 
 def find_executables():
     return [(f,f"./{f}") for f in os.listdir('.') if f.startswith("test_") and os.access(f,os.X_OK)]
 
 def start_teleop(executable_path):
     """
-    启动 Teleop 程序，并使其成为新会话的组长。
+    启动 Teleop 程序 (sudo, 新会话)，并记录其进程树。
     若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。
     返回 Teleop 进程的 PID。
     """
-    global teleop_pid, teleop_pattern, SUDO_PASSWORD, leader_robot_sn, follower_robot_sn
-    teleop_pattern = os.path.basename(executable_path)
-    if "high_transparency" in teleop_pattern:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -l {leader_robot_sn} -r {follower_robot_sn}"
-    else:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -1 {leader_robot_sn} -2 {follower_robot_sn}"
-    pid = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid).pid
-    teleop_pid = pid
-    print(f"[StartTeleop] pattern=({teleop_pattern}), cmd=({cmd}), pid={pid}")
+    pid = teleop.start(executable_path, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD)
     time.sleep(2.0)
+    teleop.refresh_tree()
     return pid
 
 def stop_teleop():
     """
-    结束 Teleop 程序：先通过 killpg(SIGTERM+SIGKILL) 结束进程组，
-    然后使用 pkill -9 -f 以确保所有相关进程被关闭。
+    结束 Teleop 进程树：SIGTERM 后等待其全部退出即返回，超时才升级为 SIGKILL。
+    返回 TeardownReport (未启动时为 None)。
     """
-    global teleop_pid, teleop_pattern
-    if teleop_pid is not None and teleop_pid > 0:
-        try:
-            pgid = os.getpgid(teleop_pid)
-        except ProcessLookupError:
-            print(f"[stop_teleop] pid {teleop_pid} not found. Possibly ended.")
-            pgid = None
-        if pgid is not None:
-            print(f"[stop_teleop] killpg(SIGTERM) pgid={pgid}")
-            try:
-                os.killpg(pgid, signal.SIGTERM)
-                time.sleep(1.0)
-            except ProcessLookupError:
-                print("[stop_teleop] Group not found, likely ended.")
-            else:
-                try:
-                    os.killpg(pgid, 0)
-                    print(f"[stop_teleop] Still alive => killpg(SIGKILL) pgid={pgid}")
-                    os.killpg(pgid, signal.SIGKILL)
-                except ProcessLookupError:
-                    print("[stop_teleop] Group ended after SIGTERM.")
-        teleop_pid = None
-    if teleop_pattern:
-        print(f"[stop_teleop] pkill -9 -f {teleop_pattern}")
-        try:
-            subprocess.run(["pkill", "-9", "-f", teleop_pattern], check=False)
-        except Exception as e:
-            print(f"[stop_teleop] pkill error: {e}")
-    teleop_pattern = None
+    return teleop.stop()
 
 def move_j_deg(robot, pose_deg):
     robot.SwitchMode(flexivrdk.Mode.NRT_PRIMITIVE_EXECUTION)
-    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg,[0]*6),"jntVelScale": 25})
+    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg,[0]*6),"jntVelScale": MOVEJ_VEL_SCALE})
 
-def is_reached_joint_pose(robot, pose_deg, joint_allowing_error_deg):
-    target = [math.radians(x) for x in pose_deg]
-    tol = math.radians(joint_allowing_error_deg)
-    current = robot.states().q  # list of 7 floats in radians
-    return all(abs(curr - tgt) <= tol for curr, tgt in zip(current, target))
+def move_route(leader, follower, route, estimators):
+    """主从同时依次 MoveJ 经过 route 中的各 Pose，已在该 Pose 的跳过；每段结束计一次 watchdog 进度。
+    返回未按时到达的 Pose 数。"""
+    timeouts = 0
+    for pose in route:
+        if max_joint_error_deg(leader, pose) <= 2 and max_joint_error_deg(follower, pose) <= 2:
+            continue
+        results = move_and_wait([leader, follower], estimators, pose, MOVEJ_VEL_SCALE, move_j_deg)
+        timeouts += not all(r.reached for r in results)
+        wd.progress()
+    return timeouts
 
-def wait_for_reached_or_timeout(robot, pose_deg, joint_allowing_error_deg, time_out):
-    start_time = time.time()
+def wait_pedal(robot, pressed, on_error):
+    """轮询踏板直到其状态为 pressed (1 踩下 / 0 松开)；读取失败时视为 on_error。"""
     while True:
-        if is_reached_joint_pose(robot, pose_deg, joint_allowing_error_deg) or time.time() - start_time >= time_out:
+        wd.check()
+        try:
+            pedal = robot.digital_inputs()[0]
+        except Exception:
+            pedal = on_error
+        if pedal == pressed:
             break
-        time.sleep(0.2)
+        instr.sleep(0.05)
+    wd.progress()
 
-def measure_hover(robot):
+def measure_drift(robot):
+    """返回 (起始 TCP 位姿, [dx, dy, dz] mm)：1 秒前后的 TCP 位移。"""
     start = robot.states().tcp_pose.copy()
     time.sleep(1)
     end = robot.states().tcp_pose.copy()
-    dx = (end[0]-start[0])*1000
-    dy = (end[1]-start[1])*1000
-    dz = (end[2]-start[2])*1000
+    return start, [(end[k]-start[k])*1000 for k in range(3)]
+
+def measure_hover(robot):
+    _, (dx, dy, dz) = measure_drift(robot)
     dist = (dx*dx + dy*dy + dz*dz)**0.5
-    return round(dist,2), dist<10.0
+    return round(dist,2), dist<HOVER_TOL_MM
+
+def drift_map_rows(records, joints):
+    """按各关节取值分箱的平均漂移与成功率；records 为 (pose, 漂移 mm, 是否成功)。"""
+    rows = []
+    for j in joints:
+        values = [pose[j] for pose, _, _ in records]
+        lo, hi = min(values), max(values)
+        width = (hi - lo) / MAP_BINS or 1.0
+        for b in range(MAP_BINS):
+            sel = [(d, ok) for pose, d, ok in records if min(int((pose[j] - lo) / width), MAP_BINS - 1) == b]
+            if not sel:
+                continue
+            rows.append([f"J{j+1}", f"{lo + b*width:.1f}~{lo + (b+1)*width:.1f}", len(sel),
+                         f"{sum(d for d, _ in sel)/len(sel):.2f}", f"{sum(ok for _, ok in sel)/len(sel)*100:.1f}"])
+    return rows
+
+def run_drift_map(args, leader, follower, estimators, profiler, now):
+    """工作空间漂移图：生成构型、规划顺序、逐个 Pose 无人值守测量漂移并写出逐 Pose 结果与分箱汇总。"""
+    joints = [int(x) - 1 for x in args.map_joints.split(",")]
+    method, n = ("grid", args.map_grid) if args.map_grid else ("halton", args.map)
+    poses = sample_poses(n, HOME_POSE, joints, args.map_span, method)
+    plan = plan_sequence(poses, HOME_POSE, SAFE_WAYPOINTS, end=HOME_POSE, vel_scale=MOVEJ_VEL_SCALE,
+                         time_fn=estimators[0].time_fn, cache_tag=estimators[0].tag())
+    print(f"漂移图: {len(poses)} 个 {method} 构型 (关节 {args.map_joints}，±{args.map_span:g}°)，"
+          f"预计运动时间 {plan.total_time:.1f}s")
+    input("请将踏板保持踩下 (可用固定装置)，按 Enter 开始无人值守测量...")
+
+    writer = ResultWriter(f"hover_map_{now}.csv")
+    writer.writerow(["Hover Drift Map", now, method, f"joints={args.map_joints}", f"span={args.map_span:g}"])
+    writer.writerow(["Pose", "Reached"] + [f"J{k+1}(deg)" for k in range(7)] +
+                    ["TCP x(m)", "TCP y(m)", "TCP z(m)", "dx(mm)", "dy(mm)", "dz(mm)", "Distance(mm)", "Success"])
+    teleop_mode = leader.mode()
+    records = []
+    completed = False
+    try:
+        for i, k in enumerate(plan.order):
+            pose = poses[k]
+            with wd.watch(f"map pose {k}"):
+                print(f"[{i+1}/{len(poses)}] 前往 Pose {k}...")
+                reached = move_route(leader, follower, plan.routes[i], estimators) == 0
+                leader.SwitchMode(teleop_mode)
+                follower.SwitchMode(teleop_mode)
+                wait_pedal(leader, 1, on_error=0)
+                time.sleep(args.map_settle)
+                tcp, drift = measure_drift(leader)
+            dist = math.sqrt(sum(d * d for d in drift))
+            success = dist < HOVER_TOL_MM
+            records.append((pose, dist, success))
+            writer.writerow([k, "Yes" if reached else "No"] + [f"{q:.2f}" for q in pose] +
+                            [f"{x:.4f}" for x in tcp[:3]] + [f"{d:.2f}" for d in drift] +
+                            [f"{dist:.2f}", "Yes" if success else "No"])
+            writer.mark_trial_done()
+            print(f"  漂移 {dist:.2f} mm — {'Success' if success else 'Fail'}")
+        completed = True
+    except MeasurementAborted as e:
+        print(f"\n[Watchdog] 测量中止: {e.reason} ({e.detail})")
+        writer.writerow(["Aborted", e.reason, e.detail])
+    finally:
+        if records:
+            map_rows = drift_map_rows(records, joints)
+            worst = sorted(range(len(records)), key=lambda r: -records[r][1])[:MAP_WORST]
+            writer.writerow([])
+            writer.writerow(["Joint", "Range(deg)", "Poses", "Average Distance(mm)", "Success Rate(%)"])
+            writer.writerows(map_rows)
+            writer.writerow([])
+            writer.writerow(["Worst Pose"] + [f"J{k+1}(deg)" for k in range(7)] + ["Distance(mm)"])
+            writer.writerows([[plan.order[r]] + [f"{q:.2f}" for q in records[r][0]] + [f"{records[r][1]:.2f}"] for r in worst])
+        wd.stop()
+        stop_teleop()
+        saved = writer.close(complete=completed)
+        print(f"\nSaved drift map to {saved}")
+        profiler.stop(saved)
+        instr.write_report(saved)
+    if records:
+        print("\n关节  范围(deg)        Pose数  平均漂移(mm)  成功率(%)")
+        for row in map_rows:
+            print(f"{row[0]:<5} {row[1]:<16} {row[2]:<7} {row[3]:<13} {row[4]}")
+        rate = sum(ok for _, _, ok in records) / len(records) * 100
+        print(f"总成功率 {rate:.1f}% ({len(records)} 个 Pose)")
+    if completed:
+        move_route(leader, follower, plan.final_route, estimators)
 
 def safe_exit():
     stop_teleop()
@@ -136,9 +234,9 @@ def safe_exit():
 
 signal.signal(signal.SIGINT, lambda s,f: safe_exit())
 
-def main():
-    global teleop_pid, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
-    args = parse_args()
+def main(argv=None):
+    global leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
+    args = parse_args(argv)
     leader_robot_sn = args.leader
     follower_robot_sn = args.follower
     SUDO_PASSWORD = args.password
@@ -155,113 +253,111 @@ def main():
     else:
         is_auto = True
         print('当前测试teleop支持自动移动到测试pose.')
-    leader = flexivrdk.Robot(args.leader)
-    follower = flexivrdk.Robot(args.follower)
+    state_bus.open_from_args(args)
+    leader = state_bus.tap(instr.instrument_robot(connect(args.leader, flexivrdk), "leader"), "leader")
+    follower = state_bus.tap(instr.instrument_robot(connect(args.follower, flexivrdk), "follower"), "follower")
+    wd.configure_from_args(args, {"leader": leader, "follower": follower}).start()
+    estimators = [MotionTimeEstimator(args.leader), MotionTimeEstimator(args.follower)]
+    profiler = instr.Profiler(args.profile).start()
     print("Sync Home Pose...")
     current_mode = leader.mode()
-    move_j_deg(leader, HOME_POSE)
-    move_j_deg(follower, HOME_POSE)
-    wait_for_reached_or_timeout(leader, HOME_POSE, 2, 7)
-    wait_for_reached_or_timeout(follower, HOME_POSE, 2, 7)
+    move_route(leader, follower, [HOME_POSE], estimators)
     leader.SwitchMode(current_mode)
     follower.SwitchMode(current_mode)
     input("Home Pose synced. Press Enter to start Teleop...")
+    if (args.map or args.map_grid) and not is_auto:
+        print("漂移图需要自动 MoveJ，当前 Teleop 不支持。"); sys.exit(1)
     start_teleop(exe_path)
     time.sleep(7)
 
-    results=[]
-    for i in range(args.num):
-        if is_auto:
-            print(f"请踩住踏板等待机器人前往测试POSE，等待提示松开后再松开，提前松开踏板会报FAULT_OVERSPEED！")
-            while True:
-                try:
-                    pedal = leader.digital_inputs()[0]
-                except Exception:
-                    pedal = 0
-                if pedal == 1:
-                    break
-                time.sleep(0.05)
-            print(f"正在前往测试POSE...")
-            teleop_mode = leader.mode()
-            print(i)
-            if i>0:
-                move_j_deg(leader, test_pose[i-1])
-                move_j_deg(follower, test_pose[i-1])
-                wait_for_reached_or_timeout(leader, test_pose[i-1], 2, 5)
-                wait_for_reached_or_timeout(follower, test_pose[i-1], 2, 5)
-                move_j_deg(leader, test_pose[1])
-                move_j_deg(follower, test_pose[1])
-                wait_for_reached_or_timeout(leader, test_pose[1], 2, 5)
-                wait_for_reached_or_timeout(follower, test_pose[1], 2, 5)
-            move_j_deg(leader, test_pose[i])
-            move_j_deg(follower, test_pose[i])
-            wait_for_reached_or_timeout(leader, test_pose[i], 2, 5)
-            wait_for_reached_or_timeout(follower, test_pose[i], 2, 5)
-            print("到达测试Pose，请松开踏板")
-            while True:
-                try:
-                    pedal = leader.digital_inputs()[0]
-                except Exception:
-                    pedal = 0
-                if pedal == 0:
-                    break
-                time.sleep(0.05)
-            leader.SwitchMode(teleop_mode)
-            follower.SwitchMode(teleop_mode)
-        else:
-            input(f"请将末端移动到测试 Pose 后按 Enter 开始")
-        print(f"第 {i+1} 次测试已开始，请踩住踏板并等待提示。")
-        while True:
-            try:
-                pedal = leader.digital_inputs()[0]
-            except Exception:
-                pedal = 0
-            if pedal == 1:
-                break
-            time.sleep(0.05)
-        print("踏板已踩下，等待运动启动...")
-        dist, success = measure_hover(leader)
-        results.append((dist, success))
-        print(f"Distance: {dist} mm — {'Success' if success else 'Fail'}")
-        print(f"第 {i+1} 次测试已完成，请松开踏板。")
-        while True:
-            try:
-                pedal = leader.digital_inputs()[0]
-            except Exception:
-                pedal = 1
-            if pedal == 0:
-                break
-            time.sleep(0.05)
-    stop_teleop()
-    
-
     now=datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.map or args.map_grid:
+        run_drift_map(args, leader, follower, estimators, profiler, now)
+        return
+
+    # 规划测试 Pose 顺序 (测试次数超过 Pose 数时循环使用)
+    trial_poses = [k % len(test_pose) for k in range(args.num)]
+    # 规划使用学习后的运动时间模型 (以 leader 的模型为准)
+    plan = plan_sequence([test_pose[k] for k in trial_poses], HOME_POSE, SAFE_WAYPOINTS,
+                         end=test_pose[1], vel_scale=MOVEJ_VEL_SCALE,
+                         time_fn=estimators[0].time_fn, cache_tag=estimators[0].tag())
+    fixed_time = sequential_time([test_pose[k] for k in trial_poses], HOME_POSE, SAFE_WAYPOINTS,
+                                 end=test_pose[1], vel_scale=MOVEJ_VEL_SCALE, time_fn=estimators[0].time_fn)
+    print(f"测试 Pose 顺序: {[trial_poses[j] for j in plan.order]}，"
+          f"预计运动时间 {plan.total_time:.1f}s (固定顺序 {fixed_time:.1f}s)")
+
     csv_name=f"hover_summary_{now}.csv"
+    writer = ResultWriter(csv_name)
+    writer.writerow(["Test","Pose","Distance(mm)","Success"])
+    results=[]
+    move_timeouts = 0
+    completed = False
+    aborted = None
     try:
-        f = open(csv_name,"w",newline='', encoding="utf-8")
-        w=csv.writer(f)
-        w.writerow(["Test","Distance(mm)","Success"])
-        for i,(d,s) in enumerate(results,1):
-            w.writerow([i,d,"Yes" if s else "No"])
-        avg_dist = round(sum(d for d,_ in results)/len(results),2)
-        success_rate = round(sum(s for _,s in results)/len(results)*100,1)
-        w.writerow([])
-        w.writerow(["Average Distance(mm)",avg_dist])
-        w.writerow(["Success Rate(%)",success_rate])
-    except Exception as e:
-        print(f"[Error] {e}")
-    print(f"\nSaved results to {csv_name}")
-    print(f"Average Distance: {avg_dist} mm, Success Rate: {success_rate}%")
+        for i in range(args.num):
+            pose_idx = trial_poses[plan.order[i]]
+            if not is_auto:
+                input(f"请将末端移动到测试 Pose {pose_idx} 后按 Enter 开始")
+            with wd.watch(f"hover test {i+1}"):
+                if is_auto:
+                    print(f"请踩住踏板等待机器人前往测试POSE，等待提示松开后再松开，提前松开踏板会报FAULT_OVERSPEED！")
+                    wait_pedal(leader, 1, on_error=0)
+                    print(f"正在前往测试POSE {pose_idx}...")
+                    teleop_mode = leader.mode()
+                    n_timeout = move_route(leader, follower, plan.routes[i], estimators)
+                    move_timeouts += n_timeout
+                    if n_timeout:
+                        print("警告：未在预计时间内到达测试Pose，请确认机器人位置")
+                    print("到达测试Pose，请松开踏板")
+                    wait_pedal(leader, 0, on_error=0)
+                    leader.SwitchMode(teleop_mode)
+                    follower.SwitchMode(teleop_mode)
+                print(f"第 {i+1} 次测试已开始，请踩住踏板并等待提示。")
+                wait_pedal(leader, 1, on_error=0)
+                print("踏板已踩下，等待运动启动...")
+                dist, success = measure_hover(leader)
+                results.append((dist, success))
+                writer.writerow([i+1, pose_idx, dist, "Yes" if success else "No"])
+                writer.mark_trial_done()
+                print(f"Distance: {dist} mm — {'Success' if success else 'Fail'}")
+                print(f"第 {i+1} 次测试已完成，请松开踏板。")
+                wait_pedal(leader, 0, on_error=1)
+        if results:
+            avg_dist = round(sum(d for d,_ in results)/len(results),2)
+            success_rate = round(sum(s for _,s in results)/len(results)*100,1)
+            dist_ci = bootstrap_ci([d for d,_ in results])
+            rate_ci = bootstrap_ci([100.0 if s else 0.0 for _,s in results])
+            writer.writerow([])
+            writer.writerow(["Metric","Value"] + ci_header())
+            writer.writerow(["Average Distance(mm)",avg_dist] + ci_cells(dist_ci, ".2f"))
+            writer.writerow(["Success Rate(%)",success_rate] + ci_cells(rate_ci, ".1f"))
+        completed = True
+    except MeasurementAborted as e:
+        aborted = e
+        print(f"\n[Watchdog] 测量中止: {e.reason} ({e.detail})")
+        writer.writerow(["Aborted", e.reason, e.detail])
+    finally:
+        wd.stop()
+        stop_teleop()
+        saved = writer.close(complete=completed)
+        print(f"\nSaved results to {saved}")
+        profiler.stop(saved)
+        instr.write_report(saved)
+    if aborted is not None:
+        return
+    if results:
+        print(f"Average Distance: {format_ci(dist_ci, '.2f')} mm")
+        print(f"Success Rate: {format_ci(rate_ci, '.1f')} %")
+    else:
+        print("没有有效的测试数据。")
+    if move_timeouts:
+        print(f"MoveJ 超时次数: {move_timeouts}")
     print("Done.")
     time.sleep(3)
-    move_j_deg(leader, test_pose[9])
-    move_j_deg(follower, test_pose[9])
-    wait_for_reached_or_timeout(leader, test_pose[9], 2, 7)
-    wait_for_reached_or_timeout(follower, test_pose[9], 2, 7)
-    move_j_deg(leader, test_pose[1])
-    move_j_deg(follower, test_pose[1])
-    wait_for_reached_or_timeout(leader, test_pose[1], 2, 7)
-    wait_for_reached_or_timeout(follower, test_pose[1], 2, 7)
+    # 从当前实际位置规划回到 test_pose[1] 的路线 (必要时经过渡点)
+    current_deg = [math.degrees(x) for x in leader.states().q]
+    _, final_route = leg(current_deg, test_pose[1], SAFE_WAYPOINTS, MOVEJ_VEL_SCALE)
+    move_route(leader, follower, final_route, estimators)
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+friction_fit.py
+
+功能：
+1. 由采样的速度 v 与力 F 拟合摩擦模型 (全部采样一次向量化最小二乘，不再按段求 F/v 再平均)：
+   - 粘滞 + 库仑：F = B*v + Fc*sign(v)
+   - 可选 Stribeck：F = B*v + sign(v) * (Fc + (Fs - Fc) * exp(-(|v|/vs)^2))，vs 未给定时在对数网格上搜索残差最小者
+   常量摩擦力不再折算进 B，得到与拖动速度无关、可在不同 Teleop 版本间比较的参数。
+2. 输出参数的置信区间 (协方差 sigma^2 (X^T X)^-1，正态分位数)、RMSE、R^2 与残差数组。
+"""
+
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+V_MIN = 1e-3                          # |v| 低于该值的采样 sign(v) 不可靠，不参与拟合 (m/s)
+STRIBECK_VS_GRID = np.geomspace(0.002, 0.2, 25)
+
+# ci: {参数名: (下限, 上限)}；residuals 与参与拟合的采样一一对应；mask 标记参与拟合的采样
+FrictionFit = namedtuple("FrictionFit", ["B", "Fc", "Fs", "vs", "ci", "rmse", "r2", "n", "residuals", "mask"])
+
+
+def _design(v, vs):
+    sgn = np.sign(v)
+    cols = [v, sgn]
+    if vs is not None:
+        cols.append(sgn * np.exp(-(np.abs(v) / vs) ** 2))
+    return np.column_stack(cols)
+
+
+def _lstsq(X, f):
+    coef, _, rank, _ = np.linalg.lstsq(X, f, rcond=None)
+    resid = f - X @ coef
+    return coef, resid, rank
+
+
+def fit_friction(v, f, stribeck=False, vs=None, confidence=0.95, v_min=V_MIN):
+    """
+    v, f：一维数组 (同一方向上的速度与力)。返回 FrictionFit；有效采样不足时返回 None。
+    stribeck=True 时拟合 Stribeck 项 (Fs 为静摩擦峰值)；否则 Fs 与 vs 为 None。
+    """
+    v = np.asarray(v, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    mask = np.isfinite(v) & np.isfinite(f) & (np.abs(v) >= v_min)
+    vm, fm = v[mask], f[mask]
+    n_param = 3 if stribeck else 2
+    if vm.size <= n_param:
+        return None
+
+    if stribeck and vs is None:
+        best = None
+        for cand in STRIBECK_VS_GRID:
+            coef, resid, rank = _lstsq(_design(vm, cand), fm)
+            sse = float(resid @ resid)
+            if rank == n_param and (best is None or sse < best[0]):
+                best = (sse, cand)
+        if best is None:
+            return None
+        vs = float(best[1])
+    X = _design(vm, vs if stribeck else None)
+    coef, resid, rank = _lstsq(X, fm)
+    if rank < n_param:
+        return None
+
+    dof = max(vm.size - n_param, 1)
+    sigma2 = float(resid @ resid) / dof
+    cov = sigma2 * np.linalg.pinv(X.T @ X)
+    half = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(np.diag(cov))
+
+    B, Fc = float(coef[0]), float(coef[1])
+    ci = {"B": (B - half[0], B + half[0]), "Fc": (Fc - half[1], Fc + half[1])}
+    Fs = None
+    if stribeck:
+        Fs = Fc + float(coef[2])
+        # Var(Fs) = Var(Fc) + Var(dF) + 2 Cov(Fc, dF)
+        half_fs = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(cov[1, 1] + cov[2, 2] + 2 * cov[1, 2])
+        ci["Fs"] = (Fs - half_fs, Fs + half_fs)
+
+    ss_tot = float(((fm - fm.mean()) ** 2).sum())
+    r2 = 1.0 - float(resid @ resid) / ss_tot if ss_tot > 0 else float("nan")
+    rmse = float(np.sqrt(np.mean(resid ** 2)))
+    return FrictionFit(B, Fc, Fs, vs if stribeck else None, ci, rmse, r2, int(vm.size), resid, mask)
+
+
+def predict(fit, v):
+    """按拟合参数计算 F(v)。"""
+    v = np.asarray(v, dtype=np.float64)
+    F = fit.B * v + fit.Fc * np.sign(v)
+    if fit.Fs is not None:
+        F += np.sign(v) * (fit.Fs - fit.Fc) * np.exp(-(np.abs(v) / fit.vs) ** 2)
+    return F
+
+
+def fit_rows(name, fit):
+    """CSV 行：["FrictionFit", 名称, 参数, 置信区间..., RMSE, R2, N]。fit 为 None 时只写名称。"""
+    if fit is None:
+        return [["FrictionFit", name, "insufficient data"]]
+    rows = [["FrictionFit", name, "N", fit.n, "RMSE(N)", f"{fit.rmse:.4f}", "R2", f"{fit.r2:.4f}"]]
+    for key, value in (("B", fit.B), ("Fc", fit.Fc), ("Fs", fit.Fs)):
+        if value is None:
+            continue
+        lo, hi = fit.ci[key]
+        rows.append(["", key, f"{value:.4f}", "CI95", f"{lo:.4f}", f"{hi:.4f}"])
+    if fit.vs is not None:
+        rows.append(["", "vs", f"{fit.vs:.4f}"])
+    return rows
+
+
+def format_fit(fit):
+    if fit is None:
+        return "insufficient data"
+    s = (f"B={fit.B:.3f} [{fit.ci['B'][0]:.3f}, {fit.ci['B'][1]:.3f}] N*s/m, "
+         f"Fc={fit.Fc:.3f} [{fit.ci['Fc'][0]:.3f}, {fit.ci['Fc'][1]:.3f}] N")
+    if fit.Fs is not None:
+        s += f", Fs={fit.Fs:.3f} N, vs={fit.vs:.4f} m/s"
+    return s + f", RMSE={fit.rmse:.3f} N, R2={fit.r2:.3f}, N={fit.n}"
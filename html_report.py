@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+html_report.py
+
+功能：
+1. 将一次测试会话的输出目录 (各测量脚本写出的 CSV，含 .partial 与 *_timing.csv) 生成单个静态 HTML 报告，
+   不依赖外部资源 (图为内联 SVG，样式内联)，可直接用浏览器打开或作为附件发送。
+2. 曲线图：
+   - damping_data_* / auto_damping_*：每个方向 (每次运行) 的 |v|、|F| 沿测试方向投影随时间的曲线；
+   - tracking_stiffness_samples_*：每个轴按测试次数分组的主从位置差 (mm) 与从侧外力 (有滤波列时使用滤波值)；
+   - transparency_samples_*：每次测试主/从 Fx, Fy, Fz；
+   - maxcontactwrench_samples_*：每个设定值按测试次数分组的从侧 Z 向外力。
+   长曲线按 LTTB (Largest-Triangle-Three-Buckets) 降采样到 --points 个点 (默认 800)，保留峰值与形状，
+   一小时的记录生成的报告仍然很小、打开即渲染。
+3. 表格：采样块以外的所有 CSV 块 (分段结果、拟合、汇总、置信区间、计时报告等) 按原样渲染为表格。
+
+用法示例：
+    python html_report.py                       # 当前目录 -> ./report_<目录名>.html
+    python html_report.py runs/20240601 -o report.html --points 1200
+"""
+
+import argparse
+import csv
+import glob
+import html
+import os
+from datetime import datetime
+
+import numpy as np
+
+from wrench_analysis import parse_axis
+
+DEFAULT_POINTS = 800
+PLOT_WIDTH = 760
+PLOT_HEIGHT = 240
+MARGIN = (64, 16, 26, 34)  # 左, 右, 上, 下
+COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#17becf")
+
+DAMPING_HEADER = ["time_s", "px", "py", "pz", "vx", "vy", "vz", "fx", "fy", "fz", "dist_abs"]
+
+STYLE = """
+body { font-family: sans-serif; margin: 24px; color: #222; }
+h1 { font-size: 22px; } h2 { font-size: 18px; border-bottom: 1px solid #ccc; padding-bottom: 4px; margin-top: 32px; }
+h3 { font-size: 15px; margin: 18px 0 6px; }
+table { border-collapse: collapse; margin: 6px 0 12px; font-size: 12px; }
+td, th { border: 1px solid #ddd; padding: 2px 8px; text-align: right; }
+th { background: #f3f3f3; } td:first-child, th:first-child { text-align: left; }
+.meta { color: #666; font-size: 12px; } svg { display: block; margin: 4px 0 10px; }
+"""
+
+
+# ---------- 降采样 ----------
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 降采样，返回选中点的下标 (升序)。n_out >= 3。"""
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 首尾两点固定，中间 n-2 个点均分为 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个桶的平均点 (最后一个桶用末点)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+# ---------- SVG ----------
+
+def _ticks(lo, hi, n=5):
+    return np.linspace(lo, hi, n)
+
+
+def svg_plot(series, title, xlabel, ylabel, points=DEFAULT_POINTS):
+    """series: [(名称, x, y), ...]，x/y 为一维数组；非有限值被丢弃。"""
+    clean = []
+    for name, x, y in series:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y = x[ok], y[ok]
+        if x.size:
+            keep = lttb(x, y, points)
+            clean.append((name, x[keep], y[keep]))
+    if not clean:
+        return f"<p class='meta'>{html.escape(title)}：无数据</p>"
+    x_lo = min(float(x.min()) for _, x, _ in clean)
+    x_hi = max(float(x.max()) for _, x, _ in clean)
+    y_lo = min(float(y.min()) for _, _, y in clean)
+    y_hi = max(float(y.max()) for _, _, y in clean)
+    if x_hi <= x_lo:
+        x_hi = x_lo + 1.0
+    if y_hi <= y_lo:
+        y_lo, y_hi = y_lo - 0.5, y_hi + 0.5
+    left, right, top, bottom = MARGIN
+    pw = PLOT_WIDTH - left - right
+    ph = PLOT_HEIGHT - top - bottom
+
+    def sx(v):
+        return left + (v - x_lo) / (x_hi - x_lo) * pw
+
+    def sy(v):
+        return top + ph - (v - y_lo) / (y_hi - y_lo) * ph
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{PLOT_WIDTH}" height="{PLOT_HEIGHT}" '
+           f'font-size="11" font-family="sans-serif">',
+           f'<text x="{left}" y="14" font-weight="bold">{html.escape(title)}</text>']
+    for v in _ticks(x_lo, x_hi):
+        px = sx(v)
+        out.append(f'<line x1="{px:.1f}" y1="{top}" x2="{px:.1f}" y2="{top + ph}" stroke="#eee"/>'
+                   f'<text x="{px:.1f}" y="{top + ph + 13}" text-anchor="middle">{v:.3g}</text>')
+    for v in _ticks(y_lo, y_hi):
+        py = sy(v)
+        out.append(f'<line x1="{left}" y1="{py:.1f}" x2="{left + pw}" y2="{py:.1f}" stroke="#eee"/>'
+                   f'<text x="{left - 4}" y="{py + 4:.1f}" text-anchor="end">{v:.3g}</text>')
+    out.append(f'<rect x="{left}" y="{top}" width="{pw}" height="{ph}" fill="none" stroke="#999"/>')
+    out.append(f'<text x="{left + pw / 2:.0f}" y="{PLOT_HEIGHT - 4}" text-anchor="middle">{html.escape(xlabel)}</text>')
+    out.append(f'<text x="12" y="{top + ph / 2:.0f}" text-anchor="middle" '
+               f'transform="rotate(-90 12 {top + ph / 2:.0f})">{html.escape(ylabel)}</text>')
+    for k, (name, x, y) in enumerate(clean):
+        color = COLORS[k % len(COLORS)]
+        pts = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(sx(x), sy(y)))
+        out.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.2" points="{pts}"/>')
+        out.append(f'<text x="{left + pw - 4}" y="{top + 12 + 13 * k}" text-anchor="end" fill="{color}">'
+                   f'{html.escape(name)}</text>')
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def html_table(rows):
+    if not rows:
+        return ""
+    width = max(len(r) for r in rows)
+    out = ["<table>"]
+    for i, row in enumerate(rows):
+        cells = list(row) + [""] * (width - len(row))
+        tag = "th" if i == 0 and len(rows) > 1 and not _is_numeric_row(row) else "td"
+        out.append("<tr>" + "".join(f"<{tag}>{html.escape(str(c))}</{tag}>" for c in cells) + "</tr>")
+    out.append("</table>")
+    return "\n".join(out)
+
+
+# ---------- CSV ----------
+
+def _is_float(s):
+    try:
+        float(s)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_numeric_row(row):
+    return bool(row) and all(_is_float(c) for c in row if c != "")
+
+
+def read_blocks(path):
+    """按空行切分 CSV，返回行块列表。"""
+    blocks, cur = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not any(c.strip() for c in row):
+                if cur:
+                    blocks.append(cur)
+                cur = []
+            else:
+                cur.append(row)
+    if cur:
+        blocks.append(cur)
+    return blocks
+
+
+def _numeric(rows, ncols):
+    """行列表 -> N x ncols 浮点数组，非数值单元为 nan。"""
+    try:
+        data = np.array([r[:ncols] for r in rows], dtype=np.float64)
+        if data.shape == (len(rows), ncols):
+            return data
+    except ValueError:
+        pass
+    data = np.full((len(rows), ncols), np.nan)
+    for i, row in enumerate(rows):
+        for j, c in enumerate(row[:ncols]):
+            if _is_float(c):
+                data[i, j] = float(c)
+    return data
+
+
+def _sample_rows(blocks):
+    """采样文件：首行为表头，其余各块均为采样行。"""
+    return blocks[0][0], blocks[0][1:] + [r for b in blocks[1:] for r in b]
+
+
+def _groups(rows, key_cols):
+    """按前 key_cols 列分组 (保持首次出现顺序)，返回 {键: 行列表}。"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[:key_cols]), []).append(row[key_cols:])
+    return groups
+
+
+# ---------- 各类文件 ----------
+
+def damping_sections(blocks, points):
+    """damping_data_* / auto_damping_*：Direction= 开头且表头为 DAMPING_COLUMNS 的块画曲线，其余块为表格。"""
+    out = []
+    for block in blocks:
+        if block[0] and block[0][0].startswith("Direction=") and len(block) > 1 and block[1] == DAMPING_HEADER:
+            title = " ".join(c for c in block[0] if c)
+            data = _numeric(block[2:], len(DAMPING_HEADER))
+            out.append(f"<h3>{html.escape(title)}</h3>")
+            if not len(data):
+                out.append("<p class='meta'>无采样</p>")
+                continue
+            col = {c: data[:, k] for k, c in enumerate(DAMPING_HEADER)}
+            try:
+                axis, _ = parse_axis(block[0][0].split("=", 1)[1])
+                v = np.abs(col[("vx", "vy", "vz")[axis]])
+                f = np.abs(col[("fx", "fy", "fz")[axis]])
+            except ValueError:
+                v = np.sqrt(col["vx"] ** 2 + col["vy"] ** 2 + col["vz"] ** 2)
+                f = np.sqrt(col["fx"] ** 2 + col["fy"] ** 2 + col["fz"] ** 2)
+            t = col["time_s"] - col["time_s"][0]
+            out.append(f"<p class='meta'>{len(data)} 个采样，末端位移 {np.nanmax(col['dist_abs'])*100:.1f} cm</p>")
+            out.append(svg_plot([("|v|", t, v)], "速度 (测试方向投影)", "t (s)", "m/s", points))
+            out.append(svg_plot([("|F|", t, f)], "外力 (测试方向投影)", "t (s)", "N", points))
+        else:
+            out.append(html_table(block))
+    return out
+
+
+def stiffness_sections(blocks, points):
+    header, rows = _sample_rows(blocks)
+    cols = {c: k for k, c in enumerate(header[2:])}  # 去掉 Axis, Trial 后的列号
+    suffix = "_f" if "master_pos_f" in cols else ""
+    out = []
+    for axis, axis_rows in _groups(rows, 1).items():
+        delta, force = [], []
+        for (trial,), trows in _groups(axis_rows, 1).items():
+            data = _numeric(trows, len(cols))
+            t = data[:, cols["t_follower"]] - data[0, cols["t_follower"]]
+            d = (data[:, cols["slave_pos" + suffix]] - data[:, cols["master_pos" + suffix]]) * 1000
+            delta.append((f"trial {trial}", t, d))
+            force.append((f"trial {trial}", t, data[:, cols["F_slave" + suffix]]))
+        out.append(f"<h3>Axis {html.escape(axis[0])}</h3>")
+        out.append(svg_plot(delta, "主从位置差 slave - master", "t (s)", "mm", points))
+        out.append(svg_plot(force, "从侧外力", "t (s)", "N", points))
+    return out
+
+
+def transparency_sections(blocks, points):
+    header, rows = _sample_rows(blocks)
+    cols = {c: k for k, c in enumerate(header[1:])}  # 去掉 Test Number 后的列号
+    out = []
+    for (test,), trows in _groups(rows, 1).items():
+        data = _numeric(trows, len(cols))
+        out.append(f"<h3>Test {html.escape(test)}</h3>")
+        for side, tcol, label in (("m", "t_leader", "主侧外力"), ("s", "t_follower", "从侧外力")):
+            t = data[:, cols[tcol]] - data[0, cols[tcol]]
+            series = [(f"{side}_{a}", t, data[:, cols[f"{side}_{a}"]]) for a in ("Fx", "Fy", "Fz")]
+            out.append(svg_plot(series, label, "t (s)", "N", points))
+    return out
+
+
+def contact_sections(blocks, points):
+    _, rows = _sample_rows(blocks)
+    out = []
+    by_setpoint = {}
+    for row in rows:
+        by_setpoint.setdefault(row[1], []).append(row)
+    for sp, sp_rows in by_setpoint.items():
+        series = []
+        for (test,), trows in _groups(sp_rows, 1).items():
+            data = _numeric(trows, 3)
+            t = data[:, 1] - data[0, 1]  # trows: [设定值, t_follower (早期记录为 time_s), F_slave_z, ...]
+            series.append((f"test {test}", t, data[:, 2]))
+        out.append(f"<h3>Set value {html.escape(sp)} N</h3>")
+        out.append(svg_plot(series, "从侧 Z 向外力", "t (s)", "N", points))
+    return out
+
+
+SAMPLE_PLOTTERS = (
+    ("damping_data_", damping_sections),
+    ("auto_damping_", damping_sections),
+    ("tracking_stiffness_samples_", stiffness_sections),
+    ("transparency_samples_", transparency_sections),
+    ("maxcontactwrench_samples_", contact_sections),
+)
+
+
+def file_sections(path, points):
+    name = os.path.basename(path)
+    blocks = read_blocks(path)
+    if not blocks:
+        return ["<p class='meta'>空文件</p>"]
+    for prefix, plotter in SAMPLE_PLOTTERS:
+        if name.startswith(prefix) and "_timing" not in name:
+            try:
+                return plotter(blocks, points)
+            except (KeyError, IndexError, ValueError) as e:
+                return [f"<p class='meta'>无法解析采样数据 ({html.escape(repr(e))})，按表格显示：</p>"] + \
+                       [html_table(b) for b in blocks]
+    return [html_table(b) for b in blocks]
+
+
+# ---------- 报告 ----------
+
+def build_report(run_dir, points=DEFAULT_POINTS):
+    files = sorted(glob.glob(os.path.join(run_dir, "*.csv")) + glob.glob(os.path.join(run_dir, "*.csv.partial")))
+    title = f"Teleop benchmark report — {os.path.basename(os.path.abspath(run_dir))}"
+    body = [f"<h1>{html.escape(title)}</h1>",
+            f"<p class='meta'>目录 {html.escape(os.path.abspath(run_dir))}，生成于 "
+            f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}，共 {len(files)} 个文件</p>",
+            "<ul>" + "".join(f"<li><a href='#f{i}'>{html.escape(os.path.basename(p))}</a></li>"
+                             for i, p in enumerate(files)) + "</ul>"]
+    for i, path in enumerate(files):
+        name = os.path.basename(path)
+        note = " (未完成会话)" if name.endswith(".partial") else ""
+        body.append(f"<h2 id='f{i}'>{html.escape(name)}{note}</h2>")
+        body.extend(file_sections(path, points))
+    return ("<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+            f"<title>{html.escape(title)}</title><style>{STYLE}</style></head>\n<body>\n"
+            + "\n".join(body) + "\n</body></html>\n")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Generate a self-contained HTML report from a run directory")
+    p.add_argument("run_dir", nargs="?", default=".", help="测试输出目录 (默认当前目录)")
+    p.add_argument("-o", "--output", help="输出 HTML 文件 (默认 <run_dir>/report_<目录名>.html)")
+    p.add_argument("--points", type=int, default=DEFAULT_POINTS, help=f"每条曲线最多点数 (默认 {DEFAULT_POINTS})")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.output or os.path.join(
+        args.run_dir, f"report_{os.path.basename(os.path.abspath(args.run_dir))}.html")
+    content = build_report(args.run_dir, args.points)
+    tmp = out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, out)
+    print(f"报告已写入 {out} ({len(content) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+instrumentation.py
+
+功能：
+1. 常驻的轻量计时层：每个计时点 (site) 持有预分配的对数分桶直方图 (第 k 桶为 [2^(k-1), 2^k) ns)，
+   record() 只做一次 bit_length 和几次整数加法，不分配内存。
+   设置环境变量 TELEOP_BENCH_TIMING=0 可关闭，此时 site() 返回空实现。
+2. instrument_robot() 为 flexivrdk.Robot 包一层代理，自动统计 states()/digital_inputs()/mode()/SwitchMode()/
+   ExecutePrimitive()/Stop() 的调用耗时；sleep() 统计采样周期内 sleep 的超时量 (overshoot)。
+3. write_report(csv_path) 在结果 CSV 旁写出 "<name>_timing.csv" 计时报告 (次数、均值、p50/p90/p99、最大值、总耗时)。
+4. 可选性能剖析：--profile cprofile 输出 "<name>.prof" (cProfile)，--profile sample 以采样方式
+   抓取主线程调用栈，输出 "<name>_stacks.txt" (collapsed stack 格式，可直接生成火焰图)。
+"""
+
+import collections
+import cProfile
+import csv
+import os
+import sys
+import threading
+import time
+from array import array
+
+now = time.perf_counter_ns
+
+ENABLED = os.environ.get("TELEOP_BENCH_TIMING", "1") != "0"
+N_BINS = 64
+
+_sites = {}
+_t_start = now()
+
+
+class TimingSite:
+    __slots__ = ("name", "counts", "n", "total_ns", "max_ns")
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = array('Q', bytes(8 * N_BINS))
+        self.n = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, dt_ns):
+        if dt_ns < 0:
+            dt_ns = 0
+        self.counts[dt_ns.bit_length()] += 1
+        self.n += 1
+        self.total_ns += dt_ns
+        if dt_ns > self.max_ns:
+            self.max_ns = dt_ns
+
+    def percentile(self, q):
+        """由直方图估计分位数 (返回所在桶的几何中点, 单位 ns)。"""
+        if self.n == 0:
+            return 0.0
+        target = q * self.n
+        acc = 0
+        for k, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                if k == 0:
+                    return 0.0
+                lo, hi = 1 << (k - 1), (1 << k) - 1
+                return min((lo * hi) ** 0.5, float(self.max_ns))
+        return float(self.max_ns)
+
+    def reset(self):
+        for k in range(N_BINS):
+            self.counts[k] = 0
+        self.n = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class _NullSite:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def record(self, dt_ns):
+        pass
+
+
+def site(name):
+    """获取 (或创建) 名为 name 的计时点。应在模块/函数初始化时获取一次，循环中直接调用 record()。"""
+    s = _sites.get(name)
+    if s is None:
+        s = TimingSite(name) if ENABLED else _NullSite(name)
+        _sites[name] = s
+    return s
+
+
+def sleep(seconds, _site=None):
+    """time.sleep 的计时版本，记录实际睡眠时长超出 seconds 的部分 (sleep.overshoot)。"""
+    t0 = now()
+    time.sleep(seconds)
+    (_site or _SLEEP_OVERSHOOT).record(now() - t0 - int(seconds * 1e9))
+
+
+_SLEEP_OVERSHOOT = site("sleep.overshoot")
+
+
+class InstrumentedRobot:
+    """flexivrdk.Robot 代理：常用 SDK 调用计时，其余属性透传。"""
+
+    def __init__(self, robot, label):
+        self._robot = robot
+        self._label = label
+        self._s_states = site(f"{label}.states")
+        self._s_dio = site(f"{label}.digital_inputs")
+        self._s_mode = site(f"{label}.mode")
+        self._s_switch = site(f"{label}.SwitchMode")
+        self._s_exec = site(f"{label}.ExecutePrimitive")
+        self._s_stop = site(f"{label}.Stop")
+
+    def states(self):
+        t0 = now()
+        st = self._robot.states()
+        self._s_states.record(now() - t0)
+        return st
+
+    def digital_inputs(self):
+        t0 = now()
+        di = self._robot.digital_inputs()
+        self._s_dio.record(now() - t0)
+        return di
+
+    def mode(self):
+        t0 = now()
+        m = self._robot.mode()
+        self._s_mode.record(now() - t0)
+        return m
+
+    def SwitchMode(self, mode):
+        t0 = now()
+        r = self._robot.SwitchMode(mode)
+        self._s_switch.record(now() - t0)
+        return r
+
+    def ExecutePrimitive(self, *args, **kwargs):
+        t0 = now()
+        r = self._robot.ExecutePrimitive(*args, **kwargs)
+        self._s_exec.record(now() - t0)
+        return r
+
+    def Stop(self):
+        t0 = now()
+        r = self._robot.Stop()
+        self._s_stop.record(now() - t0)
+        return r
+
+    def __getattr__(self, name):
+        return getattr(self._robot, name)
+
+
+def instrument_robot(robot, label):
+    return InstrumentedRobot(robot, label) if ENABLED else robot
+
+
+def report_rows():
+    rows = []
+    for s in _sites.values():
+        if not isinstance(s, TimingSite) or s.n == 0:
+            continue
+        rows.append((s.name, s.n, s.total_ns / s.n / 1e3, s.percentile(0.5) / 1e3, s.percentile(0.9) / 1e3,
+                     s.percentile(0.99) / 1e3, s.max_ns / 1e3, s.total_ns / 1e9))
+    rows.sort(key=lambda r: -r[7])
+    return rows
+
+
+def report_base(csv_path):
+    """结果 CSV 路径 (可能为 .partial) 去掉扩展名后的前缀。"""
+    base = csv_path[:-len(".partial")] if csv_path.endswith(".partial") else csv_path
+    return os.path.splitext(base)[0]
+
+
+def write_report(csv_path):
+    """在结果 CSV 旁写出计时报告并打印摘要，返回报告路径。"""
+    rows = report_rows()
+    if not rows:
+        return None
+    path = report_base(csv_path) + "_timing.csv"
+    wall_s = (now() - _t_start) / 1e9
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Timing Report", f"wall_s={wall_s:.3f}"])
+        w.writerow(["site", "count", "mean_us", "p50_us", "p90_us", "p99_us", "max_us", "total_s", "share_%"])
+        for name, n, mean, p50, p90, p99, mx, total in rows:
+            w.writerow([name, n, f"{mean:.1f}", f"{p50:.1f}", f"{p90:.1f}", f"{p99:.1f}", f"{mx:.1f}",
+                        f"{total:.3f}", f"{total / wall_s * 100:.1f}"])
+    print("\n========== 计时报告 (us) ==========")
+    for name, n, mean, p50, p90, p99, mx, total in rows:
+        print(f"  {name:<28} n={n:<7} mean={mean:9.1f} p50={p50:9.1f} p99={p99:9.1f} max={mx:9.1f}")
+    print(f"计时报告已写入 {path}")
+    return path
+
+
+# =========== 可选性能剖析 ===========
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+def add_profile_argument(parser):
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="性能剖析模式: cprofile 或 sample (采样调用栈)")
+
+
+class _StackSampler:
+    """后台线程按固定间隔抓取目标线程调用栈，统计 collapsed stack。"""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if parts:
+                self.stacks[";".join(reversed(parts))] += 1
+
+
+class Profiler:
+    """mode 为 None 时不做任何事；否则 start()/stop(csv_path) 之间的执行被剖析并写到结果 CSV 旁。"""
+
+    def __init__(self, mode=None):
+        self.mode = mode
+        self._impl = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._impl = cProfile.Profile()
+            self._impl.enable()
+        elif self.mode == "sample":
+            self._impl = _StackSampler()
+            self._impl.start()
+        return self
+
+    def stop(self, csv_path):
+        if self._impl is None:
+            return None
+        base = report_base(csv_path)
+        if self.mode == "cprofile":
+            self._impl.disable()
+            path = base + ".prof"
+            self._impl.dump_stats(path)
+        else:
+            self._impl.stop()
+            path = base + "_stacks.txt"
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self._impl.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        self._impl = None
+        print(f"性能剖析结果已写入 {path}")
+        return path
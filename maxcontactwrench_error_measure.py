@@ -5,33 +5,82 @@
 maxcontactwrench_error_measure.py
 
 功能：
-1. 通过命令行参数 (-1, -2, -n) 获取主/从机械臂序列号。
-2. 需要用户提前准备好可以切换max_contact_wrench的遥操作程序例程。
-3. 同步主/从机械臂到 Home Pose，然后等待用户启动例程，并按 Enter 开始测试。
-4. 提示用户输入最大接触力限制设定值（单位 N）。
+1. 通过命令行参数 (-1, -2, -p, -n) 获取主/从机械臂序列号、sudo 密码及每个设定值的测试次数 (默认3次)。
+2. 自动模式 (默认)：在伪终端中启动 test_high_transparency_teleop_switch_contact_wrench，
+   由脚本发送 r 键 engage，并依次发送 x/y/z 键切换最大接触力限制 15.0/5.0/1.0 N (--setpoints 可选子集)，
+   一次会话完成全部设定值的扫描，每条结果自动标注设定值。
+3. --manual：保留原流程，由用户手动启动例程、切换限制并输入当前设定值。
+4. 每次测试前等待用户按 Enter (抬起机械臂、准备下压)。
 5. 在遥操作运行过程中，提示用户用主手向下施加远大于设定值的力，使从手末端接触外界；
    当检测到主手 Z 方向外力连续 3 秒大于 20 N 时，在该区间内采集从手 Z 方向外力数据，并计算平均值。
-6. 每次测试结束后，重复测试 3 次；最后输出每次测试结果及平均值，并保存到 CSV 文件中。
+6. 每个设定值重复测试 n 次；每次测试结果及其有效区间内的主从力采样 (各带单调采集时间戳 t_leader/t_follower，
+   3 秒有效区间也按该时钟判断，不受系统时钟调整影响) 在测试结束时即追加写入 CSV 并落盘，
+   最后输出各设定值及总体的平均值并写入汇总。
 """
 
 import argparse
+import os
 import time
 import signal
 import sys
-import csv
 from datetime import datetime
 
 import flexivrdk
 
+from result_writer import ResultWriter
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from sample_buffer import SampleBuffer
+from timebase import Timebase, timed_states
+from teleop_process import TeleopProcess
+import instrumentation as instr
+from measurement_watchdog import Watchdog, MeasurementAborted, STALLED, add_watchdog_arguments
+from robot_daemon import connect
+from benchmark_analysis import contact_error
+import state_bus
+
+teleop = TeleopProcess()
+wd = Watchdog(teleop)
+tb = Timebase()
+
+# 有效区间采样列：从侧/主侧各自的采集时刻 (单调时钟) 与 Z 向外力
+CONTACT_COLUMNS = ("t_follower", "F_slave_z", "t_leader", "F_master_z")
+
 # 测试参数
 valid_duration = 3.0            # 连续有效时长 (秒)
 nTests = 3                      # 测试次数，默认为3
 
-def parse_args():
+TELEOP_EXE = "./test_high_transparency_teleop_switch_contact_wrench"
+ENGAGE_KEY = "r"
+SETPOINT_KEYS = {15.0: "x", 5.0: "y", 1.0: "z"}   # 例程中切换最大接触力限制的按键
+
+_T_LOOP   = instr.site("contact.loop")
+_T_APPEND = instr.site("contact.append")
+_T_PRINT  = instr.site("contact.print")
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Max Contact Wrench Error Measurement")
     parser.add_argument("-1", "--leader", required=True, help="主机械臂序列号")
     parser.add_argument("-2", "--follower", required=True, help="从机械臂序列号")
-    return parser.parse_args()
+    parser.add_argument("-p", "--password", help="sudo 密码，用以开启关闭遥操作 (自动模式必需)")
+    parser.add_argument("-n", "--num", type=int, default=nTests, help=f"每个设定值的测试次数 (默认{nTests}次)")
+    parser.add_argument("--setpoints", default="15,5,1", help="自动模式扫描的设定值 N (默认 15,5,1)")
+    parser.add_argument("--exe", default=TELEOP_EXE, help=f"遥操作例程路径 (默认 {TELEOP_EXE})")
+    parser.add_argument("--settle", type=float, default=7.0, help="启动例程后的等待时间 s (默认7)")
+    parser.add_argument("--manual", action="store_true", help="手动启动例程并输入设定值 (原流程)")
+    add_watchdog_arguments(parser, progress="主侧力未超过设定值；该次测试记为无效并继续")
+    state_bus.add_bus_argument(parser)
+    instr.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    args.setpoints = [float(x) for x in args.setpoints.split(",") if x.strip()]
+    if not args.manual:
+        if not args.password:
+            parser.error("自动模式需要 -p 指定 sudo 密码，或使用 --manual")
+        for sp in args.setpoints:
+            if sp not in SETPOINT_KEYS:
+                parser.error(f"例程不支持设定值 {sp} N (支持 {sorted(SETPOINT_KEYS)})")
+        if not os.access(args.exe, os.X_OK):
+            parser.error(f"找不到可执行的遥操作例程 {args.exe}")
+    return args
 
 def measure_max_contact_error(leader_robot, follwer_robot, set_value):
     """
@@ -39,72 +88,144 @@ def measure_max_contact_error(leader_robot, follwer_robot, set_value):
       提示用户用主手向下施加大于设定值的力，使从手末端接触外界。
       当检测到主侧 Z 方向外力连续 3 秒大于 set_value 时，
       在该区间内采集从手 Z 方向外力数据，并计算平均值。
-    返回：平均从侧力及误差百分比
+    返回：平均从侧力、误差百分比及有效区间内的从侧力采样
     """
     print(f"请用主手向下施加大于 {set_value:.1f} N 的力，使从手末端接触外界。")
     valid_start = None
-    slave_values = []
+    slave_values = SampleBuffer(CONTACT_COLUMNS, capacity=int(valid_duration/0.01)*2)
     while True:
-        F_master = leader_robot.states().ext_wrench_in_world[2]
-        F_slave = follwer_robot.states().ext_wrench_in_world[2]
+        wd.check()
+        t_loop = instr.now()
+        t_master, leader_states = timed_states(leader_robot, tb)
+        t_slave, follower_states = timed_states(follwer_robot, tb)
+        F_master = leader_states.ext_wrench_in_world[2]
+        F_slave = follower_states.ext_wrench_in_world[2]
+        t0 = instr.now()
         print(f"\r主侧力 = {F_master: .2f} N, 从侧力 = {F_slave: .2f} N", end="", flush=True)
+        _T_PRINT.record(instr.now() - t0)
         if abs(F_master) >= set_value:
             if valid_start is None:
-                valid_start = time.time()
-                slave_values = []
-            slave_values.append(F_slave)
+                valid_start = t_master
+                slave_values.clear()
+            wd.progress()
+            t0 = instr.now()
+            slave_values.append(t_slave, F_slave, t_master, F_master)
+            _T_APPEND.record(instr.now() - t0)
         else:
             valid_start = None
-            slave_values = []
-        if valid_start is not None and (time.time() - valid_start) >= valid_duration:
+            slave_values.clear()
+        if valid_start is not None and t_master - valid_start >= valid_duration:
             print("检测到主侧力大于threshold持续3秒。")
             break
-        time.sleep(0.01)
-    avg_slave = sum(slave_values)/len(slave_values) if slave_values else 0.0
-    error_percent = abs(avg_slave - set_value)/set_value * 100 if set_value != 0 else float('inf')
+        instr.sleep(0.01)
+        _T_LOOP.record(instr.now() - t_loop)
+    avg_slave, error_percent = contact_error(slave_values["t_follower"], slave_values["F_slave_z"], set_value)
     print(f"测得平均从侧力: {avg_slave:.4f} N, 设定值: {set_value:.4f} N, 误差: {error_percent:.2f}%")
-    return avg_slave, error_percent
+    return avg_slave, error_percent, slave_values
 
 def signal_handler(sig, frame):
     print("\n检测到中断。程序退出。")
+    teleop.stop()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 
-def main():
-    args = parse_args()
-    leader_robot = flexivrdk.Robot(args.leader)
-    follower_robot = flexivrdk.Robot(args.follower)
-
-    input("请手动启动test_high_transparency_teleop_switch_contact_wrench，启动完成后按 Enter 继续...")
-    print("test_high_transparency_teleop_switch_contact_wrench例程r键engage, x,y,z键可以调整 maxcontactwrench to 15.0, 5.0, 1.0")
-    set_value = float(input("请输入当前设置的最大接触力限制设定值 (单位 N): "))
-    test_results = []
-    for i in range(nTests):
-        avg_slave, error = measure_max_contact_error(leader_robot, follower_robot, set_value)
-        test_results.append((avg_slave, error))
-        print(f"第 {i+1} 次测试：平均从侧力 = {avg_slave:.4f} N，误差 = {error:.2f}%")
-        input("请抬起机械臂后按 Enter 继续下一次测试...")
-
-    avg_all = sum(x[0] for x in test_results) / len(test_results)
-    err_all = sum(x[1] for x in test_results) / len(test_results)
-    print("\n========== 测试结果 ==========")
-    for i, (val, err) in enumerate(test_results, 1):
-        print(f"第 {i} 次：平均从侧力 = {val:.4f} N，误差 = {err:.2f}%")
-    print(f"总体平均从侧力 = {avg_all:.4f} N，平均误差 = {err_all:.2f}%")
-    
+def setpoint_schedule(args):
+    """
+    返回逐个设定值的生成器：自动模式下启动例程并发送切换按键，手动模式下提示用户输入。
+    """
+    if args.manual:
+        input("请手动启动test_high_transparency_teleop_switch_contact_wrench，启动完成后按 Enter 继续...")
+        print("test_high_transparency_teleop_switch_contact_wrench例程r键engage, x,y,z键可以调整 maxcontactwrench to 15.0, 5.0, 1.0")
+        while True:
+            yield float(input("请输入当前设置的最大接触力限制设定值 (单位 N): "))
+            if input("是否继续测试其他设定值? (y/N): ").strip().lower() != "y":
+                return
+    teleop.start(args.exe, args.leader, args.follower, args.password, use_pty=True)
+    time.sleep(args.settle)
+    teleop.refresh_tree()
+    if not teleop.alive():
+        raise RuntimeError("遥操作例程启动失败")
+    print("[Teleop] engage")
+    teleop.send_keys(ENGAGE_KEY)
+    for sp in args.setpoints:
+        print(f"[Teleop] 切换最大接触力限制 -> {sp:.1f} N (按键 {SETPOINT_KEYS[sp]})")
+        teleop.send_keys(SETPOINT_KEYS[sp])
+        time.sleep(1.0)
+        yield sp
+
+def main(argv=None):
+    args = parse_args(argv)
+    state_bus.open_from_args(args)
+    leader_robot = state_bus.tap(instr.instrument_robot(connect(args.leader, flexivrdk), "leader"), "leader")
+    follower_robot = state_bus.tap(instr.instrument_robot(connect(args.follower, flexivrdk), "follower"), "follower")
+    wd.configure_from_args(args, {"leader": leader_robot, "follower": follower_robot}).start()
+    profiler = instr.Profiler(args.profile).start()
+
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     csv_filename = f"maxcontactwrench_summary_{now_str}.csv"
-    with open(csv_filename, "w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Max Contact Wrench Error Measurement Summary", now_str])
-        writer.writerow(["Test Number", "Average Slave Force (N)", "Error (%)"])
-        for i, (val, err) in enumerate(test_results, 1):
-            writer.writerow([i, f"{val:.4f}", f"{err:.2f}"])
-        writer.writerow([])
-        writer.writerow(["Overall Average Slave Force (N)", f"{avg_all:.4f}"])
-        writer.writerow(["Overall Error (%)", f"{err_all:.2f}"])
-    print(f"测试结果已保存到 {csv_filename}。")
+    samples_filename = f"maxcontactwrench_samples_{now_str}.csv"
+    writer = ResultWriter(csv_filename)
+    sample_writer = ResultWriter(samples_filename)
+    writer.writerow(["Max Contact Wrench Error Measurement Summary", now_str])
+    writer.writerow(["Set Value (N)", "Test Number", "Average Slave Force (N)", "Error (%)"])
+    sample_writer.writerow(["Test Number", "Set Value (N)", "t_follower", "F_slave_z (N)", "t_leader", "F_master_z (N)"])
+    test_results = []  # (设定值, 平均从侧力, 误差)
+    completed = False
+    aborted = None
+    try:
+        for set_value in setpoint_schedule(args):
+            print(f"\n========== 设定值 {set_value:.1f} N ==========")
+            for i in range(args.num):
+                input(f"请抬起机械臂后按 Enter 开始第 {i+1} 次测试...")
+                try:
+                    with wd.watch(f"setpoint {set_value:.1f}N test {i+1}"):
+                        avg_slave, error, slave_values = measure_max_contact_error(leader_robot, follower_robot, set_value)
+                except MeasurementAborted as e:
+                    print(f"\n[Watchdog] 第 {i+1} 次测试中止: {e.reason} ({e.detail})")
+                    writer.writerow([f"{set_value:.1f}", i+1, "Aborted", e.reason, e.detail])
+                    if e.reason != STALLED:
+                        aborted = e
+                        break
+                    continue
+                test_results.append((set_value, avg_slave, error))
+                sample_writer.write_samples([(i+1, set_value) + rec for rec in slave_values.rows()])
+                sample_writer.mark_trial_done()
+                writer.writerow([f"{set_value:.1f}", i+1, f"{avg_slave:.4f}", f"{error:.2f}"])
+                writer.mark_trial_done()
+                print(f"第 {i+1} 次测试：平均从侧力 = {avg_slave:.4f} N，误差 = {error:.2f}%")
+            if aborted is not None:
+                break
+
+        if test_results:
+            print("\n========== 测试结果 ==========")
+            writer.writerow([])
+            writer.writerow(["Set Value (N)", "Average Slave Force (N)"] + ci_header("Force ", with_n=False) +
+                            ["Average Error (%)"] + ci_header("Error ", with_n=False) + ["Tests"])
+            for sp in dict.fromkeys(r[0] for r in test_results):
+                rows = [r for r in test_results if r[0] == sp]
+                val = sum(r[1] for r in rows) / len(rows)
+                err = sum(r[2] for r in rows) / len(rows)
+                val_ci = bootstrap_ci([r[1] for r in rows])
+                err_ci = bootstrap_ci([r[2] for r in rows])
+                print(f"设定值 {sp:.1f} N：平均从侧力 = {format_ci(val_ci)} N，平均误差 = {format_ci(err_ci, '.2f')} %")
+                writer.writerow([f"{sp:.1f}", f"{val:.4f}"] + ci_cells(val_ci, with_n=False) +
+                                [f"{err:.2f}"] + ci_cells(err_ci, ".2f", with_n=False) + [len(rows)])
+            err_all = sum(r[2] for r in test_results) / len(test_results)
+            all_ci = bootstrap_ci([r[2] for r in test_results])
+            print(f"总体平均误差 = {format_ci(all_ci, '.2f')} %")
+            writer.writerow([])
+            writer.writerow(["Metric", "Value"] + ci_header())
+            writer.writerow(["Overall Error (%)", f"{err_all:.2f}"] + ci_cells(all_ci, ".2f"))
+        completed = aborted is None
+    finally:
+        wd.stop()
+        teleop.stop()
+        sample_writer.close(complete=completed)
+        saved = writer.close(complete=completed)
+        print(f"测试结果已保存到 {saved}。")
+        profiler.stop(saved)
+        instr.write_report(saved)
 
 if __name__=="__main__":
     main()
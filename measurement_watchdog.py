@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+measurement_watchdog.py
+
+功能：
+1. Watchdog 后台线程在测量期间 (watch() 作用域内) 以 poll_s (默认 10ms) 周期检查：
+   - Teleop 进程是否仍在运行 (已启动时，只查询本地子进程状态)；
+   - 各机器人 fault() / operational()：每次查询都是一次 SDK 调用 (经 robot_daemon 时还要与测量循环争用连接)，
+     按 robot_poll_s (默认 100ms) 节流，避免在测量循环旁每秒增加数百次 SDK 往返、影响采样计时；
+   - 进度停滞：stall_s 秒内没有进展 (如末端位移不再增加、外力一直未进入目标区间)；
+   - 截止时间：会话 deadline_s (自 start() 起) 与单次 watch() 的 deadline_s。
+   任一条件触发后记录原因，测量循环每个采样周期调用一次 check()，在一个采样周期内抛出 MeasurementAborted。
+2. MeasurementAborted.reason 为结构化原因：teleop_exited / robot_fault / not_operational / stalled / deadline，
+   detail 为可读说明；各脚本捕获后打印并写入 CSV。
+3. 测量循环用 progress(value) 报告进展：value 为 None 时表示"现在有进展"，
+   否则只有 value 比此前最大值增加超过 min_delta 才算进展 (如位移)。
+4. 未 start() 时 check()/progress() 为空操作，模块可在无人值守脚本与手动脚本之间复用。
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_POLL_S = 0.01
+DEFAULT_ROBOT_POLL_S = 0.1
+DEFAULT_STALL_S = 60.0
+
+TELEOP_EXITED = "teleop_exited"
+ROBOT_FAULT = "robot_fault"
+NOT_OPERATIONAL = "not_operational"
+STALLED = "stalled"
+DEADLINE = "deadline"
+
+
+class MeasurementAborted(RuntimeError):
+    def __init__(self, reason, detail=""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+
+def add_watchdog_arguments(parser, stall_s=DEFAULT_STALL_S, progress=None):
+    """progress：该脚本中"无进展"的含义 (写入 --stall 的帮助)。"""
+    what = f"测量无进展 ({progress})" if progress else "测量无进展"
+    parser.add_argument("--deadline", type=float, default=0.0,
+                        help="整个测试会话的截止时间 (秒，默认 0 为不限)，超时中止当前测量")
+    parser.add_argument("--stall", type=float, default=stall_s,
+                        help=f"{what}超过该时间 (秒) 即中止 (默认 {stall_s:g}，0 为不检查)")
+
+
+class Watchdog:
+    def __init__(self, teleop=None, poll_s=DEFAULT_POLL_S, robot_poll_s=DEFAULT_ROBOT_POLL_S):
+        self.teleop = teleop
+        self.poll_s = poll_s
+        self.robot_poll_s = robot_poll_s
+        self.robots = {}
+        self.deadline_s = None
+        self.stall_s = None
+        self.check_operational = True
+        self.last_abort = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._t0 = None
+        self._scope = None     # (名称, 开始时刻, 截止时刻或 None, stall_s 或 None)
+        self._last_progress = 0.0
+        self._best = -math.inf
+        self._min_delta = 0.0
+        self._abort = None
+        self._next_robot_check = 0.0
+
+    # ---------- 配置 / 启停 ----------
+
+    def configure(self, robots=None, deadline_s=None, stall_s=None, check_operational=True):
+        """robots: {名称: robot}；deadline_s/stall_s 为 None 或 <= 0 时不检查。"""
+        if robots is not None:
+            self.robots = dict(robots)
+        self.deadline_s = deadline_s if deadline_s and deadline_s > 0 else None
+        self.stall_s = stall_s if stall_s and stall_s > 0 else None
+        self.check_operational = check_operational
+        return self
+
+    def configure_from_args(self, args, robots):
+        return self.configure(robots, getattr(args, "deadline", None), getattr(args, "stall", None))
+
+    def start(self):
+        if self._thread is None:
+            self._t0 = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="Watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    # ---------- 测量循环接口 ----------
+
+    @contextmanager
+    def watch(self, name, stall_s=None, deadline_s=None, min_delta=0.0):
+        """作用域内的测量受监控；stall_s/deadline_s 覆盖默认值 (deadline_s 相对于进入作用域)。"""
+        now = time.monotonic()
+        with self._lock:
+            stall = stall_s if stall_s is not None else self.stall_s
+            self._scope = (name, now, now + deadline_s if deadline_s else None, stall if stall else None)
+            self._last_progress = now
+            self._best = -math.inf
+            self._min_delta = min_delta
+            self._abort = None
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._scope = None
+                self._abort = None
+
+    def progress(self, value=None):
+        if self._scope is None:
+            return
+        if value is None or value > self._best + self._min_delta:
+            if value is not None:
+                self._best = value
+            self._last_progress = time.monotonic()
+
+    def check(self):
+        """测量循环每个采样周期调用；已触发时抛出 MeasurementAborted。"""
+        abort = self._abort
+        if abort is not None:
+            self.last_abort = abort
+            raise abort
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        while not self._stop.wait(self.poll_s):
+            scope = self._scope
+            if scope is None or self._abort is not None:
+                continue
+            abort = self._evaluate(scope)
+            if abort is not None:
+                with self._lock:
+                    if self._scope is scope:
+                        self._abort = abort
+
+    def _evaluate(self, scope):
+        name, _, scope_deadline, stall = scope
+        now = time.monotonic()
+        teleop = self.teleop
+        if teleop is not None and teleop.proc is not None and not teleop.alive():
+            return MeasurementAborted(TELEOP_EXITED, f"{teleop.name} exited with code {teleop.proc.returncode} during {name}")
+        robots = self.robots.items() if now >= self._next_robot_check else ()
+        if robots:
+            self._next_robot_check = now + self.robot_poll_s
+        for label, robot in robots:
+            try:
+                if robot.fault():
+                    return MeasurementAborted(ROBOT_FAULT, f"{label} in fault during {name}")
+                if self.check_operational and not robot.operational():
+                    return MeasurementAborted(NOT_OPERATIONAL, f"{label} not operational during {name}")
+            except Exception as e:
+                return MeasurementAborted(ROBOT_FAULT, f"{label} status query failed during {name}: {e}")
+        if self.deadline_s is not None and now - self._t0 > self.deadline_s:
+            return MeasurementAborted(DEADLINE, f"session deadline {self.deadline_s:g}s exceeded during {name}")
+        if scope_deadline is not None and now > scope_deadline:
+            return MeasurementAborted(DEADLINE, f"{name} exceeded its deadline")
+        if stall is not None and now - self._last_progress > stall:
+            return MeasurementAborted(STALLED, f"no progress for {stall:g}s during {name}")
+        return None
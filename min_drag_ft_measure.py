@@ -13,7 +13,9 @@ min_drag_ft_measure.py
      当对应速度分量超过阈值（平移：0.01 m/s；旋转：0.01 rad/s）时，
      记录当时主侧的外力（或转矩）的绝对值作为本次测试的“最小拖拽力/转动扭矩”。
    - 每个方向重复测试 n 次，每次测试后提示用户将机械臂复位到 Home Pose并按 Enter。
-5. 输出各方向的单次测试结果和平均值，并将所有结果保存到 CSV 文件中。
+5. 输出各方向的单次测试结果和平均值；每次测试完成即追加写入 CSV 并落盘，最后写入各方向汇总。
+6. 触发判断使用滤波后的速度：速度与外力两路先经 Hampel 尖峰剔除，再经二阶 Butterworth 低通 (--filter-cutoff，默认 10Hz，0 为不滤波)，
+   单个噪声采样不会误触发；外力与速度经过同一滤波器，时延一致。
 
 """
 
@@ -21,21 +23,34 @@ import argparse
 import time
 import signal
 import sys
-import csv
 import os
-import subprocess
 from datetime import datetime
 
 import flexivrdk
 
-teleop_pid = None
-teleop_pattern = None
+from result_writer import ResultWriter
+from teleop_process import TeleopProcess
+import instrumentation as instr
+from signal_filter import Biquad, FilterChain, SpikeRejector
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from session_state import SessionState, add_resume_argument
+from measurement_watchdog import Watchdog, MeasurementAborted, add_watchdog_arguments
+from robot_daemon import connect
+from motion_timing import MotionTimeEstimator, move_and_wait, format_result, RDK_DEFAULT_VEL_SCALE
+import state_bus
+
+teleop = TeleopProcess()
+wd = Watchdog(teleop)
 
 # 测试参数
 sample_interval = 0.01  # 采样周期 (100Hz)
 linear_threshold = 0.01   # 平移速度阈值 (m/s)
 angular_threshold = 0.1  # 旋转速度阈值 (rad/s) 末端手柄长度为15cm，假设杠杆臂为10cm，对应0.01m/s的角速度是0.1 rad/s
 nTrials = 5  # 每个方向测试次数
+filter_cutoff = 10.0  # 速度/外力低通截止频率 (Hz)，0 为不滤波
+spike_window = 5  # 尖峰剔除窗口 (采样数)
+
+_T_LOOP = instr.site("mindrag.loop")
 
 # Home Pose（单位：度）
 HOME_POSE = [-5.6850536735238373e-05, -39.999988598597405, -7.796941005345694e-05,
@@ -52,13 +67,19 @@ TEST_AXES = {
     "Rz": {"index": 5, "is_rotation": True},
 }
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Drag Force/Torque Measurement for Master")
     parser.add_argument("-1", "--leader", required=True, help="主机械臂序列号")
     parser.add_argument("-2", "--follower", required=True, help="从机械臂序列号")
     parser.add_argument("-p", "--password", required=True, help="用于启动和停止 Teleop 程序的 sudo 密码")
     parser.add_argument("-n", "--num", type=int, default=5, help="每个方向测试次数 (默认5次)")
-    return parser.parse_args()
+    parser.add_argument("--filter-cutoff", type=float, default=filter_cutoff,
+                        help=f"速度/外力低通截止频率 Hz (默认 {filter_cutoff:g}，0 为不滤波)")
+    add_resume_argument(parser)
+    add_watchdog_arguments(parser, progress="未踩下踏板或踩下后未检测到运动")
+    state_bus.add_bus_argument(parser)
+    instr.add_profile_argument(parser)
+    return parser.parse_args(argv)
 
 def find_executables_in_current_dir():
     files = os.listdir('.')
@@ -70,102 +91,103 @@ def find_executables_in_current_dir():
 
 def start_teleop(executable_path):
     """
-    启动 Teleop 程序，并使其成为新会话的组长。
+    启动 Teleop 程序 (sudo, 新会话)，并记录其进程树。
     若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。
     返回 Teleop 进程的 PID。
     """
-    global teleop_pid, teleop_pattern, SUDO_PASSWORD, leader_robot_sn, follower_robot_sn
-    teleop_pattern = os.path.basename(executable_path)
-    if "high_transparency" in teleop_pattern:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -l {leader_robot_sn} -r {follower_robot_sn}"
-    else:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -1 {leader_robot_sn} -2 {follower_robot_sn}"
-    pid = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid).pid
-    teleop_pid = pid
-    print(f"[StartTeleop] pattern=({teleop_pattern}), cmd=({cmd}), pid={pid}")
+    pid = teleop.start(executable_path, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD)
     time.sleep(2.0)
+    teleop.refresh_tree()
     return pid
 
 def stop_teleop():
     """
-    结束 Teleop 程序：先通过 killpg(SIGTERM+SIGKILL) 结束进程组，
-    然后使用 pkill -9 -f 以确保所有相关进程被关闭。
+    结束 Teleop 进程树：SIGTERM 后等待其全部退出即返回，超时才升级为 SIGKILL。
+    返回 TeardownReport (未启动时为 None)。
     """
-    global teleop_pid, teleop_pattern
-    if teleop_pid is not None and teleop_pid > 0:
-        try:
-            pgid = os.getpgid(teleop_pid)
-        except ProcessLookupError:
-            print(f"[stop_teleop] pid {teleop_pid} not found. Possibly ended.")
-            pgid = None
-        if pgid is not None:
-            print(f"[stop_teleop] killpg(SIGTERM) pgid={pgid}")
-            try:
-                os.killpg(pgid, signal.SIGTERM)
-                time.sleep(1.0)
-            except ProcessLookupError:
-                print("[stop_teleop] Group not found, likely ended.")
-            else:
-                try:
-                    os.killpg(pgid, 0)
-                    print(f"[stop_teleop] Still alive => killpg(SIGKILL) pgid={pgid}")
-                    os.killpg(pgid, signal.SIGKILL)
-                except ProcessLookupError:
-                    print("[stop_teleop] Group ended after SIGTERM.")
-        teleop_pid = None
-    if teleop_pattern:
-        print(f"[stop_teleop] pkill -9 -f {teleop_pattern}")
-        try:
-            subprocess.run(["pkill", "-9", "-f", teleop_pattern], check=False)
-        except Exception as e:
-            print(f"[stop_teleop] pkill error: {e}")
-    teleop_pattern = None
+    return teleop.stop()
 
-def sync_home_pose(robot):
+def send_movej(robot, pose_deg):
     robot.SwitchMode(flexivrdk.Mode.NRT_PRIMITIVE_EXECUTION)
-    home = flexivrdk.JPos(HOME_POSE, [0,0,0,0,0,0])
-    robot.ExecutePrimitive("MoveJ", {"target": home})
+    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg, [0,0,0,0,0,0])})
+
+def sync_home_pose(robots, sn_list):
+    """所有机器人同时 MoveJ 到 Home Pose，稳定到达 (或超时) 后返回是否全部到达。"""
     print(f"[SyncPose] 同步到 Home Pose: {HOME_POSE}")
-    time.sleep(2.0)
+    estimators = [MotionTimeEstimator(sn) for sn in sn_list]
+    results = move_and_wait(robots, estimators, HOME_POSE, RDK_DEFAULT_VEL_SCALE, send_movej, label="SyncPose")
+    for est, res in zip(estimators, results):
+        print(f"  {format_result(est.key, res)}")
+    return all(res.reached for res in results)
+
+def make_trigger_filter():
+    """[速度, 外力] 两通道：尖峰剔除 -> Butterworth 低通；filter_cutoff <= 0 时返回 None。"""
+    if filter_cutoff <= 0:
+        return None
+    return FilterChain(SpikeRejector(spike_window, channels=2),
+                       Biquad.lowpass(filter_cutoff, 1.0 / sample_interval, channels=2))
 
-def measure_drag_for_axis(axis_name, idx, is_rotation):
+def measure_drag_for_axis(axis_name, idx, is_rotation, writer=None, state=None):
     """
     对指定轴（例如 "X", "Y", "Z", "Rx", "Ry", "Rz"）进行测试：
     - 等待用户踩下踏板（digital_inputs()[0][0]==1）；
-    - 当对应速度分量超过阈值（平移：tcp_vel[idx]；旋转：tcp_vel[idx]）时，
-      记录主侧外力（或转矩）的绝对值作为“最小拖拽力/转动扭矩”。
+    - 当对应速度分量 (滤波后) 超过阈值（平移：tcp_vel[idx]；旋转：tcp_vel[idx]）时，
+      记录滤波后主侧外力（或转矩）的绝对值作为“最小拖拽力/转动扭矩”。
     每个方向测试 nTrials 次，每次测试后提示用户将机械臂复位到 Home Pose并按 Enter 确认。
+    若提供 writer (ResultWriter)，每次测试结果立即追加写入并落盘。
+    若提供 state (SessionState)，已完成的测试 ("<轴>/<次数>") 直接取检查点结果，新完成的测试写入检查点。
     返回：试验结果列表和平均值。
     """
     trials = []
     threshold = angular_threshold if is_rotation else linear_threshold
     for t in range(nTrials):
+        unit_name = f"{axis_name}/{t+1}"
+        if state is not None and state.done(unit_name):
+            measured_value = state.result(unit_name)
+            print(f"[Resume] [{axis_name}方向] 第 {t+1} 次测试 = {measured_value:.4f} (检查点)")
+            trials.append(measured_value)
+            if writer is not None:
+                writer.writerow([axis_name, t+1, f"{measured_value:.4f}", "Nm" if is_rotation else "N"])
+                writer.mark_trial_done()
+            continue
         print(f"\n[{axis_name}方向] 第 {t+1} 次测试：")
         print("请踩下踏板后，缓慢拖动主机械臂末端沿该方向运动，直至检测到运动启动。")
-        # 等待用户踩下踏板
-        while True:
-            try:
-                pedal = leader_robot.digital_inputs()[0]
-            except Exception:
-                pedal = 0
-            if pedal == 1:
-                break
-            time.sleep(0.05)
-        print("踏板已踩下，等待运动启动...")
-        moving = False
-        measured_value = None
-        while not moving:
-            states = leader_robot.states()
-            velocity = states.tcp_vel
-            if abs(velocity[idx]) >= threshold:
-                moving = True
-                wrench = states.ext_wrench_in_world
-                measured_value = abs(wrench[idx])
-                unit = "Nm" if is_rotation else "N"
-                print(f"检测到运动，记录值 = {measured_value:.4f} {unit}")
-            time.sleep(0.01)
-        input("采集完成，此时您可以遥操机械臂到合适的POSE，如HOME POSE后按 Enter，继续下一次测试...")
+        with wd.watch(f"{axis_name} trial {t+1}"):
+            # 等待用户踩下踏板
+            while True:
+                wd.check()
+                try:
+                    pedal = leader_robot.digital_inputs()[0]
+                except Exception:
+                    pedal = 0
+                if pedal == 1:
+                    break
+                instr.sleep(0.05)
+            wd.progress()
+            print("踏板已踩下，等待运动启动...")
+            moving = False
+            measured_value = None
+            filt = make_trigger_filter()
+            while not moving:
+                wd.check()
+                t_loop = instr.now()
+                states = leader_robot.states()
+                sample = (states.tcp_vel[idx], states.ext_wrench_in_world[idx])
+                velocity, wrench = filt.process(sample) if filt is not None else sample
+                if abs(velocity) >= threshold:
+                    moving = True
+                    measured_value = abs(wrench)
+                    unit = "Nm" if is_rotation else "N"
+                    print(f"检测到运动，记录值 = {measured_value:.4f} {unit}")
+                instr.sleep(0.01)
+                _T_LOOP.record(instr.now() - t_loop)
         trials.append(measured_value)
+        if writer is not None:
+            writer.writerow([axis_name, t+1, f"{measured_value:.4f}", "Nm" if is_rotation else "N"])
+            writer.mark_trial_done()
+        if state is not None:
+            state.complete_unit(unit_name, result=float(measured_value))
+        input("采集完成，此时您可以遥操机械臂到合适的POSE，如HOME POSE后按 Enter，继续下一次测试...")
     avg_val = sum(trials) / len(trials) if trials else 0.0
     unit = "Nm" if is_rotation else "N"
     print(f"\n[{axis_name}方向] 试验值: {['{:.4f}'.format(x) for x in trials]}, 平均 = {avg_val:.4f} {unit}")
@@ -182,14 +204,15 @@ def signal_handler(sig, frame):
 import argparse
 signal.signal(signal.SIGINT, signal_handler)
 
-def main():
-    global teleop_pid, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD, nTrials, leader_robot, follower_robot
+def main(argv=None):
+    global leader_robot_sn, follower_robot_sn, SUDO_PASSWORD, nTrials, leader_robot, follower_robot, filter_cutoff
 
-    args = parse_args()
+    args = parse_args(argv)
     leader_robot_sn = args.leader
     follower_robot_sn = args.follower
     SUDO_PASSWORD = args.password
     nTrials = args.num
+    filter_cutoff = args.filter_cutoff
 
     exe_list = find_executables_in_current_dir()
     if not exe_list:
@@ -209,46 +232,71 @@ def main():
         sys.exit(1)
     chosen_name, exe_path = exe_list[cidx]
     print(f"\n已选择: {chosen_name}\n路径: {exe_path}\n")
+
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    state = SessionState.open("min_drag_ft_measure", args.resume, stamp=now_str,
+                              meta={"leader": leader_robot_sn, "follower": follower_robot_sn, "teleop": chosen_name,
+                                    "num": nTrials, "filter_cutoff": filter_cutoff})
     
     print("连接到 Robot...")
-    leader_robot = flexivrdk.Robot(leader_robot_sn)
-    follower_robot = flexivrdk.Robot(follower_robot_sn)
+    state_bus.open_from_args(args)
+    leader_robot = state_bus.tap(instr.instrument_robot(connect(leader_robot_sn, flexivrdk), "leader"), "leader")
+    follower_robot = state_bus.tap(instr.instrument_robot(connect(follower_robot_sn, flexivrdk), "follower"), "follower")
+    wd.configure_from_args(args, {"leader": leader_robot, "follower": follower_robot}).start()
+    profiler = instr.Profiler(args.profile).start()
     
     print("同步到 Home Pose...")
-    sync_home_pose(leader_robot)
-    sync_home_pose(follower_robot)
+    sync_home_pose([leader_robot, follower_robot], [leader_robot_sn, follower_robot_sn])
     input("Home Pose 已同步，按 Enter 开始启动 Teleop 程序...")
     
     start_teleop(exe_path)
     print("遥操作程序已启动，等待7秒稳定...")
     time.sleep(7.0)
     
+    csv_filename = f"drag_measure_summary_{now_str}.csv"
+    writer = ResultWriter(csv_filename)
+    writer.writerow(["Drag/Torque Measurement Summary", now_str])
+    writer.writerow(["Session state", state.path])
+    writer.writerow(["Axis", "Trial", "Value", "Unit"])
+
     # 对6个自由度进行测试：平移使用索引 0,1,2；旋转使用索引 3,4,5
     results = {}
-    for axis, cfg in TEST_AXES.items():
-        print(f"\n========== 测试 {axis} 方向的最小 {'转矩' if cfg['is_rotation'] else '拖拽力'} ==========")
-        print(f"请按提示操作：踩下踏板后，缓慢拖动主机械臂末端沿 {axis} 方向运动，直到检测到运动。")
-        trials, avg_val = measure_drag_for_axis(axis, cfg["index"], cfg["is_rotation"])
-        results[axis] = (trials, avg_val)
-    
-    # 输出所有结果
-    print("\n========== 各方向测试结果 ==========")
-    for axis, (trials, avg_val) in results.items():
-        unit = "Nm" if axis.startswith("R") else "N"
-        print(f"{axis}: 试验值 = {['{:.4f}'.format(x) for x in trials]}, 平均 = {avg_val:.4f} {unit}")
-    
-    # 保存结果到 CSV 文件
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"drag_measure_summary_{now_str}.csv"
-    with open(csv_filename, "w", newline='', encoding="utf-8") as fcsv:
-        writer = csv.writer(fcsv)
-        writer.writerow(["Drag/Torque Measurement Summary", now_str])
-        writer.writerow(["Axis", "Trial Values", "Average Value"])
+    completed = False
+    try:
+        for axis, cfg in TEST_AXES.items():
+            print(f"\n========== 测试 {axis} 方向的最小 {'转矩' if cfg['is_rotation'] else '拖拽力'} ==========")
+            print(f"请按提示操作：踩下踏板后，缓慢拖动主机械臂末端沿 {axis} 方向运动，直到检测到运动。")
+            trials, avg_val = measure_drag_for_axis(axis, cfg["index"], cfg["is_rotation"], writer, state)
+            results[axis] = (trials, avg_val)
+
+        # 输出所有结果
+        print("\n========== 各方向测试结果 ==========")
+        cis = {axis: bootstrap_ci(trials) for axis, (trials, _) in results.items()}
         for axis, (trials, avg_val) in results.items():
             unit = "Nm" if axis.startswith("R") else "N"
-            writer.writerow([axis, ", ".join("{:.4f}".format(x) for x in trials), f"{avg_val:.4f} {unit}"])
-    print(f"测试结果已保存到 {csv_filename}。")
-    
+            print(f"{axis}: 试验值 = {['{:.4f}'.format(x) for x in trials]}, 平均 = {format_ci(cis[axis])} {unit}")
+
+        # 写入汇总
+        writer.writerow([])
+        writer.writerow(["Axis", "Trial Values", "Average Value"] + ci_header())
+        for axis, (trials, avg_val) in results.items():
+            unit = "Nm" if axis.startswith("R") else "N"
+            writer.writerow([axis, ", ".join("{:.4f}".format(x) for x in trials), f"{avg_val:.4f} {unit}"] +
+                            ci_cells(cis[axis]))
+        completed = True
+        state.finish()
+    except MeasurementAborted as e:
+        print(f"\n[Watchdog] 测量中止: {e.reason} ({e.detail})")
+        writer.writerow(["Aborted", e.reason, e.detail])
+    finally:
+        wd.stop()
+        saved = writer.close(complete=completed)
+        print(f"测试结果已保存到 {saved}。")
+        if not completed:
+            print(f"已完成的测试已保存到 {state.path}，可使用 --resume 继续。")
+        profiler.stop(saved)
+        instr.write_report(saved)
+
     # 停止 Teleop 程序
     stop_teleop()
     print("遥操作程序已停止，程序结束。")
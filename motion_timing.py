@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+motion_timing.py
+
+功能：
+1. MotionTimeEstimator：由关节变化量与 jntVelScale 预测 MoveJ 耗时。
+   以 pose_planner.movej_time 的运动学时间 x 为特征，拟合 t = a + b*x (带先验的在线最小二乘)，
+   每次实际到达后用观测耗时更新，模型按机器人序列号持久化到 .motion_time_model.json。
+2. 每次运动的超时时间由预测值与残差自动给出 (预测 + 4σ + 余量)，短距离不再空等固定的 5/7 秒，长距离也不会被过早判定。
+3. move_and_wait() 同时下发多台机器人的 MoveJ 并分别等待，返回每台的 MoveResult；
+   超时未到达时打印报告 (预计/实际耗时、最大关节误差)，而不是静默继续。
+4. 到达判定按"稳定"而非"经过容差带"：以 SDK 状态频率 (1ms) 轮询，所有关节误差 <= tol_deg
+   且关节速度 <= settle_vel_deg_s 持续 dwell_s 才算到达，返回即可开始测量，无需再额外 sleep。
+   MoveResult 给出稳定时间 (下发 -> 进入并保持在稳定区的时刻) 与每个关节的超调量
+   (越过目标、远离起点一侧的最大偏差，度)；运动时间模型以稳定时间更新。
+"""
+
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+from pose_planner import movej_time, ACCEL_OVERHEAD_S
+
+MODEL_FILE = ".motion_time_model.json"
+PRIOR_WEIGHT = 3.0      # 先验 (a=ACCEL_OVERHEAD_S, b=1) 相当于多少次观测
+MIN_TIMEOUT_S = 2.0
+POLL_INTERVAL_S = 0.001     # 与 SDK 非实时状态刷新周期一致
+SETTLE_VEL_DEG_S = 0.5      # 稳定判定的关节速度阈值
+SETTLE_DWELL_S = 0.2        # 位置与速度同时满足需持续的时间
+RDK_DEFAULT_VEL_SCALE = 20  # MoveJ 未指定 jntVelScale 时 RDK 的默认值，仅用于耗时预测
+
+MoveResult = namedtuple("MoveResult", ["reached", "elapsed", "predicted", "timeout", "max_error_deg",
+                                       "settle_time", "overshoot_deg"])
+
+
+def current_q_deg(robot):
+    return [math.degrees(x) for x in robot.states().q]
+
+
+def max_joint_error_deg(robot, pose_deg):
+    return max(abs(c - t) for c, t in zip(current_q_deg(robot), pose_deg))
+
+
+class SettleTracker:
+    """单台机器人向 pose_deg 运动的稳定判定与超调统计；每个轮询周期 update() 一次。"""
+
+    def __init__(self, start_deg, pose_deg, tol_deg, vel_deg_s=SETTLE_VEL_DEG_S, dwell_s=SETTLE_DWELL_S):
+        self.pose = list(pose_deg)
+        self.tol = tol_deg
+        self.vel = vel_deg_s
+        self.dwell = dwell_s
+        # 超调方向：远离起点的一侧；起点已在目标上的关节不统计超调
+        self.sign = [0.0 if abs(t - s) < 1e-6 else math.copysign(1.0, t - s) for s, t in zip(start_deg, pose_deg)]
+        self.overshoot = [0.0] * len(self.pose)
+        self.error = math.inf
+        self.since = None       # 进入稳定区的时刻 (相对下发)
+
+    def update(self, robot, elapsed):
+        """返回 True 表示已稳定 dwell_s。"""
+        st = robot.states()
+        q = [math.degrees(x) for x in st.q]
+        dq = max(abs(math.degrees(x)) for x in st.dq)
+        self.error = max(abs(c - t) for c, t in zip(q, self.pose))
+        for j, (c, t, s) in enumerate(zip(q, self.pose, self.sign)):
+            over = s * (c - t)
+            if over > self.overshoot[j]:
+                self.overshoot[j] = over
+        if self.error <= self.tol and dq <= self.vel:
+            if self.since is None:
+                self.since = elapsed
+            return elapsed - self.since >= self.dwell
+        self.since = None
+        return False
+
+
+def format_result(key, res):
+    """一行文字：到达/超时、耗时、稳定时间与最大超调关节。"""
+    status = "reached" if res.reached else "TIMEOUT"
+    text = f"{key}: {status}, {res.elapsed:.2f}s (predicted {res.predicted:.1f}s, timeout {res.timeout:.1f}s)"
+    if res.reached:
+        j = max(range(len(res.overshoot_deg)), key=lambda k: res.overshoot_deg[k])
+        text += f", settled at {res.settle_time:.2f}s, max overshoot {res.overshoot_deg[j]:.3f}° (J{j + 1})"
+    else:
+        text += f", max error {res.max_error_deg:.1f}°"
+    return text
+
+
+class MotionTimeEstimator:
+    def __init__(self, key="default", path=MODEL_FILE):
+        self.key = key
+        self.path = path
+        # 线性回归充分统计量：n, Σx, Σy, Σxx, Σxy, Σyy；先验为 x=1s 与 x=5s 两点上的 t = ACCEL_OVERHEAD_S + x，
+        # 少量观测时斜率与截距都不会被单次测量带偏
+        self.stats = [0.0] * 6
+        self.n_obs = 0
+        for x0 in (1.0, 5.0):
+            self._add(x0, ACCEL_OVERHEAD_S + x0, PRIOR_WEIGHT / 2)
+        self._load()
+
+    # ---------- 模型 ----------
+
+    def coefficients(self):
+        n, sx, sy, sxx, sxy, _ = self.stats
+        den = n * sxx - sx * sx
+        if abs(den) < 1e-9:
+            return ACCEL_OVERHEAD_S, 1.0
+        b = (n * sxy - sx * sy) / den
+        a = (sy - b * sx) / n
+        return a, b
+
+    def sigma(self):
+        """残差标准差 (秒)。"""
+        n, sx, sy, sxx, sxy, syy = self.stats
+        a, b = self.coefficients()
+        sse = syy - 2 * a * sy - 2 * b * sxy + a * a * n + 2 * a * b * sx + b * b * sxx
+        return math.sqrt(max(sse, 0.0) / max(n - 2, 1))
+
+    def predict(self, q0_deg, q1_deg, vel_scale):
+        x = movej_time(q0_deg, q1_deg, vel_scale) - ACCEL_OVERHEAD_S
+        if x <= 0:
+            return 0.0
+        a, b = self.coefficients()
+        return max(a + b * x, 0.0)
+
+    def timeout(self, q0_deg, q1_deg, vel_scale):
+        pred = self.predict(q0_deg, q1_deg, vel_scale)
+        return max(MIN_TIMEOUT_S, pred + 4 * self.sigma() + 0.2 * pred + 0.5)
+
+    def observe(self, q0_deg, q1_deg, vel_scale, elapsed):
+        x = movej_time(q0_deg, q1_deg, vel_scale) - ACCEL_OVERHEAD_S
+        if x <= 0:
+            return
+        self._add(x, elapsed)
+        self.n_obs += 1
+
+    def _add(self, x, y, w=1.0):
+        for i, v in enumerate((1.0, x, y, x * x, x * y, y * y)):
+            self.stats[i] += w * v
+
+    def time_fn(self, q0_deg, q1_deg, vel_scale):
+        """与 pose_planner.movej_time 同签名，供 plan_sequence 使用学习后的模型。"""
+        return self.predict(q0_deg, q1_deg, vel_scale)
+
+    def tag(self):
+        a, b = self.coefficients()
+        return f"{a:.2f},{b:.2f}"
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entry = json.load(f).get(self.key)
+        except (OSError, ValueError):
+            entry = None
+        if entry:
+            self.stats = list(entry["stats"])
+            self.n_obs = entry.get("n_obs", 0)
+
+    def save(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.key] = {"stats": self.stats, "n_obs": self.n_obs}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def move_and_wait(robots, estimators, pose_deg, vel_scale, send_movej, tol_deg=2.0, label="MoveJ",
+                  settle_vel_deg_s=SETTLE_VEL_DEG_S, dwell_s=SETTLE_DWELL_S):
+    """
+    对 robots 同时调用 send_movej(robot, pose_deg)，然后按各自预测的超时时间等待稳定到达
+    (关节误差 <= tol_deg 且关节速度 <= settle_vel_deg_s，持续 dwell_s)。
+    estimators 与 robots 一一对应；到达的运动以稳定时间更新模型。返回 MoveResult 列表。
+    """
+    starts = [current_q_deg(r) for r in robots]
+    preds = [e.predict(q0, pose_deg, vel_scale) for e, q0 in zip(estimators, starts)]
+    # 超时需容纳稳定判定的驻留时间
+    timeouts = [e.timeout(q0, pose_deg, vel_scale) + dwell_s for e, q0 in zip(estimators, starts)]
+    trackers = [SettleTracker(q0, pose_deg, tol_deg, settle_vel_deg_s, dwell_s) for q0 in starts]
+    t0 = time.monotonic()
+    for r in robots:
+        send_movej(r, pose_deg)
+    results = [None] * len(robots)
+    while any(res is None for res in results):
+        for k, r in enumerate(robots):
+            if results[k] is not None:
+                continue
+            elapsed = time.monotonic() - t0
+            tr = trackers[k]
+            if tr.update(r, elapsed):
+                results[k] = MoveResult(True, elapsed, preds[k], timeouts[k], tr.error, tr.since, tr.overshoot)
+                estimators[k].observe(starts[k], pose_deg, vel_scale, tr.since)
+            elif elapsed >= timeouts[k]:
+                results[k] = MoveResult(False, elapsed, preds[k], timeouts[k], tr.error, None, tr.overshoot)
+                what = "已进入容差但未稳定" if tr.error <= tol_deg else "超时未到达目标"
+                print(f"\n[{label}] {what}: {estimators[k].key}, 预计 {preds[k]:.1f}s, 超时 {timeouts[k]:.1f}s, "
+                      f"最大关节误差 {tr.error:.1f}°")
+        time.sleep(POLL_INTERVAL_S)
+    for e in estimators:
+        e.save()
+    return results
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+plateau_detect.py
+
+功能：
+1. 对一段连续记录的力 (一维数组) 离线分割"稳定保持"区间 (全部向量化，不逐采样循环)：
+   - rolling_std：居中滑动窗口标准差 (累加和实现，O(N))；
+   - find_plateaus：采样落在某一目标力档位的容差带内 (max(band_min, band_rel * 档位)) 且滑动标准差 <= max_std，
+     连续成段且持续 >= min_duration 的区间记为该档位的一个平台；档位切换时的上升/下降过程因滑动标准差大被自动剔除。
+2. longest_per_level：每个档位取持续时间最长的平台。
+3. linearity：各档位平台的 (从侧力, 主侧力) 均值拟合 -F_master = gain * F_slave + offset，
+   给出 R^2 与相对满量程的最大非线性偏差，用于评价力反馈在整个力范围内的线性度。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+BAND_MIN = 1.0       # 档位容差带下限 (N)
+BAND_REL = 0.1       # 档位容差带相对档位的比例 (10N 档位即 9~11N)
+MAX_STD = 0.5        # 平台内滑动标准差上限 (N)
+WINDOW_S = 0.5       # 滑动标准差窗口 (秒)
+MIN_DURATION = 2.0   # 平台最短持续时间 (秒)
+
+# level_index: 档位下标；start/stop: 采样下标 [start, stop)；t_start/t_end: 首末采样时刻；mean/std: 平台内力的均值与标准差
+Plateau = namedtuple("Plateau", ["level_index", "level", "start", "stop", "t_start", "t_end", "mean", "std"])
+
+# gain/offset: -F_master = gain * F_slave + offset；max_dev_pct: 最大偏差占满量程 (最大从侧力) 的百分比
+Linearity = namedtuple("Linearity", ["gain", "offset", "r2", "max_dev_pct", "n"])
+
+
+def rolling_std(x, window):
+    """居中窗口 (window 个采样) 的滑动标准差；两端不足一个窗口的采样为 inf。"""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.size
+    out = np.full(n, np.inf)
+    window = int(window)
+    if window < 2 or n < window:
+        return out
+    c1 = np.concatenate(([0.0], np.cumsum(x)))
+    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    var = np.maximum(s2 / window - (s1 / window) ** 2, 0.0)
+    half = window // 2
+    out[half:half + var.size] = np.sqrt(var)
+    return out
+
+
+def find_plateaus(t, x, levels, band_min=BAND_MIN, band_rel=BAND_REL, max_std=MAX_STD,
+                  window_s=WINDOW_S, min_duration=MIN_DURATION):
+    """
+    t: 采样时刻 (秒)；x: 接触方向上的力 (N，压力为正)；levels: 目标档位 (N)。
+    返回按时间排序的 Plateau 列表。
+    """
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    levels = np.asarray(levels, dtype=np.float64)
+    if t.size < 2 or levels.size == 0:
+        return []
+    dt = float(np.median(np.diff(t)))
+    std = rolling_std(x, max(2, int(round(window_s / dt)))) if dt > 0 else np.full(x.size, np.inf)
+    nearest = np.abs(x[:, None] - levels[None, :]).argmin(axis=1)
+    band = np.maximum(band_min, band_rel * np.abs(levels))[nearest]
+    ok = (np.abs(x - levels[nearest]) <= band) & (std <= max_std)
+    label = np.where(ok, nearest, -1)
+    edges = np.flatnonzero(np.diff(label)) + 1
+    starts = np.concatenate(([0], edges))
+    stops = np.concatenate((edges, [label.size]))
+    plateaus = []
+    for s, e in zip(starts, stops):
+        k = int(label[s])
+        if k < 0 or t[e - 1] - t[s] < min_duration:
+            continue
+        seg = x[s:e]
+        plateaus.append(Plateau(k, float(levels[k]), int(s), int(e), float(t[s]), float(t[e - 1]),
+                                float(seg.mean()), float(seg.std())))
+    return plateaus
+
+
+def longest_per_level(plateaus):
+    """{档位下标: 持续时间最长的 Plateau}。"""
+    best = {}
+    for p in plateaus:
+        cur = best.get(p.level_index)
+        if cur is None or p.t_end - p.t_start > cur.t_end - cur.t_start:
+            best[p.level_index] = p
+    return best
+
+
+def linearity(f_slave, f_master):
+    """各平台从侧/主侧力均值 -> Linearity；少于 2 个点时返回 None。"""
+    s = np.asarray(f_slave, dtype=np.float64)
+    m = -np.asarray(f_master, dtype=np.float64)
+    if s.size < 2 or np.ptp(s) <= 0:
+        return None
+    gain, offset = np.polyfit(s, m, 1)
+    resid = m - (gain * s + offset)
+    ss_tot = float(((m - m.mean()) ** 2).sum())
+    r2 = 1.0 - float(resid @ resid) / ss_tot if ss_tot > 0 else float("nan")
+    full_scale = float(np.abs(s).max())
+    max_dev = float(np.abs(resid).max()) / full_scale * 100 if full_scale > 0 else float("nan")
+    return Linearity(float(gain), float(offset), r2, max_dev, int(s.size))
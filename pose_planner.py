@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+pose_planner.py
+
+功能：
+1. 估计 MoveJ 在关节空间的运动时间：各关节按 (最大速度 x jntVelScale%) 同步运动，取最慢关节的时间再加加减速开销。
+2. 为一组测试 Pose 规划访问顺序与中间过渡点，使总运动时间最短：
+   - 关节最大变化量不超过 max_direct_delta_deg 的两 Pose 之间可直接 MoveJ；
+   - 否则必须经由一个安全过渡点 (waypoints，如 test_pose[1] / HOME_POSE) 中转，选耗时最短的过渡点；
+   - Pose 数 <= 12 时用 Held-Karp 动态规划求精确最优顺序，更多时用最近邻 + 2-opt。
+3. 规划结果按 (Pose 集合, 起点, 终点, 过渡点, 速度比例, 阈值) 缓存到 .pose_plan_cache.json，同一 Pose 集合只规划一次。
+4. sample_poses() 在关节限位 (留 margin_deg 余量) 内围绕中心 Pose 生成测试构型：
+   Halton 低差异序列 (N 个点，覆盖均匀且可复现) 或每个关节 K 个等间距值的全组合网格，只改变指定关节。
+"""
+
+import hashlib
+import itertools
+import json
+import os
+from collections import namedtuple
+
+# Rizon 4 各关节最大速度 (deg/s) 与关节限位 (deg)
+JOINT_VEL_LIMITS_DEG = (120.0, 120.0, 150.0, 150.0, 180.0, 180.0, 180.0)
+JOINT_LIMITS_DEG = ((-160.0, 160.0), (-130.0, 130.0), (-170.0, 170.0), (-107.0, 154.0),
+                    (-170.0, 170.0), (-80.0, 260.0), (-170.0, 170.0))
+
+ACCEL_OVERHEAD_S = 0.5        # 每段 MoveJ 的加减速及指令开销 (秒)
+MAX_DIRECT_DELTA_DEG = 90.0   # 超过该关节变化量的两 Pose 间必须经过渡点
+CACHE_FILE = ".pose_plan_cache.json"
+LIMIT_MARGIN_DEG = 10.0       # 生成构型时与关节限位保持的余量
+HALTON_SKIP = 20              # 跳过 Halton 序列开头相关性较强的点
+_PRIMES = (2, 3, 5, 7, 11, 13, 17)
+
+# order: 访问 poses 的下标顺序；routes[i]: 到达 poses[order[i]] 需依次经过的 Pose 列表 (最后一个即目标)
+# final_route: 最后一个 Pose 到终点的路线 (无终点时为空)；total_time: 预计总运动时间 (秒)
+PosePlan = namedtuple("PosePlan", ["order", "routes", "final_route", "total_time"])
+
+
+def movej_time(q0_deg, q1_deg, vel_scale):
+    """预计 MoveJ 从 q0 到 q1 的运动时间 (秒)。vel_scale 为 jntVelScale (1~100)。"""
+    scale = max(vel_scale, 1) / 100.0
+    t = max(abs(b - a) / (v * scale) for a, b, v in zip(q0_deg, q1_deg, JOINT_VEL_LIMITS_DEG))
+    return t + ACCEL_OVERHEAD_S if t > 1e-6 else 0.0
+
+
+def max_joint_delta(q0_deg, q1_deg):
+    return max(abs(b - a) for a, b in zip(q0_deg, q1_deg))
+
+
+def leg(q0_deg, q1_deg, waypoints, vel_scale, max_direct_delta_deg=MAX_DIRECT_DELTA_DEG, time_fn=movej_time):
+    """返回 (耗时, 路线)；路线为从 q0 出发依次经过的 Pose 列表 (不含 q0，含 q1)。"""
+    if max_joint_delta(q0_deg, q1_deg) <= max_direct_delta_deg or not waypoints:
+        return time_fn(q0_deg, q1_deg, vel_scale), [list(q1_deg)]
+    best = None
+    for w in waypoints:
+        t = time_fn(q0_deg, w, vel_scale) + time_fn(w, q1_deg, vel_scale)
+        if best is None or t < best[0]:
+            best = (t, [list(w), list(q1_deg)])
+    return best
+
+
+def _solve_exact(n, start_cost, cost, end_cost):
+    """Held-Karp：start_cost[j], cost[i][j], end_cost[i] 下的最短哈密顿路径。"""
+    full = (1 << n) - 1
+    dp = {}
+    for j in range(n):
+        dp[(1 << j, j)] = (start_cost[j], None)
+    for size in range(2, n + 1):
+        for subset in itertools.combinations(range(n), size):
+            mask = 0
+            for k in subset:
+                mask |= 1 << k
+            for j in subset:
+                prev_mask = mask & ~(1 << j)
+                best = None
+                for i in subset:
+                    if i == j:
+                        continue
+                    c = dp[(prev_mask, i)][0] + cost[i][j]
+                    if best is None or c < best[0]:
+                        best = (c, i)
+                dp[(mask, j)] = best
+    last = min(range(n), key=lambda j: dp[(full, j)][0] + end_cost[j])
+    order = []
+    mask, j = full, last
+    while j is not None:
+        order.append(j)
+        _, i = dp[(mask, j)]
+        mask &= ~(1 << j)
+        j = i
+    return order[::-1]
+
+
+def _path_cost(order, start_cost, cost, end_cost):
+    c = start_cost[order[0]] + end_cost[order[-1]]
+    for a, b in zip(order, order[1:]):
+        c += cost[a][b]
+    return c
+
+
+def _solve_heuristic(n, start_cost, cost, end_cost):
+    """最近邻构造 + 2-opt 改进。"""
+    order = [min(range(n), key=lambda j: start_cost[j])]
+    left = set(range(n)) - set(order)
+    while left:
+        nxt = min(left, key=lambda j: cost[order[-1]][j])
+        order.append(nxt)
+        left.remove(nxt)
+    best = _path_cost(order, start_cost, cost, end_cost)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for k in range(i + 1, n):
+                cand = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+                c = _path_cost(cand, start_cost, cost, end_cost)
+                if c < best - 1e-9:
+                    order, best, improved = cand, c, True
+    return order
+
+
+def _cache_key(poses, start, end, waypoints, vel_scale, max_direct_delta_deg, cache_tag):
+    payload = json.dumps([[[round(x, 3) for x in p] for p in poses],
+                          [round(x, 3) for x in start],
+                          [round(x, 3) for x in end] if end is not None else None,
+                          [[round(x, 3) for x in w] for w in waypoints],
+                          vel_scale, max_direct_delta_deg, ACCEL_OVERHEAD_S, cache_tag])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def plan_sequence(poses, start, waypoints=(), end=None, vel_scale=25,
+                  max_direct_delta_deg=MAX_DIRECT_DELTA_DEG, cache_file=CACHE_FILE, time_fn=movej_time,
+                  cache_tag=""):
+    """
+    规划从 start 出发访问全部 poses (deg) 并 (可选) 回到 end 的最短时间顺序。
+    time_fn(q0, q1, vel_scale) 可替换为学习得到的运动时间模型，此时 cache_tag 应标识模型参数，
+    模型变化后不会命中旧的缓存。返回 PosePlan。
+    """
+    poses = [list(p) for p in poses]
+    n = len(poses)
+    if n == 0:
+        return PosePlan([], [], [], 0.0)
+    key = _cache_key(poses, start, end, waypoints, vel_scale, max_direct_delta_deg, cache_tag)
+    cache = _load_cache(cache_file) if cache_file else {}
+    if key in cache:
+        hit = cache[key]
+        return PosePlan(hit["order"], hit["routes"], hit["final_route"], hit["total_time"])
+
+    def L(a, b):
+        return leg(a, b, waypoints, vel_scale, max_direct_delta_deg, time_fn)
+
+    start_legs = [L(start, p) for p in poses]
+    legs = [[L(a, b) if i != j else (0.0, [list(b)]) for j, b in enumerate(poses)] for i, a in enumerate(poses)]
+    end_legs = [L(p, end) if end is not None else (0.0, []) for p in poses]
+    start_cost = [c for c, _ in start_legs]
+    cost = [[c for c, _ in row] for row in legs]
+    end_cost = [c for c, _ in end_legs]
+
+    solver = _solve_exact if n <= 12 else _solve_heuristic
+    order = solver(n, start_cost, cost, end_cost)
+    routes = [start_legs[order[0]][1]] + [legs[a][b][1] for a, b in zip(order, order[1:])]
+    final_route = end_legs[order[-1]][1]
+    total = _path_cost(order, start_cost, cost, end_cost)
+
+    if cache_file:
+        cache[key] = {"order": order, "routes": routes, "final_route": final_route, "total_time": total}
+        _save_cache(cache_file, cache)
+    return PosePlan(order, routes, final_route, total)
+
+
+def sequential_time(poses, start, waypoints=(), end=None, vel_scale=25,
+                    max_direct_delta_deg=MAX_DIRECT_DELTA_DEG, time_fn=movej_time):
+    """按给定顺序访问 poses 的预计总时间，用于与规划结果对比。"""
+    total = 0.0
+    cur = start
+    for p in list(poses) + ([end] if end is not None else []):
+        total += leg(cur, p, waypoints, vel_scale, max_direct_delta_deg, time_fn)[0]
+        cur = p
+    return total
+
+
+def halton(n, dims, skip=HALTON_SKIP):
+    """Halton 序列的前 n 个点 ([0,1)^dims，各维以不同质数为基的 radical inverse)。"""
+    points = []
+    for i in range(skip + 1, skip + n + 1):
+        point = []
+        for base in _PRIMES[:dims]:
+            f, r, k = 1.0, 0.0, i
+            while k > 0:
+                f /= base
+                r += f * (k % base)
+                k //= base
+            point.append(r)
+        points.append(point)
+    return points
+
+
+def sample_poses(n, center, joints, span_deg, method="halton", limits=JOINT_LIMITS_DEG, margin_deg=LIMIT_MARGIN_DEG):
+    """
+    围绕 center (deg) 生成测试构型：joints 为要改变的关节下标 (0 起)，各关节取值范围为
+    center ± span_deg 与限位 (留 margin_deg) 的交集，其余关节保持 center。
+    method="halton" 时生成 n 个点；method="grid" 时每个关节取 n 个等间距值 (共 n^len(joints) 个)。
+    """
+    ranges = []
+    for j in joints:
+        lo = max(center[j] - span_deg, limits[j][0] + margin_deg)
+        hi = min(center[j] + span_deg, limits[j][1] - margin_deg)
+        ranges.append((lo, max(lo, hi)))
+    if method == "grid":
+        levels = [0.5] if n <= 1 else [k / (n - 1) for k in range(n)]
+        unit = itertools.product(levels, repeat=len(joints))
+    elif method == "halton":
+        unit = halton(n, len(joints))
+    else:
+        raise ValueError(f"unknown sampling method: {method}")
+    poses = []
+    for u in unit:
+        pose = list(center)
+        for j, (lo, hi), x in zip(joints, ranges, u):
+            pose[j] = lo + x * (hi - lo)
+        poses.append(pose)
+    return poses
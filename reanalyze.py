@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+reanalyze.py
+
+功能：
+1. 对目录树中归档的测量记录离线重新分析 (不连接机器人、不导入 flexivrdk)，与测量脚本共用 benchmark_analysis 中的纯函数，
+   参数相同时结果与在线分析一致；修改分析参数 (分段宽度、稳定窗口、平台判据等) 后可对全部历史会话重新评分：
+   - damping_data_* / auto_damping_*：各方向 (及指令速度) 的分段 B (附 bootstrap 置信区间)，以及按方向合并各速度后的摩擦模型拟合；
+   - tracking_stiffness_samples_*：各轴各次测试按时间戳重新分段，求第一个稳定窗口的刚度 (--filter-cutoff 可由原始列重新滤波)；
+   - transparency_samples_*：各次保持区间的透明度、交叉泄漏与力反馈时延 (接触轴取自同一会话的 transparency_summary_*)；
+   - transparency_staircase_samples_*：各档位平台的透明度、交叉泄漏与线性度 (档位取自 transparency_staircase_*)；
+   - maxcontactwrench_samples_*：各次测试的平均从侧力与误差。
+   min_drag_ft / float_offset 不保存原始采样，无法重新分析。
+2. 每个文件为一个任务，在进程池中并行分析 (-j，默认 CPU 核数)，按完成顺序打印进度；单个文件解析失败只记录错误，不影响其他文件。
+3. 结果写在原文件旁：<原文件名>.reanalysis_v<ANALYSIS_VERSION>_<参数哈希>.csv，首行记录算法版本与全部分析参数 (JSON)；
+   同一版本与参数的结果已存在时跳过 (--force 重新计算)，参数或算法版本改变后新结果与旧结果并存，互不覆盖。
+   另在根目录写出索引 reanalysis_v<版本>_<参数哈希>_<时间>.csv：每个文件一行 (类型、状态、输出文件、主要结果)。
+4. 分析参数默认与各测量脚本相同，可用 --start-cm / --chunk-cm / --segment / --stable-count / --band-rel 等覆盖。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+import benchmark_analysis as ba
+from html_report import read_blocks, DAMPING_HEADER
+from friction_fit import fit_friction, fit_rows, format_fit
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from plateau_detect import linearity, BAND_MIN, BAND_REL, MAX_STD, WINDOW_S, MIN_DURATION
+from wrench_analysis import parse_axis
+
+FIT_CUTOFF = 10.0        # 摩擦拟合前零相位低通截止频率 (Hz)，与 drag_measure 默认相同
+DEFAULT_AXIS = "Z+"      # 找不到会话汇总文件时透明度的接触轴
+OUTPUT_TAG = ".reanalysis_"
+
+
+# ---------- 解析 ----------
+
+def _numeric(rows, ncols):
+    """行列表 -> N x ncols 浮点数组，非数值单元为 nan。"""
+    try:
+        data = np.array([r[:ncols] for r in rows], dtype=np.float64)
+        if data.shape == (len(rows), ncols):
+            return data
+    except ValueError:
+        pass
+    data = np.full((len(rows), ncols), np.nan)
+    for i, row in enumerate(rows):
+        for j, c in enumerate(row[:ncols]):
+            try:
+                data[i, j] = float(c)
+            except ValueError:
+                pass
+    return data
+
+
+def _columns(header, rows):
+    """表头 + 行 -> {列名: 一维浮点数组}，即 benchmark_analysis 各函数的 data 参数。"""
+    data = _numeric(rows, len(header))
+    return {c: data[:, k] for k, c in enumerate(header)}
+
+
+def _sample_table(blocks, key_cols):
+    """采样文件 (首行为表头，其余各块均为采样行)：返回 (数值列名, {前 key_cols 列: 行列表})，分组保持首次出现顺序。"""
+    header = blocks[0][0]
+    groups = {}
+    for row in blocks[0][1:] + [r for b in blocks[1:] for r in b]:
+        if len(row) >= len(header):
+            groups.setdefault(tuple(row[:key_cols]), []).append(row[key_cols:])
+    return header[key_cols:], groups
+
+
+def _session_setting(path, prefix, key):
+    """同一会话汇总文件 (<prefix><时间>.csv 或 .partial) 中首列为 key 的行的其余单元，找不到时返回 None。"""
+    name = os.path.basename(path)
+    stamp = name[name.index("samples_") + len("samples_"):].split(".csv")[0]
+    for cand in (f"{prefix}{stamp}.csv", f"{prefix}{stamp}.csv.partial"):
+        summary = os.path.join(os.path.dirname(path), cand)
+        if os.path.exists(summary):
+            for block in read_blocks(summary):
+                for row in block:
+                    if row and row[0] == key:
+                        return [c for c in row[1:] if c != ""]
+    return None
+
+
+# ---------- 各类文件 ----------
+
+def damping_file(path, blocks, p):
+    """
+    damping_data_* / auto_damping_*：Direction= 开头且表头为 DAMPING_COLUMNS 的块各自重新分段；
+    摩擦模型与在线分析相同，按方向合并该方向全部块 (auto_damping 的各指令速度) 的投影后拟合一次。
+    """
+    runs = []
+    for block in blocks:
+        if not (block[0] and block[0][0].startswith("Direction=") and len(block) > 1 and block[1] == DAMPING_HEADER):
+            continue
+        dname = block[0][0].split("=", 1)[1]
+        setting = " ".join(c for c in block[0][1:] if c)
+        data = _columns(DAMPING_HEADER, block[2:])
+        dir_vec = ba.direction_vector(dname)
+        B_dir, chunks = ba.chunk_damping(data, dir_vec, p["start_cm"] / 100, p["final_cm"] / 100, p["chunk_cm"] / 100)
+        ci = bootstrap_ci([c[5] for c in chunks if c[5] > 0 and c[3] > 1e-6])
+        runs.append((dname, setting, len(block) - 2, B_dir, chunks, ci,
+                     ba.direction_projection(data, dir_vec, p["fit_cutoff"])))
+    if not runs:
+        raise ValueError("no damping sample blocks")
+    pooled = {}
+    for dname, _, n, _, _, _, proj in runs:
+        if n:
+            pooled.setdefault(dname, []).append(proj)
+    fits = {dname: fit_friction(np.concatenate([r[0] for r in projs]), np.concatenate([r[1] for r in projs]),
+                                stribeck=p["stribeck"]) for dname, projs in pooled.items()}
+
+    rows = [["Direction", "Setting", "B_dir"] + ci_header() + ["Fit B", "Fit Fc", "Fit R2"]]
+    detail, summary = [], []
+    for dname, setting, n, B_dir, chunks, ci, _ in runs:
+        fit = fits.get(dname)
+        rows.append([dname, setting, f"{B_dir:.4f}"] + ci_cells(ci) +
+                    ([f"{fit.B:.4f}", f"{fit.Fc:.4f}", f"{fit.r2:.4f}"] if fit is not None else ["", "", ""]))
+        detail.append([])
+        detail.append([f"Direction={dname}"] + ([setting] if setting else []) + [f"N={n}"])
+        detail.append(["ChunkIndex", "DistStart_m", "DistEnd_m", "avgV", "avgF", "Bchunk", "N"])
+        for (idx, ds, de, avV, avF, bc, nm) in chunks:
+            detail.append([idx, f"{ds:.3f}", f"{de:.3f}", f"{avV:.4f}", f"{avF:.4f}", f"{bc:.4f}", nm])
+        summary.append(f"{dname}{' ' + setting if setting else ''} B={format_ci(ci)}")
+    detail.append([])
+    for dname in dict.fromkeys(r[0] for r in runs):
+        detail.extend(fit_rows(dname, fits.get(dname)))
+        summary.append(f"{dname} fit {format_fit(fits.get(dname))}")
+    return rows + detail, summary
+
+
+def stiffness_file(path, blocks, p):
+    """tracking_stiffness_samples_*：各轴各次测试的全部采样按时间戳重新分段。"""
+    header, groups = _sample_table(blocks, 2)
+    cutoff = p["filter_cutoff"]
+    if cutoff is None and "master_pos_f" not in header:
+        cutoff = 0.0  # 早期记录没有滤波列，按原始值分析
+    rows = [["Axis", "Trial", "Stiffness", "Avg Delta", "Stable Time (s)", "Segments"]]
+    per_axis = {}
+    for (axis, trial), trows in groups.items():
+        K, avg_delta, logs, stable_t = ba.stiffness_from_samples(
+            _columns(header, trows), p["segment"], p["stable_count"], p["min_stiffness"], p["max_fluctuation"], cutoff)
+        per_axis.setdefault(axis, []).append(K)
+        rows.append([axis, trial, f"{K:.1f}", f"{avg_delta:.4f}", f"{stable_t:.2f}", len(logs)])
+    rows.append([])
+    rows.append(["Axis", "Average Stiffness"] + ci_header())
+    summary = []
+    for axis, values in per_axis.items():
+        ci = bootstrap_ci(values)
+        rows.append([axis, f"{ci.estimate:.1f}"] + ci_cells(ci, fmt=".1f"))
+        summary.append(f"{axis} K={format_ci(ci, '.1f')}")
+    return rows, summary
+
+
+def transparency_file(path, blocks, p):
+    """transparency_samples_*：各次测试的保持区间。"""
+    axis = p["axis"] or (_session_setting(path, "transparency_summary_", "Contact Axis") or [DEFAULT_AXIS])[0]
+    header, groups = _sample_table(blocks, 1)
+    idx, _ = parse_axis(axis)
+    rows = [["Contact Axis", axis], [], ["Test Number", "Transparency (1:T)", f"T_{axis[0]}", "Leakage Total", "Lag (ms)"]]
+    T_list, leak_list, lag_list = [], [], []
+    for (test,), trows in groups.items():
+        T_avg, res, _, _, lag = ba.hold_transparency(_columns(header, trows), axis)
+        T_list.append(T_avg)
+        lag_list.append(lag * 1000)
+        if res is None:
+            rows.append([test, f"1:{T_avg:.4f}", "", "", f"{lag*1000:.1f}"])
+            continue
+        leak_list.append(res.leakage_total)
+        rows.append([test, f"1:{T_avg:.4f}", f"{res.ratios[idx]:.4f}", f"{res.leakage_total:.4f}", f"{lag*1000:.1f}"])
+    rows.append([])
+    rows.append(["Metric", "Average"] + ci_header())
+    summary = []
+    for label, values in (("Transparency", T_list), ("Leakage Total", leak_list), ("Lag (ms)", lag_list)):
+        ci = bootstrap_ci(values)
+        rows.append([label, f"{ci.estimate:.4f}"] + ci_cells(ci))
+        summary.append(f"{label}={format_ci(ci)}")
+    return rows, summary
+
+
+def staircase_file(path, blocks, p):
+    """transparency_staircase_samples_*：各次阶梯记录重新分割平台。"""
+    axis = p["axis"] or (_session_setting(path, "transparency_staircase_", "Contact Axis") or [DEFAULT_AXIS])[0]
+    levels = p["levels"] or [float(x) for x in _session_setting(path, "transparency_staircase_", "Levels (N)") or []]
+    if not levels:
+        raise ValueError("staircase levels unknown (no session summary); pass --levels")
+    header, groups = _sample_table(blocks, 1)
+    idx, _ = parse_axis(axis)
+    plateau_kwargs = dict(band_min=p["band_min"], band_rel=p["band_rel"], max_std=p["max_std"],
+                          window_s=p["plateau_window"], min_duration=p["min_plateau"])
+    rows = [["Contact Axis", axis], ["Levels (N)"] + [f"{x:g}" for x in levels], [],
+            ["Test Number", "Level(N)", "Plateau(s)", "F_slave(N)", "F_master(N)", "Transparency (1:T)",
+             "Leakage Total", "Lag (ms)"]]
+    per_level = {k: [] for k in range(len(levels))}
+    points = []
+    for (test,), trows in groups.items():
+        found, lag = ba.staircase_results(_columns(header, trows), axis, levels, p["lag_diff"], **plateau_kwargs)
+        for k, level in enumerate(levels):
+            if k not in found:
+                rows.append([test, f"{level:g}", "no plateau"])
+                continue
+            pl, res, f_s, f_m = found[k]
+            per_level[k].append(res.ratios[idx])
+            points.append((f_s, f_m))
+            rows.append([test, f"{level:g}", f"{pl.t_end - pl.t_start:.1f}", f"{f_s:.4f}", f"{f_m:.4f}",
+                         f"1:{res.ratios[idx]:.4f}", f"{res.leakage_total:.4f}", f"{lag*1000:.1f}"])
+    rows.append([])
+    rows.append(["Level(N)", "Average Transparency (1:T)"] + ci_header())
+    summary = []
+    for k, level in enumerate(levels):
+        ci = bootstrap_ci(per_level[k])
+        rows.append([f"{level:g}", f"1:{ci.estimate:.4f}"] + ci_cells(ci))
+        summary.append(f"{level:g}N T={format_ci(ci)}")
+    lin = linearity([s for s, _ in points], [m for _, m in points])
+    if lin is not None:
+        rows.append([])
+        rows.append(["Linearity", "Gain", "Offset(N)", "R2", "MaxDev(%FS)", "N"])
+        rows.append(["", f"{lin.gain:.4f}", f"{lin.offset:.4f}", f"{lin.r2:.4f}", f"{lin.max_dev_pct:.2f}", lin.n])
+        summary.append(f"linearity gain={lin.gain:.4f} R2={lin.r2:.4f}")
+    return rows, summary
+
+
+def contact_file(path, blocks, p):
+    """maxcontactwrench_samples_*：各设定值各次测试的有效区间。"""
+    _, groups = _sample_table(blocks, 2)
+    rows = [["Set Value (N)", "Test Number", "Average Slave Force (N)", "Error (%)"]]
+    per_setpoint = {}
+    for (test, sp), trows in groups.items():
+        data = _numeric(trows, 2)
+        avg, err = ba.contact_error(data[:, 0], data[:, 1], float(sp), p["trim"])
+        per_setpoint.setdefault(sp, []).append((avg, err))
+        rows.append([sp, test, f"{avg:.4f}", f"{err:.2f}"])
+    rows.append([])
+    rows.append(["Set Value (N)", "Average Slave Force (N)"] + ci_header("Force_") + ["Average Error (%)"] +
+                ci_header("Error_", with_n=False))
+    summary = []
+    for sp, results in per_setpoint.items():
+        f_ci = bootstrap_ci([r[0] for r in results])
+        e_ci = bootstrap_ci([r[1] for r in results])
+        rows.append([sp, f"{f_ci.estimate:.4f}"] + ci_cells(f_ci) + [f"{e_ci.estimate:.2f}"] +
+                    ci_cells(e_ci, fmt=".2f", with_n=False))
+        summary.append(f"{sp}N error={format_ci(e_ci, '.2f')}%")
+    return rows, summary
+
+
+# 文件名前缀 -> (类型, 分析函数)
+ANALYZERS = (
+    ("damping_data_", "damping", damping_file),
+    ("auto_damping_", "damping", damping_file),
+    ("tracking_stiffness_samples_", "stiffness", stiffness_file),
+    ("transparency_staircase_samples_", "staircase", staircase_file),
+    ("transparency_samples_", "transparency", transparency_file),
+    ("maxcontactwrench_samples_", "contact", contact_file),
+)
+
+
+def classify(name):
+    """文件名 -> (类型, 分析函数)；不是可重新分析的记录时返回 None。"""
+    if OUTPUT_TAG in name or "_timing" in name or not (name.endswith(".csv") or name.endswith(".csv.partial")):
+        return None
+    for prefix, kind, func in ANALYZERS:
+        if name.startswith(prefix):
+            return kind, func
+    return None
+
+
+def find_recordings(root):
+    """递归查找可重新分析的记录，按路径排序。"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        found.extend(os.path.join(dirpath, f) for f in sorted(filenames) if classify(f))
+    return found
+
+
+# ---------- 输出 ----------
+
+def params_tag(params):
+    """'v<版本>_<参数哈希前 8 位>'，参数按键排序后序列化，与字典顺序无关。"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"v{ba.ANALYSIS_VERSION}_{digest}"
+
+
+def output_path(path, tag):
+    base, partial = (path[:-len(".partial")], True) if path.endswith(".partial") else (path, False)
+    return f"{base[:-len('.csv')]}{'.partial' if partial else ''}{OUTPUT_TAG}{tag}.csv"
+
+
+def _write_csv(path, rows):
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    os.replace(tmp, path)
+
+
+def reanalyze_file(path, params, force=False):
+    """
+    进程池任务：重新分析一个记录文件并写出结果。
+    返回 (路径, 类型, 状态 "ok"/"skipped"/"error", 输出路径, 结果摘要列表或错误信息)。
+    """
+    kind, func = classify(os.path.basename(path))
+    out = output_path(path, params_tag(params))
+    if not force and os.path.exists(out):
+        return path, kind, "skipped", out, []
+    try:
+        blocks = read_blocks(path)
+        if not blocks:
+            raise ValueError("empty file")
+        rows, summary = func(path, blocks, params)
+    except (KeyError, IndexError, ValueError) as e:
+        return path, kind, "error", "", [repr(e)]
+    header = [["Reanalysis", os.path.basename(path), f"analysis_version={ba.ANALYSIS_VERSION}",
+               json.dumps(params, sort_keys=True)], []]
+    _write_csv(out, header + rows)
+    return path, kind, "ok", out, summary
+
+
+# ---------- 命令行 ----------
+
+def parse_levels(s):
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Offline re-analysis of archived benchmark recordings")
+    p.add_argument("root", nargs="?", default=".", help="记录目录 (递归查找，默认当前目录)")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行进程数 (默认 CPU 核数)")
+    p.add_argument("--force", action="store_true", help="同一版本与参数的结果已存在时也重新计算")
+    p.add_argument("--list", action="store_true", help="只列出找到的记录，不分析")
+    g = p.add_argument_group("阻尼 (drag / auto-damping)")
+    g.add_argument("--start-cm", type=float, default=ba.START_DIST * 100, help="开始分段的位移 (cm)")
+    g.add_argument("--final-cm", type=float, default=ba.FINAL_DIST * 100, help="结束分段的位移 (cm)")
+    g.add_argument("--chunk-cm", type=float, default=ba.CHUNK_M * 100, help="分段宽度 (cm)")
+    g.add_argument("--fit-cutoff", type=float, default=FIT_CUTOFF, help="摩擦拟合前低通截止频率 (Hz)，0 为不滤波")
+    g.add_argument("--stribeck", action="store_true", help="摩擦拟合中加入 Stribeck 项")
+    g = p.add_argument_group("跟踪刚度")
+    g.add_argument("--segment", type=float, default=ba.SEGMENT_DURATION, help="段时长 (秒)")
+    g.add_argument("--stable-count", type=int, default=ba.STABLE_COUNT, help="连续稳定段数")
+    g.add_argument("--min-stiffness", type=float, default=ba.MIN_STIFFNESS, help="段刚度下限")
+    g.add_argument("--max-fluctuation", type=float, default=ba.MAX_FLUCTUATION, help="稳定窗口内刚度最大-最小之差上限")
+    g.add_argument("--filter-cutoff", type=float, default=None,
+                   help="由原始列重新滤波的截止频率 (Hz，0 为不滤波)；默认使用记录中的滤波列")
+    g = p.add_argument_group("透明度")
+    g.add_argument("--axis", choices=["X+", "X-", "Y+", "Y-", "Z+", "Z-"], default=None,
+                   help="接触轴 (默认取自会话汇总文件)")
+    g.add_argument("--levels", type=parse_levels, default=None, help="阶梯档位 (N，逗号分隔；默认取自会话汇总文件)")
+    g.add_argument("--band-min", type=float, default=BAND_MIN, help="档位容差带下限 (N)")
+    g.add_argument("--band-rel", type=float, default=BAND_REL, help="档位容差带相对比例")
+    g.add_argument("--max-std", type=float, default=MAX_STD, help="平台内滑动标准差上限 (N)")
+    g.add_argument("--plateau-window", type=float, default=WINDOW_S, help="滑动标准差窗口 (秒)")
+    g.add_argument("--min-plateau", type=float, default=MIN_DURATION, help="平台最短持续时间 (秒)")
+    g.add_argument("--lag-diff", type=float, default=ba.LAG_DIFF_S, help="阶梯记录估计时延的差分跨度 (秒)")
+    g = p.add_argument_group("最大接触力")
+    g.add_argument("--trim", type=float, default=0.0, help="去掉每次测试有效区间开头的秒数")
+    args = p.parse_args(argv)
+    if args.jobs < 1:
+        p.error("-j 须 >= 1")
+    if args.chunk_cm <= 0 or args.final_cm <= args.start_cm:
+        p.error("需要 --chunk-cm > 0 且 --final-cm > --start-cm")
+    if args.segment <= 0 or args.stable_count < 1:
+        p.error("需要 --segment > 0 且 --stable-count >= 1")
+    return args
+
+
+def analysis_params(args):
+    """参与结果命名与哈希的分析参数 (不含 -j / --force 等运行选项)。"""
+    return {k: getattr(args, k) for k in (
+        "start_cm", "final_cm", "chunk_cm", "fit_cutoff", "stribeck",
+        "segment", "stable_count", "min_stiffness", "max_fluctuation", "filter_cutoff",
+        "axis", "levels", "band_min", "band_rel", "max_std", "plateau_window", "min_plateau", "lag_diff",
+        "trim")}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = find_recordings(args.root)
+    if args.list or not files:
+        for path in files:
+            print(f"{classify(os.path.basename(path))[0]:<13} {path}")
+        print(f"共 {len(files)} 个可重新分析的记录 ({os.path.abspath(args.root)})")
+        return 0
+
+    params = analysis_params(args)
+    tag = params_tag(params)
+    print(f"重新分析 {len(files)} 个记录，算法版本 {ba.ANALYSIS_VERSION}，参数 {tag}，{args.jobs} 个进程")
+    t_start = time.monotonic()
+    results = []
+    if args.jobs == 1:
+        done = (reanalyze_file(path, params, args.force) for path in files)
+    else:
+        pool = ProcessPoolExecutor(max_workers=args.jobs)
+        futures = [pool.submit(reanalyze_file, path, params, args.force) for path in files]
+        done = (f.result() for f in as_completed(futures))
+    try:
+        for n, res in enumerate(done, 1):
+            path, kind, status, out, summary = res
+            results.append(res)
+            note = "; ".join(summary) if status == "error" else (os.path.basename(out) if out else "")
+            print(f"[{n}/{len(files)}] {status:<7} {kind:<12} {os.path.relpath(path, args.root)}  {note}")
+    finally:
+        if args.jobs > 1:
+            pool.shutdown(cancel_futures=True)
+
+    results.sort(key=lambda r: r[0])
+    index = os.path.join(args.root, f"reanalysis_{tag}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    rows = [["Reanalysis Index", f"analysis_version={ba.ANALYSIS_VERSION}", json.dumps(params, sort_keys=True)], [],
+            ["File", "Type", "Status", "Output", "Result"]]
+    for path, kind, status, out, summary in results:
+        rows.append([os.path.relpath(path, args.root), kind, status,
+                     os.path.relpath(out, args.root) if out else "", " | ".join(summary)])
+    _write_csv(index, rows)
+    counts = {s: sum(1 for r in results if r[2] == s) for s in ("ok", "skipped", "error")}
+    print(f"完成：{counts['ok']} 个已分析，{counts['skipped']} 个已存在跳过，{counts['error']} 个出错，"
+          f"用时 {time.monotonic() - t_start:.1f} s")
+    print(f"索引已写入 {index}")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+result_writer.py
+
+功能：
+1. 提供 ResultWriter：测量循环只把待写入的行放入队列，由后台线程完成 CSV 格式化与磁盘 I/O，采样不会被写盘阻塞。
+2. 后台线程批量写入，按行数或时间间隔 flush；在每个 trial/方向结束时调用 mark_trial_done() 执行 fsync，
+   保证已完成的 trial 在崩溃、Ctrl+C 或断电后都不会丢失。
+3. 写入期间文件名为 "<name>.partial"；会话正常结束时 close() 先 fsync 再通过 os.replace 原子地重命名为最终文件名。
+   若会话异常结束（close(complete=False)），则保留 .partial 文件，其中包含全部已完成 trial 的数据。
+"""
+
+import csv
+import os
+import queue
+import threading
+import time
+
+_ROWS = 0
+_SAMPLES = 1
+_SYNC = 2
+_CLOSE = 3
+
+
+class ResultWriter:
+    """
+    后台线程 CSV 写入器。
+
+    path:           最终文件名 (写入期间为 path + ".partial")
+    flush_interval: 两次 flush 之间的最长间隔 (秒)
+    batch_rows:     累计多少行后立即 flush
+    """
+
+    def __init__(self, path, flush_interval=0.5, batch_rows=1000):
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self._queue = queue.SimpleQueue()
+        self._file = open(self.partial_path, "w", newline='', encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"ResultWriter({os.path.basename(path)})", daemon=True)
+        self._thread.start()
+
+    # ---------- 生产者接口 (测量线程调用, 只入队) ----------
+
+    def writerow(self, row):
+        self._queue.put((_ROWS, [row]))
+
+    def writerows(self, rows):
+        self._queue.put((_ROWS, list(rows)))
+
+    def write_samples(self, rows, fmt="{:.4f}"):
+        """写入一批采样记录，浮点数按 fmt 格式化 (在后台线程完成)，其余字段原样写入。"""
+        self._queue.put((_SAMPLES, (rows, fmt)))
+
+    def mark_trial_done(self, wait=False):
+        """trial 边界：后台线程 flush + fsync。wait=True 时阻塞直到数据已落盘。"""
+        done = threading.Event()
+        self._queue.put((_SYNC, done))
+        if wait:
+            done.wait()
+
+    def close(self, complete=True):
+        """
+        结束写入。complete=True 时原子重命名为最终文件名并返回最终路径；
+        否则保留 .partial 文件并返回其路径。可重复调用。
+        """
+        if self._closed:
+            return self.path if complete else self.partial_path
+        self._closed = True
+        self._queue.put((_CLOSE, complete))
+        self._thread.join()
+        if self._error is not None:
+            print(f"[ResultWriter] 写入 {self.partial_path} 出错: {self._error}")
+            return self.partial_path
+        return self.path if complete else self.partial_path
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                kind, payload = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                kind, payload = None, None
+            try:
+                if kind == _ROWS:
+                    self._writer.writerows(payload)
+                    pending += len(payload)
+                elif kind == _SAMPLES:
+                    rows, fmt = payload
+                    self._writer.writerows([[fmt.format(x) if isinstance(x, float) else x for x in rec]
+                                            for rec in rows])
+                    pending += len(rows)
+                elif kind == _SYNC:
+                    self._sync()
+                    pending = 0
+                    last_flush = time.monotonic()
+                    payload.set()
+                    continue
+                elif kind == _CLOSE:
+                    self._finalize(payload)
+                    return
+                now = time.monotonic()
+                if pending and (pending >= self.batch_rows or now - last_flush >= self.flush_interval):
+                    self._file.flush()
+                    pending = 0
+                    last_flush = now
+            except Exception as e:
+                # 记录首个错误后继续消费队列，避免生产者阻塞；close() 时报告
+                if self._error is None:
+                    self._error = e
+                if kind == _SYNC:
+                    payload.set()
+                elif kind == _CLOSE:
+                    return
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _finalize(self, complete):
+        self._sync()
+        self._file.close()
+        if complete:
+            os.replace(self.partial_path, self.path)
+            # 目录项也需落盘, 保证重命名本身在断电后可见
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+robot_daemon.py
+
+功能：
+1. 常驻守护进程持有机器人连接 (flexivrdk.Robot，或 --sim 时为 sim_robot.Robot)，经本机 Unix socket
+   为各基准测试脚本提供状态读取与运动指令；连接开销每个班次只付一次，脚本附着只需毫秒级。
+   - -1/-2/-r 指定的机器人在启动时即连接，其他序列号在客户端首次附着时连接；
+   - 每台机器人一把锁，多个客户端 (及同一客户端的多个线程) 的调用按机器人串行；
+   - 后台线程每 --health 秒检查 connected()，断开后自动重连；读状态类调用遇到连接断开时重连后重试一次，
+     运动类调用不重试 (异常原样返回客户端)。
+2. 协议：4 字节长度 + pickle 帧，请求 (序列号, 方法名, args, kwargs)，应答 ("ok", 值) 或 ("err", 异常类型, 信息)。
+   只传输基本类型与容器 (反序列化拒绝任何类)；SDK 枚举 (Mode) 与值类型 (JPos、Coord) 按名称/字段编码，
+   在对端用各自的 SDK 模块重建；states() 等返回的对象按公开属性快照为 SimpleNamespace。
+   socket 文件权限 0600，仅本用户可连接。
+3. 客户端：connect(sn, sdk) 在守护进程可用时返回 RemoteRobot (接口与 flexivrdk.Robot 一致)，
+   否则回退为直接 sdk.Robot(sn)；各测量脚本均经 connect() 连接机器人，无需额外参数；
+   FLEXIV_ROBOT_DAEMON=off 可强制直连，FLEXIV_ROBOT_SOCKET 指定 socket 路径。
+4. 命令行：python robot_daemon.py -1 <主> -2 <从> [--sim] 启动；--status 查看连接状态，--shutdown 结束守护进程。
+"""
+
+import argparse
+import io
+import os
+import pickle
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import types
+
+DEFAULT_SOCKET = os.environ.get("FLEXIV_ROBOT_SOCKET", f"/tmp/flexiv_robot_daemon_{os.getuid()}.sock")
+HEALTH_S = 1.0
+CONNECT_TIMEOUT_S = 0.2  # 客户端探测守护进程的超时
+
+# 连接断开时可安全重试的只读调用
+RETRY_METHODS = {"states", "digital_inputs", "mode", "fault", "operational", "connected"}
+
+# SDK 值类型：构造参数依次取自哪个属性 (不同 SDK 版本属性名可能不同，按顺序取第一个存在的)
+SDK_VALUE_TYPES = {
+    "JPos": (("q",), ("q_e", "ext_q")),
+    "Coord": (("position",), ("orientation",), ("ref_frame",)),
+}
+
+_ENUM, _VALUE, _OBJECT = "\x00enum", "\x00value", "\x00object"
+_HEADER = struct.Struct("!I")
+
+
+class RemoteError(RuntimeError):
+    """守护进程中调用抛出的异常 (类型名与信息)。"""
+
+    def __init__(self, exc_type, message):
+        super().__init__(f"{exc_type}: {message}")
+        self.exc_type = exc_type
+
+
+# ---------- 编解码 ----------
+
+def _is_enum(obj):
+    return hasattr(type(obj), "__members__") and hasattr(obj, "name")
+
+
+def _public_attrs(obj):
+    for name in dir(obj):
+        if name.startswith("_"):
+            continue
+        try:
+            value = getattr(obj, name)
+        except Exception:
+            continue
+        if not callable(value):
+            yield name, value
+
+
+def encode(obj):
+    """转为只含基本类型与容器的结构。"""
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(encode(x) for x in obj)
+    if isinstance(obj, dict):
+        return {k: encode(v) for k, v in obj.items()}
+    if _is_enum(obj):
+        return (_ENUM, type(obj).__name__, obj.name)
+    tname = type(obj).__name__
+    if tname in SDK_VALUE_TYPES:
+        args = []
+        for names in SDK_VALUE_TYPES[tname]:
+            attr = next((n for n in names if hasattr(obj, n)), None)
+            if attr is None:
+                break
+            args.append(encode(getattr(obj, attr)))
+        return (_VALUE, tname, args)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return (_OBJECT, tname, {k: encode(v) for k, v in _public_attrs(obj)})
+
+
+def decode(obj, sdk=None):
+    """encode 的逆过程；枚举与值类型在 sdk 模块中重建 (sdk 为 None 时枚举保留名称字符串)。"""
+    if isinstance(obj, list):
+        return [decode(x, sdk) for x in obj]
+    if isinstance(obj, dict):
+        return {k: decode(v, sdk) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        if len(obj) == 3 and obj[0] == _ENUM:
+            enum_type = getattr(sdk, obj[1], None)
+            return getattr(enum_type, obj[2]) if enum_type is not None else obj[2]
+        if len(obj) == 3 and obj[0] == _VALUE:
+            return getattr(sdk, obj[1])(*[decode(a, sdk) for a in obj[2]])
+        if len(obj) == 3 and obj[0] == _OBJECT:
+            return types.SimpleNamespace(**{k: decode(v, sdk) for k, v in obj[2].items()})
+        return tuple(decode(x, sdk) for x in obj)
+    return obj
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"refusing to load {module}.{name}")
+
+
+def _send(sock, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv(sock):
+    (n,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _SafeUnpickler(io.BytesIO(_recv_exact(sock, n))).load()
+
+
+# ---------- 守护进程 ----------
+
+def _connected(robot):
+    try:
+        return bool(robot.connected())
+    except Exception:
+        return False
+
+
+class _Connection:
+    def __init__(self, sn, sdk):
+        self.sn = sn
+        self.sdk = sdk
+        self.lock = threading.Lock()
+        self.robot = None
+        self.connect_s = None
+        self.reconnects = 0
+        self.calls = 0
+
+    def _ensure(self):
+        if self.robot is None:
+            t0 = time.monotonic()
+            self.robot = self.sdk.Robot(self.sn)
+            self.connect_s = time.monotonic() - t0
+            print(f"[Daemon] 已连接 {self.sn} ({self.connect_s:.2f}s)", flush=True)
+        return self.robot
+
+    def _drop(self):
+        self.robot = None
+        self.reconnects += 1
+
+    def attach(self):
+        with self.lock:
+            self._ensure()
+
+    def call(self, method, args, kwargs):
+        with self.lock:
+            self.calls += 1
+            robot = self._ensure()
+            try:
+                return getattr(robot, method)(*args, **kwargs)
+            except AttributeError:
+                raise
+            except Exception:
+                if method not in RETRY_METHODS or _connected(robot):
+                    raise
+                print(f"[Daemon] {self.sn} 连接断开，重连后重试 {method}()", flush=True)
+                self._drop()
+                return getattr(self._ensure(), method)(*args, **kwargs)
+
+    def check(self):
+        """健康检查：已连接但 connected() 为假时重连。"""
+        with self.lock:
+            if self.robot is None or _connected(self.robot):
+                return
+            print(f"[Daemon] {self.sn} 连接断开，重连...", flush=True)
+            self._drop()
+            try:
+                self._ensure()
+            except Exception as e:
+                print(f"[Daemon] {self.sn} 重连失败: {e}", flush=True)
+
+    def status(self):
+        return {"connected": self.robot is not None and _connected(self.robot), "connect_s": self.connect_s,
+                "reconnects": self.reconnects, "calls": self.calls}
+
+
+class RobotDaemon:
+    def __init__(self, sdk, socket_path=DEFAULT_SOCKET, health_s=HEALTH_S):
+        self.sdk = sdk
+        self.socket_path = socket_path
+        self.health_s = health_s
+        self.started = time.time()
+        self._conns = {}
+        self._conns_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+
+    def connection(self, sn):
+        with self._conns_lock:
+            conn = self._conns.get(sn)
+            if conn is None:
+                conn = self._conns[sn] = _Connection(sn, self.sdk)
+        return conn
+
+    def handle(self, request):
+        sn, method, args, kwargs = request
+        if sn is None:
+            return self._control(method, args)
+        conn = self.connection(sn)
+        return encode(conn.call(method, decode(args, self.sdk), decode(kwargs, self.sdk)))
+
+    def _control(self, command, args):
+        if command == "ping":
+            return os.getpid()
+        if command == "attach":
+            self.connection(args[0]).attach()
+            return True
+        if command == "status":
+            with self._conns_lock:
+                conns = dict(self._conns)
+            return {"pid": os.getpid(), "uptime_s": time.time() - self.started,
+                    "robots": {sn: c.status() for sn, c in conns.items()}}
+        if command == "shutdown":
+            return True  # 应答发出后由 Handler 结束服务
+        raise ValueError(f"unknown command {command}")
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_s):
+            with self._conns_lock:
+                conns = list(self._conns.values())
+            for conn in conns:
+                conn.check()
+
+    def serve_forever(self, serials=()):
+        if os.path.exists(self.socket_path):
+            if ping(self.socket_path) is not None:
+                raise SystemExit(f"[Daemon] {self.socket_path} 上已有守护进程在运行。")
+            os.unlink(self.socket_path)
+        for sn in serials:
+            self.connection(sn).attach()
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = _recv(self.request)
+                    except (ConnectionError, OSError):
+                        return
+                    try:
+                        reply = ("ok", daemon.handle(request))
+                    except Exception as e:
+                        reply = ("err", type(e).__name__, str(e))
+                    _send(self.request, reply)
+                    if request[0] is None and request[1] == "shutdown":
+                        threading.Thread(target=daemon.shutdown, daemon=True).start()
+                        return
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        old_umask = os.umask(0o177)
+        try:
+            self._server = Server(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        threading.Thread(target=self._health_loop, name="DaemonHealth", daemon=True).start()
+        print(f"[Daemon] pid={os.getpid()} 监听 {self.socket_path}", flush=True)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            print("[Daemon] 已退出", flush=True)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+# ---------- 客户端 ----------
+
+class _Channel:
+    """一个 socket 连接；同一 RemoteRobot 的多个线程共用，按请求加锁。"""
+
+    def __init__(self, socket_path, timeout=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.sock.settimeout(None)
+        self.lock = threading.Lock()
+
+    def request(self, sn, method, args=(), kwargs=None):
+        with self.lock:
+            _send(self.sock, (sn, method, args, kwargs or {}))
+            reply = _recv(self.sock)
+        if reply[0] == "ok":
+            return reply[1]
+        if reply[1] == "AttributeError":
+            raise AttributeError(reply[2])
+        raise RemoteError(reply[1], reply[2])
+
+    def close(self):
+        self.sock.close()
+
+
+class RemoteRobot:
+    """守护进程中一台机器人的代理，方法调用转发给守护进程。"""
+
+    def __init__(self, sn, sdk=None, socket_path=DEFAULT_SOCKET):
+        self.serial_number = sn
+        self._sdk = sdk
+        self._channel = _Channel(socket_path)
+        self._channel.request(None, "attach", (sn,))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        channel, sn, sdk = self._channel, self.serial_number, self._sdk
+
+        def call(*args, **kwargs):
+            return decode(channel.request(sn, name, encode(args), encode(kwargs)), sdk)
+
+        call.__name__ = name
+        return call
+
+    def close(self):
+        self._channel.close()
+
+
+def ping(socket_path=DEFAULT_SOCKET, timeout=CONNECT_TIMEOUT_S):
+    """守护进程可用时返回其 pid，否则 None。"""
+    try:
+        channel = _Channel(socket_path, timeout)
+    except OSError:
+        return None
+    try:
+        return channel.request(None, "ping")
+    except (OSError, ConnectionError, RemoteError):
+        return None
+    finally:
+        channel.close()
+
+
+def connect(sn, sdk, socket_path=None):
+    """守护进程可用时附着到其中的连接，否则直接 sdk.Robot(sn)。"""
+    socket_path = socket_path or DEFAULT_SOCKET
+    if os.environ.get("FLEXIV_ROBOT_DAEMON", "").lower() != "off" and os.path.exists(socket_path):
+        t0 = time.monotonic()
+        try:
+            robot = RemoteRobot(sn, sdk, socket_path)
+        except (OSError, ConnectionError) as e:
+            print(f"[Daemon] 无法附着 {socket_path} ({e})，直接连接 {sn}")
+        else:
+            print(f"[Daemon] 已附着 {sn} ({(time.monotonic() - t0) * 1000:.1f} ms)")
+            return robot
+    return sdk.Robot(sn)
+
+
+# ---------- 命令行 ----------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Robot connection daemon")
+    parser.add_argument("-1", "--leader", help="主机械臂序列号 (启动时连接)")
+    parser.add_argument("-2", "--follower", help="从机械臂序列号 (启动时连接)")
+    parser.add_argument("-r", "--robot", action="append", default=[], help="其他启动时连接的序列号 (可重复)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix socket 路径 (默认 {DEFAULT_SOCKET})")
+    parser.add_argument("--sim", action="store_true", help="使用模拟后端 sim_robot")
+    parser.add_argument("--health", type=float, default=HEALTH_S, help=f"连接检查周期 s (默认 {HEALTH_S:g})")
+    parser.add_argument("--status", action="store_true", help="打印运行中守护进程的连接状态")
+    parser.add_argument("--shutdown", action="store_true", help="结束运行中的守护进程")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.status or args.shutdown:
+        try:
+            channel = _Channel(args.socket, CONNECT_TIMEOUT_S)
+        except OSError:
+            print(f"{args.socket} 上没有运行中的守护进程。")
+            sys.exit(1)
+        if args.shutdown:
+            channel.request(None, "shutdown")
+            print("守护进程已结束。")
+            return
+        status = channel.request(None, "status")
+        print(f"pid={status['pid']}  uptime={status['uptime_s']:.0f}s")
+        for sn, s in status["robots"].items():
+            connect_s = f"{s['connect_s']:.2f}s" if s["connect_s"] is not None else "-"
+            print(f"  {sn:<24} connected={s['connected']}  connect={connect_s}  "
+                  f"reconnects={s['reconnects']}  calls={s['calls']}")
+        return
+
+    if args.sim:
+        import sim_robot as sdk
+    else:
+        import flexivrdk as sdk
+    daemon = RobotDaemon(sdk, args.socket, args.health)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=daemon.shutdown, daemon=True).start())
+    serials = [sn for sn in [args.leader, args.follower] + args.robot if sn]
+    try:
+        daemon.serve_forever(serials)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sample_buffer.py
+
+功能：
+1. 提供按列存储的定长浮点采样容器 SampleBuffer，替代 "list of tuple" 形式的采样记录。
+   数据保存在预分配的 NumPy 二维数组中 (列 x 容量)，每条采样只占 ncols*8 字节，不产生逐条 Python 对象，
+   采样循环中不会因大量小对象分配而触发 GC 停顿。
+2. 容量不足时按倍数几何增长 (均摊 O(1) 追加)；可按预计时长和采样率预分配，长时间录制无需扩容。
+   例：1 kHz x 1 小时 x 11 列 ≈ 32 MB。
+3. buf["name"] / buf.column("name") 返回该列已写入部分的连续视图 (不复制)，可直接用于向量化计算。
+"""
+
+import numpy as np
+
+
+class SampleBuffer:
+    """
+    columns:  列名序列
+    capacity: 初始容量 (采样条数)
+    growth:   扩容倍数
+    """
+
+    def __init__(self, columns, capacity=1024, growth=2.0, dtype=np.float64):
+        self.columns = tuple(columns)
+        self._index = {name: j for j, name in enumerate(self.columns)}
+        self._growth = growth
+        self._data = np.empty((len(self.columns), max(int(capacity), 1)), dtype=dtype)
+        self._n = 0
+
+    @classmethod
+    def for_duration(cls, columns, seconds, rate_hz, **kwargs):
+        """按预计录制时长 (秒) 和采样率 (Hz) 预分配。"""
+        return cls(columns, capacity=int(seconds * rate_hz) + 1, **kwargs)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def append(self, *values):
+        """追加一条采样，values 按 columns 顺序给出。"""
+        n = self._n
+        if n == self._data.shape[1]:
+            self._grow(n + 1)
+        self._data[:, n] = values
+        self._n = n + 1
+
+    def extend(self, rows):
+        """追加多条采样，rows 为 (N, ncols) 的数组或序列。"""
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, len(self.columns))
+        n, m = self._n, rows.shape[0]
+        if n + m > self._data.shape[1]:
+            self._grow(n + m)
+        self._data[:, n:n + m] = rows.T
+        self._n = n + m
+
+    def clear(self):
+        """清空数据，保留已分配的内存。"""
+        self._n = 0
+
+    def column(self, name):
+        """返回列 name 已写入部分的视图 (不复制)。"""
+        return self._data[self._index[name], :self._n]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def array(self, start=0, stop=None):
+        """返回 [start, stop) 区间的 (N, ncols) 视图 (不复制)。"""
+        stop = self._n if stop is None else min(stop, self._n)
+        return self._data[:, start:stop].T
+
+    def rows(self, start=0, stop=None):
+        """返回 [start, stop) 区间的 Python 行列表，用于写 CSV 等非热路径。"""
+        return [tuple(r) for r in self.array(start, stop).tolist()]
+
+    def _grow(self, min_capacity):
+        new_cap = self._data.shape[1]
+        while new_cap < min_capacity:
+            new_cap = int(new_cap * self._growth) + 1
+        new_data = np.empty((self._data.shape[0], new_cap), dtype=self._data.dtype)
+        new_data[:, :self._n] = self._data[:, :self._n]
+        self._data = new_data
@@ -5,12 +5,14 @@
 save_go_pose.py
 
 功能：
-1. 通过命令行位置参数获取一个或多个机器人序列号（例如：python save_go_pose_dual.py Rizon4s-123456 Rizon4s-123452）。
+1. 通过 -1/-2 (与其他测量脚本一致) 获取主/从机器人序列号，例如：python save_go_pose.py -1 Rizon4s-123456 -2 Rizon4s-123452；
+   仍兼容位置参数形式 (可追加更多机器人)，第一个机器人为 -1 (未给出时为第一个位置参数)。
 2. 脚本支持如下命令：
    - 按‘s’键保存第一个机器人当前的姿态（保存关节角、TCP姿态的四元数和Euler角）姿态信息写入 CSV 文件中。
-   - 按‘g’键加载保存的姿态，依次使所有机器人移动到该姿态（调用 move_j_deg 和 wait_for_reached_or_timeout）。
+   - 按‘g’键加载保存的姿态，使所有机器人同时移动到该姿态（调用 motion_timing.move_and_wait，超时时间按预计运动时间自动给出）。
    - 按‘h’键使所有机器人回 Home Pose。
    - 按'q'来退出
+3. 每次移动打印预计/实际耗时、稳定时间与最大超调；超时未到达的机器人会单独报告。
 
 """
 import time
@@ -21,27 +23,25 @@ import ast
 import math
 import argparse
 
+from motion_timing import MotionTimeEstimator, move_and_wait, format_result
+from robot_daemon import connect
+
 PI = 3.141592653
 HOME_POSE = [-5.6850536735238373e-05, -39.999988598597405, -7.796941005345694e-05,
              89.99967467229428, -1.394160247868911e-05, 39.99993054198945, -1.9290991341998603e-06]
 filename = "save_pose.csv"
+MOVEJ_VEL_SCALE = 15
 
 def move_j_deg(robot, pose_deg):
     robot.SwitchMode(flexivrdk.Mode.NRT_PRIMITIVE_EXECUTION)
-    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg,[0]*6),"jntVelScale": 15})
-
-def is_reached_joint_pose(robot, pose_deg, joint_allowing_error_deg):
-    target = [math.radians(x) for x in pose_deg]
-    tol = math.radians(joint_allowing_error_deg)
-    current = robot.states().q
-    return all(abs(curr - tgt) <= tol for curr, tgt in zip(current, target))
+    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg,[0]*6),"jntVelScale": MOVEJ_VEL_SCALE})
 
-def wait_for_reached_or_timeout(robot, pose_deg, joint_allowing_error_deg, time_out):
-    start_time = time.time()
-    while True:
-        if is_reached_joint_pose(robot, pose_deg, joint_allowing_error_deg) or time.time() - start_time >= time_out:
-            break
-        time.sleep(0.2)
+def go_to_pose(robots, estimators, pose_deg, label):
+    """所有机器人同时 MoveJ 到 pose_deg 并等待到达，打印每台的耗时与超时情况。"""
+    results = move_and_wait(robots, estimators, pose_deg, MOVEJ_VEL_SCALE, move_j_deg, 2, label)
+    for est, res in zip(estimators, results):
+        print(f"  {format_result(est.key, res)}")
+    return all(res.reached for res in results)
 
 def quaternion_to_euler(qw, qx, qy, qz):
     t0 = +2.0 * (qw * qx + qy * qz)
@@ -57,10 +57,16 @@ def quaternion_to_euler(qw, qx, qy, qz):
     yaw = math.atan2(t3, t4)
     return [math.degrees(roll), math.degrees(pitch), math.degrees(yaw)]
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="save_go_pose")
-    parser.add_argument("robots", nargs="+", help="one or more Robot series number")
-    return parser.parse_args()
+    parser.add_argument("-1", "--leader", help="主机械臂序列号 (保存姿态时读取该机器人)")
+    parser.add_argument("-2", "--follower", help="从机械臂序列号")
+    parser.add_argument("robots", nargs="*", help="其他机器人序列号 (兼容旧用法)")
+    args = parser.parse_args(argv)
+    args.robots = [sn for sn in (args.leader, args.follower) if sn] + args.robots
+    if not args.robots:
+        parser.error("需要 -1/-2 或位置参数指定至少一个机器人序列号")
+    return args
 
 if not os.path.exists(filename):
     with open(filename, mode="w", newline="") as file:
@@ -68,10 +74,11 @@ if not os.path.exists(filename):
         csv_writer.writerow(["joint_positions_deg", "joint_positions_rad", "tcp_pose_quat", "tcp_pose_euler"])
     print("Created new file:", filename)
 
-def main():
-    args = parse_args()
+def main(argv=None):
+    args = parse_args(argv)
     robot_sn_list = args.robots
-    robots = [flexivrdk.Robot(sn) for sn in robot_sn_list]
+    robots = [connect(sn, flexivrdk) for sn in robot_sn_list]
+    estimators = [MotionTimeEstimator(sn) for sn in robot_sn_list]
     
     print("\n How are you! Use the following command to control robots sets")
     print("  s: Save the first robot's pose")
@@ -143,22 +150,20 @@ def main():
             target_pose_deg = poses_deg[index]
             current_modes = [robot.mode() for robot in robots]
             print("moving to pose (deg):", target_pose_deg)
-            for robot in robots:
-                move_j_deg(robot, target_pose_deg)
-            for robot in robots:
-                wait_for_reached_or_timeout(robot, target_pose_deg, 2, 5)
-            print("all robots have moved to the target pose.")
+            if go_to_pose(robots, estimators, target_pose_deg, "go"):
+                print("all robots have moved to the target pose.")
+            else:
+                print("some robots did not reach the target pose.")
             for robot, mode_val in zip(robots, current_modes):
                 robot.SwitchMode(mode_val)
             print("All robots are switched back to initial mode")
             
         elif key == 'h':
             current_modes = [robot.mode() for robot in robots]
-            for robot in robots:
-                move_j_deg(robot, HOME_POSE)
-            for robot in robots:
-                wait_for_reached_or_timeout(robot, HOME_POSE, 2, 5)
-            print("all robots have moved to the HOME pose.")
+            if go_to_pose(robots, estimators, HOME_POSE, "home"):
+                print("all robots have moved to the HOME pose.")
+            else:
+                print("some robots did not reach the HOME pose.")
             for robot, mode_val in zip(robots, current_modes):
                 robot.SwitchMode(mode_val)
             print("All robots are switched back to initial mode")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sdk_benchmark.py
+
+功能：
+1. 测量 flexivrdk 常用调用的延迟分布与持续调用速率，为采样频率的选择提供基线，并用于发现 SDK 版本间的性能回退。
+   - 读状态类：Robot.states()、digital_inputs()、mode()
+   - 运动类 (需 --motion)：SwitchMode、ExecutePrimitive("MoveJ") (目标为当前关节角, 不产生实际运动)、Stop
+2. 场景覆盖：单机器人 / 两台机器人，单线程 / 多线程 (每台机器人一个线程，或多个线程共享同一台机器人)。
+3. 通过 -1/-2 连接真机，或使用 --sim 在模拟后端 (sim_robot) 上运行。
+4. --daemon：经 robot_daemon 守护进程 (RemoteRobot) 调用，测量本机 IPC 附加的延迟；守护进程需已连接对应机器人
+   (真机或 --sim 均可，后端由守护进程决定)。
+5. 结果写入 JSON (每个场景的 n、mean、p50/p90/p99/max (us)、持续速率 Hz)，并在控制台打印摘要。
+
+用法示例：
+    python sdk_benchmark.py -1 Rizon4s-123456 -2 Rizon4s-123457 -n 2000 --motion
+    python sdk_benchmark.py --sim -n 5000
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+now = time.perf_counter_ns
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="flexivrdk call-latency microbenchmark")
+    parser.add_argument("-1", "--leader", help="主机械臂序列号 (真机)")
+    parser.add_argument("-2", "--follower", help="从机械臂序列号 (真机, 可选; 用于双机器人场景)")
+    parser.add_argument("--sim", action="store_true", help="使用模拟后端 sim_robot")
+    parser.add_argument("--sim-latency-us", type=float, default=0.0, help="模拟后端每次调用附加延迟 (us)")
+    parser.add_argument("--daemon", action="store_true", help="经 robot_daemon 守护进程调用 (测量 IPC 开销)")
+    parser.add_argument("-n", "--num", type=int, default=2000, help="读状态类调用每个场景的调用次数 (默认2000)")
+    parser.add_argument("--threads", type=int, default=4, help="共享单台机器人的线程数 (默认4)")
+    parser.add_argument("--motion", action="store_true", help="同时测量 SwitchMode/MoveJ/Stop (机器人需处于安全状态)")
+    parser.add_argument("--motion-num", type=int, default=20, help="运动类调用每项重复次数 (默认20)")
+    parser.add_argument("-o", "--output", help="输出 JSON 文件名 (默认 sdk_benchmark_<时间>.json)")
+    args = parser.parse_args(argv)
+    if not args.sim and not args.leader:
+        parser.error("需要 -1 指定机器人序列号，或使用 --sim")
+    return args
+
+
+def summarize(name, robots, threads, lat_ns, wall_ns):
+    """lat_ns: 单次调用延迟 (ns) 数组；wall_ns: 所有线程完成全部调用的总墙钟时间。"""
+    lat_us = np.asarray(lat_ns, dtype=np.float64) / 1e3
+    p50, p90, p99 = np.percentile(lat_us, [50, 90, 99])
+    return {
+        "call": name, "robots": robots, "threads": threads, "n": int(lat_us.size),
+        "mean_us": float(lat_us.mean()), "std_us": float(lat_us.std()),
+        "min_us": float(lat_us.min()), "p50_us": float(p50), "p90_us": float(p90),
+        "p99_us": float(p99), "max_us": float(lat_us.max()),
+        "rate_hz": float(lat_us.size / (wall_ns / 1e9)) if wall_ns > 0 else math.inf,
+    }
+
+
+def time_calls(fn, n, out=None):
+    """连续调用 fn n 次，返回每次延迟 (ns)。"""
+    lat = np.empty(n, dtype=np.int64) if out is None else out
+    for i in range(n):
+        t0 = now()
+        fn()
+        lat[i] = now() - t0
+    return lat
+
+
+def run_threads(fns, n):
+    """fns 中每个函数一个线程并发调用 n 次，返回 (合并延迟, 墙钟时间)。"""
+    lats = [np.empty(n, dtype=np.int64) for _ in fns]
+    barrier = threading.Barrier(len(fns) + 1)
+
+    def worker(fn, lat):
+        barrier.wait()
+        time_calls(fn, n, lat)
+
+    threads = [threading.Thread(target=worker, args=(fn, lat)) for fn, lat in zip(fns, lats)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t0 = now()
+    for t in threads:
+        t.join()
+    return np.concatenate(lats), now() - t0
+
+
+def bench_reads(robots, n, n_threads):
+    results = []
+    reads = ("states", "digital_inputs", "mode")
+    # 单机器人, 单线程
+    for name in reads:
+        fn = getattr(robots[0], name)
+        fn()  # 预热
+        t0 = now()
+        lat = time_calls(fn, n)
+        results.append(summarize(f"{name}()", 1, 1, lat, now() - t0))
+    # 单机器人, 多线程共享
+    for name in reads:
+        lat, wall = run_threads([getattr(robots[0], name)] * n_threads, n)
+        results.append(summarize(f"{name}()", 1, n_threads, lat, wall))
+    if len(robots) > 1:
+        a, b = robots[0].states, robots[1].states
+        # 两台机器人, 单线程依次读取 (与测量脚本的读法一致)
+        t0 = now()
+        lat = time_calls(lambda: (a(), b()), n)
+        results.append(summarize("states() x2 sequential", 2, 1, lat, now() - t0))
+        # 两台机器人, 每台一个线程
+        lat, wall = run_threads([a, b], n)
+        results.append(summarize("states()", 2, 2, lat, wall))
+    return results
+
+
+def bench_motion(rdk, robots, n):
+    results = []
+    for r_idx, robot in enumerate(robots):
+        label = f"robot{r_idx}"
+        prev_mode = robot.mode()
+        lat_switch = []
+        lat_exec = []
+        lat_stop = []
+        for _ in range(n):
+            t0 = now()
+            robot.SwitchMode(rdk.Mode.NRT_PRIMITIVE_EXECUTION)
+            lat_switch.append(now() - t0)
+            q_deg = [math.degrees(x) for x in robot.states().q]
+            t0 = now()
+            robot.ExecutePrimitive("MoveJ", {"target": rdk.JPos(q_deg, [0] * 6), "jntVelScale": 5})
+            lat_exec.append(now() - t0)
+            t0 = now()
+            robot.Stop()
+            lat_stop.append(now() - t0)
+        robot.SwitchMode(prev_mode)
+        for name, lat in (("SwitchMode", lat_switch), ('ExecutePrimitive("MoveJ")', lat_exec), ("Stop", lat_stop)):
+            res = summarize(name, 1, 1, lat, int(np.sum(lat)))
+            res["robot"] = label
+            results.append(res)
+    return results
+
+
+def print_results(results):
+    print(f"\n{'call':<28}{'robots':>7}{'thr':>5}{'n':>7}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}{'rate(Hz)':>11}")
+    for r in results:
+        print(f"{r['call']:<28}{r['robots']:>7}{r['threads']:>5}{r['n']:>7}{r['mean_us']:>10.1f}"
+              f"{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['max_us']:>10.1f}{r['rate_hz']:>11.0f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.daemon:
+        import robot_daemon
+        if args.sim:
+            import sim_robot as rdk
+            serials = [args.leader or "Sim-Leader", args.follower or "Sim-Follower"]
+        else:
+            import flexivrdk as rdk
+            serials = [sn for sn in (args.leader, args.follower) if sn]
+        t0 = now()
+        robots = [robot_daemon.RemoteRobot(sn, rdk) for sn in serials]
+        print(f"附着耗时 {(now() - t0) / 1e6:.1f} ms")
+    elif args.sim:
+        import sim_robot as rdk
+        serials = [args.leader or "Sim-Leader", args.follower or "Sim-Follower"]
+        robots = [rdk.Robot(sn, call_latency=args.sim_latency_us / 1e6) for sn in serials]
+    else:
+        import flexivrdk as rdk
+        serials = [sn for sn in (args.leader, args.follower) if sn]
+        print("连接到 Robot...")
+        t0 = now()
+        robots = [rdk.Robot(sn) for sn in serials]
+        print(f"连接耗时 {(now() - t0) / 1e9:.2f} s")
+
+    results = bench_reads(robots, args.num, args.threads)
+    if args.motion:
+        results += bench_motion(rdk, robots, args.motion_num)
+    print_results(results)
+
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out = args.output or f"sdk_benchmark_{now_str}.json"
+    meta = {
+        "timestamp": now_str, "backend": ("daemon:" if args.daemon else "") + ("sim" if args.sim else "flexivrdk"),
+        "sdk_version": getattr(rdk, "__version__", None), "serials": serials,
+        "python": sys.version.split()[0], "platform": platform.platform(), "n": args.num,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\n结果已保存到 {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+session_state.py
+
+功能：
+1. 为多方向/多轴 x 多次测试的会话记录检查点：每完成一个测试单元 (方向 "X+"、轴与次数 "X/3" 等)，
+   立即把该单元的结果 (可 JSON 序列化的值) 与原始采样 (NumPy 数组，保存为 .npy) 写入状态文件。
+2. 状态文件 <script>_session_<时间>.json 与数据目录 <script>_session_<时间>_data/ 位于当前目录；
+   JSON 先写临时文件、fsync 后 os.replace 原子替换，进程在任意时刻中断都不会留下损坏的状态文件；
+   .npy 在 JSON 之前写入，JSON 中出现的单元其数据一定完整。
+3. --resume：不带参数时恢复当前目录中该脚本最近一次未完成的会话，也可指定状态文件路径；
+   会话元数据 (机器人序列号、测试次数等) 与本次参数不一致时拒绝恢复。
+   恢复后已完成的单元不再占用机器人时间，其结果与原始数据从状态文件读出并重新写入本次的 CSV，
+   最终 CSV 与一次跑完的会话一致。
+4. 会话全部完成后 finish() 标记 complete，之后不会再被 --resume 选中。
+"""
+
+import glob
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+VERSION = 1
+
+
+def add_resume_argument(parser):
+    parser.add_argument("--resume", nargs="?", const="latest", default=None, metavar="STATE",
+                        help="从检查点恢复：不带参数时恢复最近一次未完成的会话，或指定状态文件 (*_session_*.json)")
+
+
+def _atomic_write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _safe_name(unit):
+    """'X+' -> 'Xp'，'Y-/2' -> 'Ym_2'。"""
+    return re.sub(r"[^0-9A-Za-z_.]", "_", unit.replace("+", "p").replace("-", "m"))
+
+
+class SessionState:
+    def __init__(self, path, script, meta, units=None, complete=False, created=None):
+        self.path = path
+        self.script = script
+        self.meta = meta
+        self.units = units if units is not None else {}
+        self.complete = complete
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+        self.data_dir = os.path.splitext(path)[0] + "_data"
+
+    # ---------- 创建 / 恢复 ----------
+
+    @classmethod
+    def open(cls, script, resume, meta, stamp=None):
+        """resume 为 None 时新建会话；"latest" 时恢复最近一次未完成的会话；否则为状态文件路径。"""
+        if resume is None:
+            stamp = stamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+            state = cls(f"{script}_session_{stamp}.json", script, meta)
+            state._save()
+            return state
+        path = cls.find_latest(script) if resume == "latest" else resume
+        if path is None:
+            raise SystemExit(f"[Resume] 当前目录没有 {script} 未完成的会话。")
+        state = cls.load(path)
+        if state.script != script:
+            raise SystemExit(f"[Resume] {path} 属于 {state.script}，不是 {script}。")
+        diff = {k: (state.meta.get(k), v) for k, v in meta.items() if state.meta.get(k) != v}
+        if diff:
+            raise SystemExit(f"[Resume] 会话参数不一致，拒绝恢复 (已保存, 本次): {diff}")
+        if state.complete:
+            raise SystemExit(f"[Resume] {path} 已完成，无需恢复。")
+        print(f"[Resume] 恢复会话 {path}，已完成 {len(state.units)} 个单元: {', '.join(state.units)}")
+        return state
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        return cls(path, d["script"], d["meta"], d["units"], d.get("complete", False), d.get("created"))
+
+    @staticmethod
+    def find_latest(script, directory="."):
+        """最近一次未完成会话的状态文件路径 (按文件名中的时间排序)，没有时返回 None。"""
+        for path in sorted(glob.glob(os.path.join(directory, f"{script}_session_*.json")), reverse=True):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    if not json.load(f).get("complete", False):
+                        return path
+            except (OSError, ValueError):
+                continue
+        return None
+
+    # ---------- 单元 ----------
+
+    def done(self, unit):
+        return unit in self.units
+
+    def result(self, unit):
+        return self.units[unit]["result"]
+
+    def arrays(self, unit):
+        """返回 {名称: 数组}。"""
+        return {name: np.load(os.path.join(self.data_dir, fn))
+                for name, fn in self.units[unit].get("arrays", {}).items()}
+
+    def complete_unit(self, unit, result=None, arrays=None):
+        """记录一个已完成单元：先写 .npy，再原子更新 JSON。"""
+        files = {}
+        if arrays:
+            os.makedirs(self.data_dir, exist_ok=True)
+            for name, arr in arrays.items():
+                fn = f"{_safe_name(unit)}_{name}.npy"
+                np.save(os.path.join(self.data_dir, fn), np.asarray(arr))
+                files[name] = fn
+        self.units[unit] = {"result": result, "arrays": files,
+                            "time": datetime.now().isoformat(timespec="seconds")}
+        self._save()
+
+    def finish(self):
+        self.complete = True
+        self._save()
+
+    def _save(self):
+        _atomic_write_json(self.path, {"version": VERSION, "script": self.script, "meta": self.meta,
+                                       "created": self.created, "complete": self.complete,
+                                       "units": self.units})
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+signal_filter.py
+
+功能：
+1. 流式滤波 (逐采样调用, 每个通道独立保存状态, 通道维度上用 NumPy 向量化)：
+   - Biquad：二阶 IIR (转置直接 II 型)；butter_lowpass() 给出二阶 Butterworth 低通系数 (双线性变换 + 预畸变)，
+     首个采样时按稳态初始化，避免启动瞬态；
+   - MedianFilter：滑动中值；
+   - SpikeRejector：Hampel 尖峰剔除，偏离滑动中值超过 k 倍 MAD 的采样以中值代替；
+   - FilterChain：按顺序串联多个流式滤波器，如 SpikeRejector -> Biquad。
+2. 离线处理 (整段数组, 按列)：
+   - filtfilt：前向 + 反向两次 Biquad，零相位 (无时延)，两端奇对称延拓以减小边界效应；
+   - hampel：向量化 Hampel 尖峰剔除。
+3. 可接入任意采集路径：process(x) 接受标量或长度为通道数的序列，返回同形状的滤波结果。
+"""
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MAD_SCALE = 1.4826  # 正态分布下 MAD -> 标准差
+
+
+def butter_lowpass(cutoff_hz, fs_hz):
+    """二阶 Butterworth 低通，返回 (b, a)，a[0] = 1。"""
+    if not 0 < cutoff_hz < fs_hz / 2:
+        raise ValueError(f"cutoff {cutoff_hz} Hz must be in (0, fs/2={fs_hz/2} Hz)")
+    k = math.tan(math.pi * cutoff_hz / fs_hz)
+    q = 1 / math.sqrt(2)
+    norm = 1 / (1 + k / q + k * k)
+    b0 = k * k * norm
+    b = (b0, 2 * b0, b0)
+    a = (1.0, 2 * (k * k - 1) * norm, (1 - k / q + k * k) * norm)
+    return b, a
+
+
+class Biquad:
+    def __init__(self, b, a, channels=1):
+        self.b = tuple(float(x) / a[0] for x in b)
+        self.a = tuple(float(x) / a[0] for x in a)
+        self.channels = channels
+        self.z1 = np.zeros(channels)
+        self.z2 = np.zeros(channels)
+        self._init = False
+
+    @classmethod
+    def lowpass(cls, cutoff_hz, fs_hz, channels=1):
+        return cls(*butter_lowpass(cutoff_hz, fs_hz), channels=channels)
+
+    def reset(self, x0=None):
+        """x0 为 None 时下一个采样到来时按稳态初始化；否则按输入恒为 x0 的稳态初始化。"""
+        if x0 is None:
+            self._init = False
+            return
+        b0, b1, b2 = self.b
+        _, a1, a2 = self.a
+        x0 = np.broadcast_to(np.asarray(x0, dtype=np.float64), (self.channels,))
+        y0 = x0 * (b0 + b1 + b2) / (1 + a1 + a2)
+        self.z2 = b2 * x0 - a2 * y0
+        self.z1 = b1 * x0 - a1 * y0 + self.z2
+        self._init = True
+
+    def process(self, x):
+        xa = np.asarray(x, dtype=np.float64).reshape(self.channels)
+        if not self._init:
+            self.reset(xa)
+        b0, b1, b2 = self.b
+        _, a1, a2 = self.a
+        y = b0 * xa + self.z1
+        self.z1 = b1 * xa - a1 * y + self.z2
+        self.z2 = b2 * xa - a2 * y
+        return _shape_like(y, x)
+
+
+class MedianFilter:
+    def __init__(self, window=5, channels=1):
+        self.window = window
+        self.channels = channels
+        self.buf = np.zeros((window, channels))
+        self._i = 0
+        self._init = False
+
+    def reset(self):
+        self._init = False
+
+    def _push(self, xa):
+        if not self._init:
+            self.buf[:] = xa
+            self._init = True
+        self.buf[self._i] = xa
+        self._i = (self._i + 1) % self.window
+
+    def process(self, x):
+        xa = np.asarray(x, dtype=np.float64).reshape(self.channels)
+        self._push(xa)
+        return _shape_like(np.median(self.buf, axis=0), x)
+
+
+class SpikeRejector(MedianFilter):
+    """Hampel：|x - 中值| > k * 1.4826 * MAD 且超过 min_dev 时输出中值，否则原样输出。"""
+
+    def __init__(self, window=5, k=3.0, min_dev=0.0, channels=1):
+        super().__init__(window, channels)
+        self.k = k
+        self.min_dev = min_dev
+
+    def process(self, x):
+        xa = np.asarray(x, dtype=np.float64).reshape(self.channels)
+        self._push(xa)
+        med = np.median(self.buf, axis=0)
+        mad = np.median(np.abs(self.buf - med), axis=0)
+        dev = np.abs(xa - med)
+        spike = (dev > self.k * MAD_SCALE * mad) & (dev > self.min_dev)
+        return _shape_like(np.where(spike, med, xa), x)
+
+
+class FilterChain:
+    def __init__(self, *stages):
+        self.stages = stages
+
+    def reset(self):
+        for s in self.stages:
+            s.reset()
+
+    def process(self, x):
+        for s in self.stages:
+            x = s.process(x)
+        return x
+
+
+def _shape_like(y, x):
+    return float(y[0]) if np.ndim(x) == 0 else y
+
+
+# ---------- 离线 ----------
+
+def _lfilter(b, a, x):
+    """按列 (axis 0 为时间) 的 Biquad，稳态初始化。"""
+    f = Biquad(b, a, channels=x.shape[1])
+    f.reset(x[0])
+    y = np.empty_like(x)
+    for i in range(x.shape[0]):
+        y[i] = f.process(x[i])
+    return y
+
+
+def filtfilt(x, cutoff_hz, fs_hz):
+    """零相位 Butterworth 低通。x: 长度 N 一维数组或 N x k 数组 (按列滤波)。"""
+    x = np.asarray(x, dtype=np.float64)
+    one_d = x.ndim == 1
+    if one_d:
+        x = x[:, None]
+    b, a = butter_lowpass(cutoff_hz, fs_hz)
+    pad = min(3 * int(math.ceil(fs_hz / cutoff_hz)), x.shape[0] - 1)
+    if pad > 0:
+        # 奇对称延拓：2*x[0] - x[pad:0:-1]，末端同理
+        x = np.concatenate([2 * x[0] - x[pad:0:-1], x, 2 * x[-1] - x[-2:-pad - 2:-1]])
+    y = _lfilter(b, a, x)
+    y = _lfilter(b, a, y[::-1])[::-1]
+    if pad > 0:
+        y = y[pad:-pad]
+    return y[:, 0] if one_d else y
+
+
+def hampel(x, window=7, k=3.0):
+    """向量化 Hampel 尖峰剔除 (居中窗口, 两端按边界值延拓)。"""
+    x = np.asarray(x, dtype=np.float64)
+    half = window // 2
+    pad_width = [(half, half)] + [(0, 0)] * (x.ndim - 1)
+    win = sliding_window_view(np.pad(x, pad_width, mode="edge"), window, axis=0)
+    med = np.median(win, axis=-1)
+    mad = np.median(np.abs(win - med[..., None]), axis=-1)
+    return np.where(np.abs(x - med) > k * MAD_SCALE * mad, med, x)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sim_robot.py
+
+功能：
+1. 纯 Python 的 flexivrdk 模拟后端，提供与脚本所用子集一致的接口：Mode、JPos、Coord、Robot
+   (states / digital_inputs / mode / SwitchMode / ExecutePrimitive / Stop / fault / operational / connected)。
+   用法：import sim_robot as flexivrdk，即可在无机器人时运行基准测试与调试流程。
+2. MoveJ 按关节最大速度 x jntVelScale 在关节空间线性插值，到达时间与真机量级一致；
+   末端 TCP 可通过 set_tcp_velocity() 施加笛卡尔速度 (模拟外部激励)，
+   外力由可替换的 wrench_model(tcp_vel) 给出 (默认阻尼 + 库仑摩擦 + 噪声)。
+3. call_latency 参数 (秒) 可为每次 SDK 调用附加固定延迟，用于模拟网络/SDK 开销。
+"""
+
+import enum
+import math
+import random
+import threading
+import time
+import types
+
+from pose_planner import JOINT_VEL_LIMITS_DEG
+
+HOME_POSE = [0.0, -40.0, 0.0, 90.0, 0.0, 40.0, 0.0]
+HOME_TCP_POSE = [0.6848, -0.1101, 0.0917, 0.0, 0.0, 1.0, 0.0]
+
+
+class Mode(enum.Enum):
+    UNKNOWN = -1
+    IDLE = 0
+    RT_JOINT_TORQUE = 1
+    RT_JOINT_IMPEDANCE = 2
+    NRT_JOINT_IMPEDANCE = 3
+    RT_JOINT_POSITION = 4
+    NRT_JOINT_POSITION = 5
+    NRT_PLAN_EXECUTION = 6
+    NRT_PRIMITIVE_EXECUTION = 7
+    RT_CARTESIAN_MOTION_FORCE = 8
+    NRT_CARTESIAN_MOTION_FORCE = 9
+
+
+class JPos:
+    def __init__(self, q, ext_q=None):
+        self.q = list(q)
+        self.ext_q = list(ext_q) if ext_q is not None else [0.0] * 6
+
+
+class Coord:
+    def __init__(self, position, orientation, ref_frame=("WORLD", "WORLD_ORIGIN")):
+        self.position = list(position)
+        self.orientation = list(orientation)
+        self.ref_frame = list(ref_frame)
+
+
+def default_wrench_model(tcp_vel, damping=20.0, coulomb=2.0, noise=0.05):
+    """默认外力模型：F = B*v + Fc*sign(v) + 噪声 (平移三轴)，力矩为噪声。"""
+    f = []
+    for v in tcp_vel[:3]:
+        sgn = 0.0 if abs(v) < 1e-6 else math.copysign(1.0, v)
+        f.append(damping * v + coulomb * sgn + random.gauss(0.0, noise))
+    f.extend(random.gauss(0.0, noise * 0.1) for _ in range(3))
+    return f
+
+
+class Robot:
+    def __init__(self, serial_number="Sim-000000", call_latency=0.0, wrench_model=default_wrench_model):
+        self.serial_number = serial_number
+        self.call_latency = call_latency
+        self.wrench_model = wrench_model
+        self._lock = threading.Lock()
+        self._mode = Mode.IDLE
+        self._fault = False
+        self._di = [0] * 16
+        self._q = [math.radians(x) for x in HOME_POSE]
+        self._move = None  # (t0, q0, q1, duration)
+        self._tcp_pose = list(HOME_TCP_POSE)
+        self._tcp_vel = [0.0] * 6
+        self._tcp_t = time.monotonic()
+
+    # ---------- 模拟专用接口 ----------
+
+    def set_tcp_velocity(self, vel):
+        """设置末端笛卡尔速度 [vx,vy,vz,wx,wy,wz]，位置按时间积分。"""
+        with self._lock:
+            self._integrate_tcp(time.monotonic())
+            self._tcp_vel = list(vel) + [0.0] * (6 - len(vel))
+
+    def set_tcp_pose(self, pose):
+        with self._lock:
+            self._tcp_pose = list(pose)
+            self._tcp_t = time.monotonic()
+
+    def set_digital_input(self, index, value):
+        with self._lock:
+            self._di[index] = int(value)
+
+    def set_fault(self, fault=True):
+        with self._lock:
+            self._fault = fault
+
+    # ---------- flexivrdk.Robot 接口子集 ----------
+
+    def states(self):
+        self._latency()
+        with self._lock:
+            t = time.monotonic()
+            q, dq = self._joint_state(t)
+            self._integrate_tcp(t)
+            tcp_vel = list(self._tcp_vel)
+            wrench = self.wrench_model(tcp_vel)
+            return types.SimpleNamespace(
+                q=q, dq=dq, theta=list(q), dtheta=list(dq),
+                tcp_pose=list(self._tcp_pose), tcp_vel=tcp_vel,
+                ext_wrench_in_world=wrench, ext_wrench_in_tcp=list(wrench),
+            )
+
+    def digital_inputs(self):
+        self._latency()
+        with self._lock:
+            return list(self._di)
+
+    def mode(self):
+        self._latency()
+        return self._mode
+
+    def SwitchMode(self, mode):
+        self._latency()
+        with self._lock:
+            self._freeze_move(time.monotonic())
+            self._mode = mode
+
+    def ExecutePrimitive(self, name, params):
+        self._latency()
+        if self._mode != Mode.NRT_PRIMITIVE_EXECUTION:
+            raise RuntimeError(f"[sim] ExecutePrimitive requires NRT_PRIMITIVE_EXECUTION, current {self._mode}")
+        if name == "MoveJ":
+            target = [math.radians(x) for x in params["target"].q]
+            scale = float(params.get("jntVelScale", 50)) / 100.0
+            with self._lock:
+                t = time.monotonic()
+                q0, _ = self._joint_state(t)
+                duration = max(abs(b - a) / math.radians(v * scale)
+                               for a, b, v in zip(q0, target, JOINT_VEL_LIMITS_DEG))
+                self._move = (t, q0, target, duration)
+        elif name == "Home":
+            self.ExecutePrimitive("MoveJ", {"target": JPos(HOME_POSE)})
+
+    def Stop(self):
+        self._latency()
+        with self._lock:
+            t = time.monotonic()
+            self._freeze_move(t)
+            self._integrate_tcp(t)
+            self._tcp_vel = [0.0] * 6
+            self._mode = Mode.IDLE
+
+    def fault(self):
+        self._latency()
+        return self._fault
+
+    def operational(self, check_enabling_button=False):
+        self._latency()
+        return not self._fault
+
+    def connected(self):
+        return True
+
+    def ClearFault(self, timeout_sec=30):
+        with self._lock:
+            self._fault = False
+        return True
+
+    def Enable(self):
+        pass
+
+    # ---------- 内部 ----------
+
+    def _latency(self):
+        if self.call_latency > 0:
+            time.sleep(self.call_latency)
+
+    def _joint_state(self, t):
+        if self._move is None:
+            return list(self._q), [0.0] * 7
+        t0, q0, q1, duration = self._move
+        if duration <= 0 or t - t0 >= duration:
+            self._q = list(q1)
+            self._move = None
+            return list(q1), [0.0] * 7
+        s = (t - t0) / duration
+        q = [a + (b - a) * s for a, b in zip(q0, q1)]
+        dq = [(b - a) / duration for a, b in zip(q0, q1)]
+        return q, dq
+
+    def _freeze_move(self, t):
+        self._q, _ = self._joint_state(t)
+        self._move = None
+
+    def _integrate_tcp(self, t):
+        dt = t - self._tcp_t
+        self._tcp_t = t
+        for i in range(3):
+            self._tcp_pose[i] += self._tcp_vel[i] * dt
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+stage_pipeline.py
+
+功能：
+1. 以阶段 (Stage) 图描述一次测试流程：每个阶段是一个函数，deps 为其依赖的阶段，函数的参数为各依赖阶段的返回值。
+2. 执行方式：
+   - robot=True 的阶段 (运动、Teleop 启停、采样、用户提示) 在主线程中按添加顺序串行执行，保证机器人操作不并发；
+   - 其余阶段 (分析、写文件、生成报告) 在依赖完成后立即提交到线程池，与后续的机器人阶段重叠执行。
+   例：上一方向的分析/写盘与下一方向的同步姿态、Teleop 启动并行。
+3. 记录每个阶段的开始/结束时间，report() 打印各阶段耗时、串行总耗时与实际墙钟时间 (即重叠节省的时间)，
+   并按阶段名 ":" 之前的部分计入 instrumentation 计时点 stage.<名称>，出现在 *_timing.csv 中。
+4. 任一阶段抛出异常时不再启动新的阶段，等待已提交的阶段结束后重新抛出第一个异常。
+"""
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation as instr
+
+Stage = namedtuple("Stage", ["name", "fn", "deps", "robot"])
+# start/end 为相对于 run() 开始的秒数
+StageTiming = namedtuple("StageTiming", ["name", "robot", "start", "end", "thread"])
+
+
+class Pipeline:
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.stages = {}
+        self.results = {}
+        self.timings = []
+        self.wall = 0.0
+        self._lock = threading.Lock()
+        self._done = {}        # name -> threading.Event (依赖它的阶段提交之后才置位)
+        self._finished = set()
+        self._submitted = set()
+        self._error = None
+        self._t0 = None
+
+    def add(self, name, fn, deps=(), robot=False):
+        """添加阶段，返回阶段名 (便于作为其他阶段的依赖)。依赖必须已添加。"""
+        if name in self.stages:
+            raise ValueError(f"duplicate stage: {name}")
+        for d in deps:
+            if d not in self.stages:
+                raise ValueError(f"stage {name}: unknown dependency {d}")
+        self.stages[name] = Stage(name, fn, tuple(deps), robot)
+        self._done[name] = threading.Event()
+        return name
+
+    # ---------- 执行 ----------
+
+    def run(self):
+        """执行全部阶段，返回 {阶段名: 返回值}。"""
+        self._t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage") as pool:
+            self._pool = pool
+            self._submit_ready()
+            for stage in self.stages.values():
+                if not stage.robot:
+                    continue
+                for d in stage.deps:
+                    self._wait(d)
+                if self._error is not None:
+                    break
+                self._execute(stage)
+                if self._error is not None:
+                    break
+            # 等待已提交的非机器人阶段 (它们完成时可能继续提交后续阶段)
+            while True:
+                with self._lock:
+                    pending = [n for n in self._submitted if not self._done[n].is_set()]
+                if not pending:
+                    break
+                self._done[pending[0]].wait()
+        self.wall = time.perf_counter() - self._t0
+        if self._error is not None:
+            raise self._error
+        return self.results
+
+    def _wait(self, name):
+        while not self._done[name].wait(0.1):
+            if self._error is not None:
+                return
+
+    def _execute(self, stage):
+        start = time.perf_counter()
+        try:
+            value = stage.fn(*[self.results[d] for d in stage.deps])
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            value = None
+        end = time.perf_counter()
+        with self._lock:
+            self.results[stage.name] = value
+            self.timings.append(StageTiming(stage.name, stage.robot, start - self._t0, end - self._t0,
+                                            threading.current_thread().name))
+            self._finished.add(stage.name)
+        instr.site("stage." + stage.name.split(":")[0]).record(int((end - start) * 1e9))
+        self._submit_ready()
+        self._done[stage.name].set()
+
+    def _submit_ready(self):
+        with self._lock:
+            if self._error is not None:
+                return
+            ready = [s for s in self.stages.values()
+                     if not s.robot and s.name not in self._submitted
+                     and all(d in self._finished for d in s.deps)]
+            self._submitted.update(s.name for s in ready)
+        for s in ready:
+            self._pool.submit(self._execute, s)
+
+    # ---------- 报告 ----------
+
+    def report(self):
+        """打印各阶段耗时；返回 CSV 行列表。"""
+        busy = sum(t.end - t.start for t in self.timings)
+        rows = [["Stage", "Kind", "Start_s", "End_s", "Duration_s", "Thread"]]
+        print("\n========== 阶段耗时 ==========")
+        for t in sorted(self.timings, key=lambda t: t.start):
+            kind = "robot" if t.robot else "cpu"
+            rows.append([t.name, kind, f"{t.start:.3f}", f"{t.end:.3f}", f"{t.end - t.start:.3f}", t.thread])
+            print(f"  {t.name:<24}{kind:<7}{t.start:>9.2f}s -> {t.end:>8.2f}s  ({t.end - t.start:.3f}s)")
+        print(f"  串行总耗时 {busy:.2f}s，实际墙钟 {self.wall:.2f}s，重叠节省 {busy - self.wall:.2f}s")
+        rows.append(["Serial total (s)", f"{busy:.3f}"])
+        rows.append(["Wall clock (s)", f"{self.wall:.3f}"])
+        rows.append(["Overlap saved (s)", f"{busy - self.wall:.3f}"])
+        return rows
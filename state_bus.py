@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+state_bus.py
+
+功能：
+1. 采集端把主/从 (及其他) 机器人的状态快照发布到 multiprocessing.shared_memory 环形缓冲区，
+   本机任意多个读者 (实时查看、记录、分析) 以全速率读取同一份采样，不再增加 SDK 客户端、不与测量循环争用带宽。
+   - tap(robot, label)：与 instrumentation.instrument_robot 相同的代理方式，测量循环每次调用 states() 即发布一条记录，
+     不额外读取机器人；未开启总线时原样返回 robot，无任何开销；
+   - 记录列见 STATE_COLUMNS：单调时钟时刻 (time.monotonic，各进程可比)、机器人编号、TCP 位姿/速度、world 外力、关节角。
+2. 共享内存布局：头部 (容量、列数、已发布序号 head、写者 pid、关闭标志) + 列名 + 每槽序号 seq[容量] + 数据[容量 x 列数]。
+   单写者序号协议：写槽前 seq 置 -1，写完数据后 seq 置为该记录的全局序号，最后推进 head；
+   读者按 head 取出新记录的槽，复制前后各读一次 seq，两次都等于期望序号的记录才有效 (写者覆盖中的槽被丢弃并计数)。
+   数据直接映射在读者进程中，按槽下标一次向量化拷出，无序列化；读者落后超过容量时跳到最旧的可用记录并计入 dropped。
+3. 命令行：
+   python state_bus.py watch [--bus 名称]             实时显示各机器人速率、位置与外力；
+   python state_bus.py record [-o 文件] [--duration s] 把总线上的记录写入 CSV。
+   测量脚本以 --bus [名称] 开启发布 (默认名称 DEFAULT_BUS)。
+"""
+
+import argparse
+import atexit
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_BUS = "flexiv_state_bus"
+DEFAULT_CAPACITY = 1 << 16   # 约 5 分钟 @ 2 台 x 100Hz
+
+MAGIC = 0x46534231  # "FSB1"
+VERSION = 1
+NAME_BYTES = 32
+_H_MAGIC, _H_VERSION, _H_CAPACITY, _H_NCOLS, _H_HEAD, _H_PID, _H_CLOSED = range(7)
+_HEADER_WORDS = 8
+
+STATE_COLUMNS = (("t", "robot", "px", "py", "pz", "qw", "qx", "qy", "qz",
+                  "vx", "vy", "vz", "wx", "wy", "wz", "Fx", "Fy", "Fz", "Mx", "My", "Mz") +
+                 tuple(f"q{i}" for i in range(1, 8)))
+ROBOT_IDS = {"leader": 0, "follower": 1, "actuator": 2}
+
+_bus = None
+_owned = set()  # 本进程作为写者创建的段
+
+
+def _layout(capacity, ncols):
+    names_off = _HEADER_WORDS * 8
+    seq_off = names_off + ((ncols * NAME_BYTES + 7) // 8) * 8
+    data_off = seq_off + capacity * 8
+    return names_off, seq_off, data_off, data_off + capacity * ncols * 8
+
+
+def _attach(name):
+    """打开已有的共享内存；读者不登记到 resource_tracker，退出时不会删除写者的段。"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _owned:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Mapping:
+    def __init__(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if self.header[_H_MAGIC] != MAGIC or self.header[_H_VERSION] != VERSION:
+            raise ValueError(f"{shm.name} is not a state bus (version {VERSION})")
+        self.capacity = int(self.header[_H_CAPACITY])
+        ncols = int(self.header[_H_NCOLS])
+        names_off, seq_off, data_off, _ = _layout(self.capacity, ncols)
+        raw = bytes(shm.buf[names_off:names_off + ncols * NAME_BYTES])
+        self.columns = tuple(raw[i * NAME_BYTES:(i + 1) * NAME_BYTES].rstrip(b"\0").decode()
+                             for i in range(ncols))
+        self.seq = np.ndarray((self.capacity,), dtype=np.int64, buffer=shm.buf, offset=seq_off)
+        self.data = np.ndarray((self.capacity, ncols), dtype=np.float64, buffer=shm.buf, offset=data_off)
+
+    def release(self):
+        # ndarray 持有 shm.buf 的导出，须先释放才能 close
+        self.header = self.seq = self.data = None
+        self.shm.close()
+
+
+class StateBus:
+    """写者 (单线程发布；publish 加锁，测量循环与其他线程均可调用)。"""
+
+    def __init__(self, name=DEFAULT_BUS, columns=STATE_COLUMNS, capacity=DEFAULT_CAPACITY):
+        ncols = len(columns)
+        size = _layout(capacity, ncols)[3]
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            shm = self._reclaim(name, size)
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_CAPACITY] = capacity
+        header[_H_NCOLS] = ncols
+        header[_H_PID] = os.getpid()
+        names_off = _layout(capacity, ncols)[0]
+        for i, c in enumerate(columns):
+            b = c.encode()[:NAME_BYTES]
+            shm.buf[names_off + i * NAME_BYTES:names_off + i * NAME_BYTES + len(b)] = b
+        header[_H_VERSION] = VERSION
+        header[_H_MAGIC] = MAGIC
+        del header
+        self.name = name
+        _owned.add(name)
+        self._map = _Mapping(shm)
+        self._map.seq[:] = -1
+        self._head = 0
+        self._lock = threading.Lock()
+        self._row = np.zeros(ncols)
+        self._closed = False
+
+    @staticmethod
+    def _reclaim(name, size):
+        """同名的段已存在：写者仍在运行则报错，否则 (上次异常退出遗留) 删除后重建。"""
+        old = _attach(name)
+        try:
+            pid = int(np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=old.buf)[_H_PID])
+        except (TypeError, ValueError):
+            pid = 0
+        old.close()
+        if pid and pid != os.getpid() and _pid_alive(pid):
+            raise RuntimeError(f"state bus {name} is already published by pid {pid}")
+        old = shared_memory.SharedMemory(name=name)
+        old.unlink()
+        old.close()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    @property
+    def columns(self):
+        return self._map.columns
+
+    def publish(self, row):
+        with self._lock:
+            self._write(row)
+
+    def publish_states(self, t, robot_id, st):
+        with self._lock:
+            row = self._row
+            row[0] = t
+            row[1] = robot_id
+            row[2:9] = st.tcp_pose[:7]
+            row[9:15] = st.tcp_vel[:6]
+            row[15:21] = st.ext_wrench_in_world[:6]
+            q = st.q[:7]
+            row[21:21 + len(q)] = q
+            self._write(row)
+
+    def _write(self, row):
+        if self._closed:
+            return
+        m = self._map
+        n = self._head
+        i = n % m.capacity
+        m.seq[i] = -1
+        m.data[i] = row
+        m.seq[i] = n
+        self._head = n + 1
+        m.header[_H_HEAD] = n + 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._map.header[_H_CLOSED] = 1
+            shm = self._map.shm
+            self._map.release()
+        shm.unlink()
+        _owned.discard(self.name)
+
+
+class StateBusReader:
+    def __init__(self, name=DEFAULT_BUS, from_start=False):
+        """from_start 为 True 时从缓冲区中最旧的记录开始读，否则只读之后发布的记录。"""
+        self.name = name
+        self._map = _Mapping(_attach(name))
+        head = int(self._map.header[_H_HEAD])
+        self.next = max(0, head - self._map.capacity) if from_start else head
+        self.dropped = 0
+
+    @property
+    def columns(self):
+        return self._map.columns
+
+    @property
+    def writer_pid(self):
+        return int(self._map.header[_H_PID])
+
+    @property
+    def closed(self):
+        return bool(self._map.header[_H_CLOSED])
+
+    @property
+    def head(self):
+        return int(self._map.header[_H_HEAD])
+
+    def read(self, max_rows=None):
+        """返回 (首条记录序号, 新记录数组 (n x 列数))；被覆盖或正在写入的记录丢弃并计入 dropped。"""
+        m = self._map
+        head = int(m.header[_H_HEAD])
+        first = self.next
+        if head - first > m.capacity:
+            self.dropped += head - m.capacity - first
+            first = head - m.capacity
+        if max_rows is not None:
+            head = min(head, first + max_rows)
+        if head <= first:
+            return first, np.empty((0, len(m.columns)))
+        expect = np.arange(first, head, dtype=np.int64)
+        idx = expect % m.capacity
+        s1 = m.seq[idx]
+        rows = m.data[idx]
+        s2 = m.seq[idx]
+        ok = (s1 == expect) & (s2 == expect)
+        self.next = head
+        if not ok.all():
+            self.dropped += int((~ok).sum())
+            rows = rows[ok]
+        return first, rows
+
+    def close(self):
+        self._map.release()
+
+
+class _TappedRobot:
+    """robot 代理：每次 states() 的结果发布到总线，其余属性透传。"""
+
+    def __init__(self, robot, bus, robot_id):
+        self._robot = robot
+        self._bus = bus
+        self._id = robot_id
+
+    def states(self):
+        t0 = time.monotonic()
+        st = self._robot.states()
+        self._bus.publish_states(0.5 * (t0 + time.monotonic()), self._id, st)
+        return st
+
+    def __getattr__(self, name):
+        return getattr(self._robot, name)
+
+
+# ---------- 测量脚本接口 ----------
+
+def add_bus_argument(parser):
+    parser.add_argument("--bus", nargs="?", const=DEFAULT_BUS, default=None, metavar="NAME",
+                        help=f"把测量循环读取的主从状态发布到共享内存总线 (默认名称 {DEFAULT_BUS})，"
+                             "供 state_bus.py watch/record 在另一终端读取；不增加 SDK 读取")
+
+
+def open_bus(name=DEFAULT_BUS, capacity=DEFAULT_CAPACITY):
+    global _bus
+    if _bus is None:
+        _bus = StateBus(name, capacity=capacity)
+        atexit.register(close_bus)
+        print(f"[StateBus] 发布到共享内存 {name} (容量 {capacity} 条)")
+    return _bus
+
+
+def open_from_args(args):
+    if getattr(args, "bus", None):
+        return open_bus(args.bus)
+    return None
+
+
+def close_bus():
+    global _bus
+    if _bus is not None:
+        _bus.close()
+        _bus = None
+
+
+def tap(robot, label):
+    return _TappedRobot(robot, _bus, ROBOT_IDS.get(label, len(ROBOT_IDS))) if _bus is not None else robot
+
+
+# ---------- 命令行读者 ----------
+
+def _wait_reader(name, from_start=False):
+    while True:
+        try:
+            reader = StateBusReader(name, from_start)
+        except (FileNotFoundError, ValueError):
+            time.sleep(0.5)
+            continue
+        print(f"[StateBus] 已连接 {name} (写者 pid {reader.writer_pid})", file=sys.stderr)
+        return reader
+
+
+def watch(name, interval=0.5):
+    labels = {v: k for k, v in ROBOT_IDS.items()}
+    c = STATE_COLUMNS.index
+    reader = _wait_reader(name)
+    last = {}
+    counts = {}
+    t_prev = time.monotonic()
+    try:
+        while True:
+            time.sleep(interval)
+            if reader.closed:
+                print("\n[StateBus] 写者已退出，等待新的会话...", file=sys.stderr)
+                reader.close()
+                reader = _wait_reader(name)
+            _, rows = reader.read()
+            for rid in np.unique(rows[:, 1]).astype(int) if len(rows) else []:
+                sel = rows[rows[:, 1] == rid]
+                counts[rid] = counts.get(rid, 0) + len(sel)
+                last[rid] = sel[-1]
+            now = time.monotonic()
+            parts = []
+            for rid in sorted(last):
+                r = last[rid]
+                rate = counts.pop(rid, 0) / (now - t_prev)
+                age_ms = (now - r[c("t")]) * 1000
+                parts.append(f"{labels.get(rid, rid)}: {rate:5.0f}Hz age={age_ms:5.0f}ms "
+                             f"p=({r[c('px')]:+.3f},{r[c('py')]:+.3f},{r[c('pz')]:+.3f}) "
+                             f"F=({r[c('Fx')]:+6.2f},{r[c('Fy')]:+6.2f},{r[c('Fz')]:+6.2f})")
+            t_prev = now
+            print("\r" + " | ".join(parts) + f" | dropped={reader.dropped}", end="", flush=True)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        reader.close()
+
+
+def record(name, path, duration=None, from_start=False, interval=0.1):
+    from result_writer import ResultWriter
+    reader = _wait_reader(name, from_start)
+    writer = ResultWriter(path)
+    writer.writerow(list(reader.columns))
+    t_end = time.monotonic() + duration if duration else math.inf
+    n = 0
+    completed = False
+    try:
+        while time.monotonic() < t_end:
+            _, rows = reader.read()
+            if len(rows):
+                writer.write_samples(rows.tolist(), fmt="{:.6f}")
+                n += len(rows)
+            if reader.closed and reader.next >= reader.head:
+                break
+            time.sleep(interval)
+        completed = True
+    except KeyboardInterrupt:
+        completed = True
+    finally:
+        reader.close()
+        saved = writer.close(complete=completed)
+        print(f"[StateBus] 记录 {n} 条 (丢弃 {reader.dropped}) -> {saved}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-memory robot state bus reader")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_watch = sub.add_parser("watch", help="实时显示")
+    p_watch.add_argument("--bus", default=DEFAULT_BUS, help=f"总线名称 (默认 {DEFAULT_BUS})")
+    p_watch.add_argument("--interval", type=float, default=0.5, help="刷新周期 s (默认0.5)")
+    p_rec = sub.add_parser("record", help="记录到 CSV")
+    p_rec.add_argument("--bus", default=DEFAULT_BUS, help=f"总线名称 (默认 {DEFAULT_BUS})")
+    p_rec.add_argument("-o", "--output", help="输出 CSV (默认 state_bus_<时间>.csv)")
+    p_rec.add_argument("--duration", type=float, help="记录时长 s (默认直到写者退出或 Ctrl+C)")
+    p_rec.add_argument("--from-start", action="store_true", help="从缓冲区中最旧的记录开始")
+    args = parser.parse_args(argv)
+    if args.cmd == "watch":
+        watch(args.bus, args.interval)
+    else:
+        out = args.output or f"state_bus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        record(args.bus, out, args.duration, args.from_start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+teleop_bench.py
+
+功能：
+1. 统一入口：python teleop_bench.py <子命令> [参数...]，子命令之后的参数原样交给对应基准测试的 main(argv)，
+   各测试的参数 (-1/-2/-p/-n 等) 与单独运行脚本时完全一致；python teleop_bench.py <子命令> -h 查看其参数。
+2. 插件注册表：子命令 -> "模块:函数" (默认函数 main)，只在选中时 importlib 导入对应模块，
+   列出子命令与 -h 不导入任何测试模块 (不加载 numpy/flexivrdk)，启动开销只有本文件。
+   - 内置测试见 BUILTIN；
+   - 新增测试无需修改其他文件：在 TELEOP_BENCH_PLUGINS 环境变量中声明 "名称=模块[:函数]" (逗号分隔)，
+     或以 Python 包的 entry point (组 teleop_bench.plugins) 发布；模块需提供 main(argv=None)。
+3. 子命令名拼写错误时给出相近的候选。
+"""
+
+import importlib
+import os
+import sys
+from collections import namedtuple
+
+Plugin = namedtuple("Plugin", ["name", "target", "help"])
+
+ENTRY_POINT_GROUP = "teleop_bench.plugins"
+
+BUILTIN = [
+    Plugin("drag", "drag_measure", "六方向阻尼测量 (分段 B + 摩擦模型拟合)"),
+    Plugin("transparency", "transparency_measure", "力反馈透明度、交叉泄漏与时延"),
+    Plugin("stiffness", "tracking_stiffness_measure", "从手跟踪刚度"),
+    Plugin("hover", "float_offset_measure", "悬停漂移 (float offset) 成功率"),
+    Plugin("mindrag", "min_drag_ft_measure", "六自由度最小拖拽力/转矩"),
+    Plugin("contact-wrench", "maxcontactwrench_error_measure", "最大接触力限制误差"),
+    Plugin("auto-damping", "auto_damping_measure", "无人值守阻尼速度扫描"),
+    Plugin("pose", "save_go_pose", "保存/前往姿态"),
+    Plugin("report", "html_report", "由运行目录生成 HTML 报告"),
+    Plugin("reanalyze", "reanalyze", "对归档记录离线重新分析 (多进程)"),
+    Plugin("sdk-bench", "sdk_benchmark", "flexivrdk 调用延迟基准"),
+    Plugin("daemon", "robot_daemon", "机器人连接守护进程"),
+    Plugin("bus", "state_bus", "共享内存状态总线 watch/record"),
+]
+
+
+def _env_plugins():
+    for item in os.environ.get("TELEOP_BENCH_PLUGINS", "").split(","):
+        name, sep, target = item.strip().partition("=")
+        if sep and name and target:
+            yield Plugin(name.strip(), target.strip(), f"插件 {target.strip()}")
+
+
+def _entry_point_plugins():
+    try:
+        from importlib.metadata import entry_points
+        eps = entry_points(group=ENTRY_POINT_GROUP)
+    except Exception:
+        return []
+    return [Plugin(ep.name, ep.value, f"插件 {ep.value}") for ep in eps]
+
+
+def registry(external=True):
+    """名称 -> Plugin；后注册的同名插件覆盖先前的。entry point 扫描较慢，只在需要时进行。"""
+    plugins = {p.name: p for p in BUILTIN}
+    if external:
+        plugins.update((p.name, p) for p in _entry_point_plugins())
+    plugins.update((p.name, p) for p in _env_plugins())
+    return plugins
+
+
+def find(name):
+    plugins = registry(external=False)
+    if name not in plugins:
+        plugins = registry()
+    return plugins.get(name)
+
+
+def load(plugin):
+    module_name, _, func = plugin.target.partition(":")
+    return getattr(importlib.import_module(module_name), func or "main")
+
+
+def print_usage(plugins, file=sys.stdout):
+    print("用法: python teleop_bench.py <子命令> [参数...]    (python teleop_bench.py <子命令> -h 查看参数)\n", file=file)
+    print("子命令:", file=file)
+    width = max(len(n) for n in plugins)
+    for p in plugins.values():
+        print(f"  {p.name:<{width}}  {p.help}", file=file)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help", "help", "list"):
+        print_usage(registry())
+        return 0
+    name, rest = argv[0], argv[1:]
+    plugin = find(name)
+    if plugin is None:
+        import difflib
+        plugins = registry()
+        close = difflib.get_close_matches(name, plugins, n=3)
+        hint = f"，是否为: {', '.join(close)}" if close else ""
+        print(f"未知子命令 {name}{hint}\n", file=sys.stderr)
+        print_usage(plugins, sys.stderr)
+        return 2
+    entry = load(plugin)
+    # 子命令的 argparse 用法提示显示为 "teleop_bench.py <子命令>"
+    sys.argv[0] = f"{os.path.basename(sys.argv[0])} {name}"
+    try:
+        result = entry(rest)
+    except KeyboardInterrupt:
+        print("\nCtrl+C detected.")
+        return 130
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+teleop_process.py
+
+功能：
+1. TeleopProcess 负责启动与结束 Teleop 可执行程序：
+   - 启动：直接 Popen(["sudo", "-S", ...])，密码经 stdin 管道写入，不经过 shell，也不出现在命令行/进程列表中；
+     Teleop 位于新会话中，不会收到脚本终端的 Ctrl+C。
+   - 结束：记录 Teleop 的精确进程树 (sudo 及其全部子孙进程, 以 pid + 启动时间标识, 避免 pid 复用误杀)，
+     先发 SIGTERM，通过 pidfd (不支持时退化为 /proc 轮询) 等待，进程树全部退出即刻返回；
+     超过 term_timeout 仍存活的进程才升级为 SIGKILL (root 进程通过 sudo kill -9 <pid> 精确结束)。
+     不再使用 pkill -f 按命令行匹配，避免误杀无关进程。
+2. stop() 返回 TeardownReport：退出状态、拆除耗时、是否升级为 SIGKILL、残留进程。
+3. start(..., use_pty=True) 时 Teleop 的 stdin 为伪终端 (从端设为 raw，无回显、按键无需回车)，
+   之后可用 send_keys() 模拟键盘输入 (如 engage / 切换参数的按键)。
+   此模式下 sudo 加 -k 总是读取密码，避免凭据缓存时密码被当作按键送给 Teleop。
+"""
+
+import os
+import pty
+import select
+import signal
+import subprocess
+import time
+import tty
+from collections import namedtuple
+
+TeardownReport = namedtuple("TeardownReport", ["exit_status", "elapsed_s", "escalated", "survivors"])
+
+
+def teleop_args(executable_path, leader_sn, follower_sn):
+    """若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。"""
+    if "high_transparency" in os.path.basename(executable_path):
+        return [executable_path, "-l", leader_sn, "-r", follower_sn]
+    return [executable_path, "-1", leader_sn, "-2", follower_sn]
+
+
+def _proc_stat(pid):
+    """返回 (ppid, state, starttime)；进程不存在时返回 None。"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    # comm 字段可能含空格/括号，从最后一个 ')' 之后解析
+    fields = data[data.rindex(b")") + 2:].split()
+    return int(fields[1]), fields[0].decode(), int(fields[19])
+
+
+def process_tree(root_pid):
+    """返回 {pid: starttime}，包含 root_pid 及其全部子孙进程。"""
+    children = {}
+    starts = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        st = _proc_stat(int(name))
+        if st is None:
+            continue
+        ppid, _, start = st
+        children.setdefault(ppid, []).append(int(name))
+        starts[int(name)] = start
+    if root_pid not in starts:
+        return {}
+    tree = {}
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree[pid] = starts[pid]
+        stack.extend(children.get(pid, ()))
+    return tree
+
+
+def _alive(pid, starttime):
+    st = _proc_stat(pid)
+    return st is not None and st[2] == starttime and st[1] != "Z"
+
+
+class TeleopProcess:
+    def __init__(self, term_timeout=0.5, kill_timeout=1.0):
+        self.term_timeout = term_timeout
+        self.kill_timeout = kill_timeout
+        self.proc = None
+        self.name = None
+        self._password = None
+        self._tree = {}
+        self._pty_master = None
+
+    @property
+    def pid(self):
+        return self.proc.pid if self.proc is not None else None
+
+    def start(self, executable_path, leader_sn, follower_sn, password, use_pty=False):
+        """启动 Teleop，返回 sudo 进程 PID。use_pty=True 时 stdin 为伪终端，可用 send_keys() 发送按键。"""
+        args = teleop_args(executable_path, leader_sn, follower_sn)
+        self.name = os.path.basename(executable_path)
+        self._password = password
+        if use_pty:
+            master, slave = pty.openpty()
+            tty.setraw(slave)
+            try:
+                self.proc = subprocess.Popen(["sudo", "-S", "-k", "-p", ""] + args, stdin=slave,
+                                             start_new_session=True)
+            except Exception:
+                os.close(master)
+                raise
+            finally:
+                os.close(slave)
+            self._pty_master = master
+            os.write(master, (password + "\n").encode())
+        else:
+            self.proc = subprocess.Popen(["sudo", "-S", "-p", ""] + args, stdin=subprocess.PIPE,
+                                         start_new_session=True)
+            try:
+                self.proc.stdin.write((password + "\n").encode())
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        print(f"[StartTeleop] name=({self.name}), args=({' '.join(args)}), pid={self.proc.pid}")
+        return self.proc.pid
+
+    def send_keys(self, keys, interval=0.2):
+        """向伪终端逐个写入按键 (需以 use_pty=True 启动)。"""
+        if self._pty_master is None:
+            raise RuntimeError("Teleop was not started with use_pty=True")
+        for k in keys:
+            os.write(self._pty_master, k.encode())
+            time.sleep(interval)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def refresh_tree(self):
+        """更新记录的进程树 (子进程可能在启动后才出现)。"""
+        if self.proc is not None:
+            self._tree.update(process_tree(self.proc.pid))
+        return dict(self._tree)
+
+    def stop(self):
+        """结束 Teleop 进程树，进程树全部退出即返回 TeardownReport。未启动时返回 None。"""
+        if self.proc is None:
+            return None
+        t0 = time.monotonic()
+        self.refresh_tree()
+        tree = {pid: st for pid, st in self._tree.items() if _alive(pid, st)}
+        escalated = False
+
+        # sudo 会把收到的 SIGTERM 转发给被执行的程序；用户态子孙进程直接发送
+        self._signal(tree, signal.SIGTERM, use_sudo=False)
+        remaining = self._wait(tree, self.term_timeout)
+        if remaining:
+            escalated = True
+            print(f"[stop_teleop] Still alive after {self.term_timeout:.2f}s => SIGKILL {sorted(remaining)}")
+            self._signal(remaining, signal.SIGKILL, use_sudo=True)
+            remaining = self._wait(remaining, self.kill_timeout)
+
+        try:
+            exit_status = self.proc.wait(timeout=0.1)
+        except subprocess.TimeoutExpired:
+            exit_status = None
+        elapsed = time.monotonic() - t0
+        report = TeardownReport(exit_status, elapsed, escalated, sorted(remaining))
+        print(f"[stop_teleop] {self.name} pid={self.proc.pid} exit={exit_status}, "
+              f"teardown={elapsed*1000:.1f} ms, escalated={escalated}, survivors={report.survivors}")
+        self.proc = None
+        self._tree = {}
+        if self._pty_master is not None:
+            os.close(self._pty_master)
+            self._pty_master = None
+        return report
+
+    # ---------- 内部 ----------
+
+    def _signal(self, tree, sig, use_sudo):
+        denied = []
+        for pid in tree:
+            if pid == self.proc.pid and self.proc.poll() is None:
+                self.proc.send_signal(sig)
+                continue
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                denied.append(pid)
+        if denied and use_sudo:
+            # 精确到 pid 的 root 权限 kill
+            try:
+                subprocess.run(["sudo", "-S", "-p", "", "kill", f"-{int(sig)}"] + [str(p) for p in denied],
+                               input=(self._password + "\n").encode(), timeout=self.kill_timeout, check=False)
+            except Exception as e:
+                print(f"[stop_teleop] sudo kill error: {e}")
+
+    def _wait(self, tree, timeout):
+        """等待 tree 中的进程全部退出，返回超时后仍存活的 {pid: starttime}。"""
+        deadline = time.monotonic() + timeout
+        remaining = {pid: st for pid, st in tree.items() if _alive(pid, st)}
+        fds = {}
+        if hasattr(os, "pidfd_open"):
+            for pid in remaining:
+                try:
+                    fds[pid] = os.pidfd_open(pid)
+                except OSError:
+                    pass
+        poller = select.poll()
+        for fd in fds.values():
+            poller.register(fd, select.POLLIN)
+        try:
+            while remaining:
+                self.proc.poll()  # 回收直接子进程 (sudo)
+                remaining = {pid: st for pid, st in remaining.items() if _alive(pid, st)}
+                for pid in [p for p in fds if p not in remaining]:
+                    poller.unregister(fds[pid])
+                    os.close(fds.pop(pid))
+                left = deadline - time.monotonic()
+                if not remaining or left <= 0:
+                    break
+                if len(fds) == len(remaining):
+                    # 全部可用 pidfd 等待：任一进程退出即唤醒
+                    poller.poll(min(left, 0.05) * 1000)
+                else:
+                    time.sleep(min(left, 0.005))
+        finally:
+            for fd in fds.values():
+                os.close(fd)
+        return remaining
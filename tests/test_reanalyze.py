@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""reanalyze 离线结果与在线分析一致性测试 (模拟后端，不需要 flexivrdk)。"""
+
+import csv
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auto_damping_measure
+import reanalyze
+
+DIRECTIONS = ["X+", "Z-"]
+
+
+def _fits(path):
+    """CSV 中 FrictionFit 行 -> {方向: {"N": n, "R2": r2, "B": B, "Fc": Fc}}。"""
+    fits, name = {}, None
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if row and row[0] == "FrictionFit":
+                name = row[1]
+                fits[name] = {"N": int(row[3]), "R2": float(row[7])} if len(row) > 7 else None
+            elif name is not None and len(row) > 2 and row[0] == "" and row[1] in ("B", "Fc", "Fs"):
+                fits[name][row[1]] = float(row[2])
+            else:
+                name = None
+    return fits
+
+
+@pytest.fixture(scope="module")
+def sim_sweep(tmp_path_factory):
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("auto_damping"))
+    try:
+        auto_damping_measure.main(["--sim", "--directions", ",".join(DIRECTIONS), "--velocities", "0.1,0.2"])
+        yield os.path.abspath(glob.glob("auto_damping_*[0-9].csv")[0])
+    finally:
+        os.chdir(cwd)
+
+
+def test_auto_damping_fit_matches_online(sim_sweep):
+    params = reanalyze.analysis_params(reanalyze.parse_args([]))
+    _, kind, status, out, summary = reanalyze.reanalyze_file(sim_sweep, params, force=True)
+    assert status == "ok", summary
+    online, offline = _fits(sim_sweep), _fits(out)
+    assert set(offline) == set(DIRECTIONS)
+    for dname in DIRECTIONS:
+        assert online[dname] is not None and offline[dname] is not None
+        assert offline[dname]["N"] == online[dname]["N"]
+        assert offline[dname]["B"] == pytest.approx(online[dname]["B"], rel=1e-2)
+        assert offline[dname]["Fc"] == pytest.approx(online[dname]["Fc"], rel=1e-2, abs=1e-2)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+timebase.py
+
+功能：
+1. Timebase：基于 time.monotonic_ns 的会话时间 (秒, 自创建起)，不受系统时钟调整影响，替代 time.time()。
+2. timed_states(robot, tb)：读取 robot.states() 并返回 (采集时刻, states)；
+   采集时刻取调用前后两个单调时间戳的中点，主从两台机器人各自带时间戳，不再假设"先后读取的两次状态同时刻"。
+3. 重采样 (向量化)：
+   - common_grid：两路数据时间重叠区间上的均匀网格 (步长默认取两路采样间隔中位数的较大者)；
+   - resample：np.interp 逐列插值到网格；
+   - align：两路数据一次对齐到同一网格。
+4. estimate_delay：互相关估计 b 相对 a 的时延 (秒, 正值表示 b 滞后)，峰值附近抛物线插值得到亚采样精度；
+   信号几乎不变或两路变化不相关时返回 nan。
+"""
+
+import time
+
+import numpy as np
+
+
+class Timebase:
+    def __init__(self):
+        self.t0_ns = time.monotonic_ns()
+
+    def now(self):
+        return (time.monotonic_ns() - self.t0_ns) * 1e-9
+
+
+def timed_states(robot, tb):
+    t_before = tb.now()
+    states = robot.states()
+    t_after = tb.now()
+    return 0.5 * (t_before + t_after), states
+
+
+def median_interval(t):
+    t = np.asarray(t, dtype=np.float64)
+    return float(np.median(np.diff(t))) if t.size > 1 else float("nan")
+
+
+def common_grid(t_a, t_b, dt=None):
+    """两路时间戳重叠区间上的均匀网格；无重叠时返回空数组。"""
+    t_a = np.asarray(t_a, dtype=np.float64)
+    t_b = np.asarray(t_b, dtype=np.float64)
+    if t_a.size < 2 or t_b.size < 2:
+        return np.empty(0)
+    start = max(t_a[0], t_b[0])
+    stop = min(t_a[-1], t_b[-1])
+    if dt is None:
+        dt = max(median_interval(t_a), median_interval(t_b))
+    if not dt > 0 or stop <= start:
+        return np.empty(0)
+    return start + dt * np.arange(int(np.floor((stop - start) / dt)) + 1)
+
+
+def resample(t, values, grid):
+    """values: 长度 N 的一维数组或 N x k 数组，返回 len(grid) (x k) 的插值结果。"""
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return np.interp(grid, t, values)
+    return np.column_stack([np.interp(grid, t, values[:, k]) for k in range(values.shape[1])])
+
+
+def align(t_a, a, t_b, b, dt=None):
+    """返回 (grid, a_grid, b_grid)。"""
+    grid = common_grid(t_a, t_b, dt)
+    return grid, resample(t_a, a, grid), resample(t_b, b, grid)
+
+
+def estimate_delay(t_a, a, t_b, b, max_lag=0.5, dt=None, min_std=1e-6, min_corr=0.5):
+    """
+    b 相对 a 的时延 (秒)。两路一维信号先对齐到同一网格，再在 ±max_lag 内求归一化互相关峰值；
+    峰值相关系数低于 min_corr (两路变化不相关，如纯噪声) 时返回 nan。
+    """
+    grid, ag, bg = align(t_a, a, t_b, b, dt)
+    if grid.size < 8:
+        return float("nan")
+    step = grid[1] - grid[0]
+    ag = ag - ag.mean()
+    bg = bg - bg.mean()
+    if ag.std() < min_std or bg.std() < min_std:
+        return float("nan")
+    n = ag.size
+    max_k = min(int(max_lag / step), n - 2)
+    lags = np.arange(-max_k, max_k + 1)
+    # c[k] = sum a[i] * b[i+k] / 重叠长度，b 滞后 k 个采样时 c[k] 最大
+    full = np.correlate(bg, ag, mode="full")[n - 1 - max_k:n + max_k]
+    c = full / (n - np.abs(lags)) / (ag.std() * bg.std())
+    i = int(np.argmax(c))
+    if c[i] < min_corr:
+        return float("nan")
+    shift = 0.0
+    if 0 < i < c.size - 1:
+        denom = c[i - 1] - 2 * c[i] + c[i + 1]
+        if denom != 0:
+            shift = 0.5 * (c[i - 1] - c[i + 1]) / denom
+    return float((lags[i] + shift) * step)
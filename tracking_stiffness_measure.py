@@ -17,21 +17,43 @@ tracking_stiffness_measure.py
    - 当连续 20 个 0.1 秒内计算得到的局部刚度均相差不超过 20 (N/m 或 Nm/rad) 时，认为刚度已稳定；  
    - 在刚度稳定后，取这 20 个小段的平均值作为该次测试的跟踪刚度。  
 4. 每个方向重复测试 5 次，记录每次的跟踪刚度，并计算该方向的平均刚度作为最终结果。 
+5. 采样数据按段由后台线程写入 samples CSV，每次测试结果立即追加写入汇总 CSV 并落盘。
+6. 主从状态各带单调采集时间戳 (timebase)，每次循环每台机器人只读取一次 states()；
+   段刚度在两路数据插值到同一均匀时间网格后计算，不再把先后读取的主从状态当作同一时刻。
+7. 主侧位置、从侧位置与从侧外力逐采样经 Hampel 尖峰剔除 + 二阶 Butterworth 低通 (--filter-cutoff，默认 5Hz，0 为不滤波)，
+   滤波器状态在一次测试内跨段保持；段刚度与实时显示使用滤波后的数据，samples CSV 同时保存原始值与滤波值。
 """
 
 import argparse
 import time
 import signal
 import sys
-import csv
 import os
-import subprocess
 from datetime import datetime
 import math
 import flexivrdk
 
-teleop_pid = None
-teleop_pattern = None
+from result_writer import ResultWriter
+from teleop_process import TeleopProcess
+from sample_buffer import SampleBuffer
+import instrumentation as instr
+from timebase import Timebase, timed_states
+from signal_filter import Biquad, FilterChain, SpikeRejector
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from session_state import SessionState, add_resume_argument
+from measurement_watchdog import Watchdog, MeasurementAborted, add_watchdog_arguments
+from robot_daemon import connect
+from benchmark_analysis import segment_stiffness, is_stable
+from motion_timing import MotionTimeEstimator, move_and_wait, format_result, RDK_DEFAULT_VEL_SCALE
+import state_bus
+
+teleop = TeleopProcess()
+wd = Watchdog(teleop)
+tb = Timebase()
+
+# 单段采样列：主从各自的采集时刻与该轴位置 (m 或 rad)，从侧该轴外力 (随从侧时间戳)；*_f 为滤波值
+STIFFNESS_COLUMNS = ("t_leader", "master_pos", "t_follower", "slave_pos", "F_slave",
+                     "master_pos_f", "slave_pos_f", "F_slave_f")
 
 # 测试参数
 sample_interval = 0.01   # 采样周期 (100Hz)
@@ -39,6 +61,12 @@ segment_duration = 0.1   # 每个采样段时长 (秒)
 stable_count = 20        # 需要连续20个小段满足条件
 min_stiffness = 10.0    # 每段刚度需大于 min_stiffness 视为有效记录
 max_fluctuation = 20.0  # 连续 stable_count 段刚度最大-最小 < 20
+filter_cutoff = 5.0     # 位置/外力低通截止频率 (Hz)，0 为不滤波
+spike_window = 5        # 尖峰剔除窗口 (采样数)
+
+_T_LOOP   = instr.site("stiffness.loop")
+_T_APPEND = instr.site("stiffness.append")
+_T_PRINT  = instr.site("stiffness.print")
 HOME_POSE = [-5.6850536735238373e-05, -39.999988598597405, -7.796941005345694e-05,
              89.99967467229428, -1.394160247868911e-05, 39.99993054198945, -1.9290991341998603e-06]
 
@@ -73,132 +101,133 @@ def quat_to_euler(q):
     yaw = math.atan2(siny_cosp, cosy_cosp)
     return (roll, pitch, yaw)
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Slave Tracking Stiffness Measurement")
     parser.add_argument("-1", "--leader", required=True, help="主机械臂序列号")
     parser.add_argument("-2", "--follower", required=True, help="从机械臂序列号")
     parser.add_argument("-p", "--password", required=True, help="用于启动和停止 Teleop 程序的 sudo 密码")
     parser.add_argument("-n", "--num", type=int, default=5, help="每个方向测试次数 (默认5次)")
-    return parser.parse_args()
+    parser.add_argument("--filter-cutoff", type=float, default=filter_cutoff,
+                        help=f"位置/外力低通截止频率 Hz (默认 {filter_cutoff:g}，0 为不滤波)")
+    add_resume_argument(parser)
+    add_watchdog_arguments(parser, progress="没有一段刚度大于 min_stiffness，即未接触刚体")
+    state_bus.add_bus_argument(parser)
+    instr.add_profile_argument(parser)
+    return parser.parse_args(argv)
 
 def find_executables():
     return [(f, f"./{f}") for f in os.listdir('.') if f.startswith("test_") and os.access(f, os.X_OK)]
 
 def start_teleop(executable_path):
     """
-    启动 Teleop 程序，并使其成为新会话的组长。
+    启动 Teleop 程序 (sudo, 新会话)，并记录其进程树。
     若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。
     返回 Teleop 进程的 PID。
     """
-    global teleop_pid, teleop_pattern, SUDO_PASSWORD, leader_sn, follower_sn
-    teleop_pattern = os.path.basename(executable_path)
-    if "high_transparency" in teleop_pattern:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -l {leader_sn} -r {follower_sn}"
-    else:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -1 {leader_sn} -2 {follower_sn}"
-    pid = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid).pid
-    teleop_pid = pid
-    print(f"[StartTeleop] pattern=({teleop_pattern}), cmd=({cmd}), pid={pid}")
+    pid = teleop.start(executable_path, leader_sn, follower_sn, SUDO_PASSWORD)
     time.sleep(2.0)
+    teleop.refresh_tree()
     return pid
 
 def stop_teleop():
     """
-    结束 Teleop 程序：先通过 killpg(SIGTERM+SIGKILL) 结束进程组，
-    然后使用 pkill -9 -f 以确保所有相关进程被关闭。
+    结束 Teleop 进程树：SIGTERM 后等待其全部退出即返回，超时才升级为 SIGKILL。
+    返回 TeardownReport (未启动时为 None)。
     """
-    global teleop_pid, teleop_pattern
-    if teleop_pid is not None and teleop_pid > 0:
-        try:
-            pgid = os.getpgid(teleop_pid)
-        except ProcessLookupError:
-            print(f"[stop_teleop] pid {teleop_pid} not found. Possibly ended.")
-            pgid = None
-        if pgid is not None:
-            print(f"[stop_teleop] killpg(SIGTERM) pgid={pgid}")
-            try:
-                os.killpg(pgid, signal.SIGTERM)
-                time.sleep(1.0)
-            except ProcessLookupError:
-                print("[stop_teleop] Group not found, likely ended.")
-            else:
-                try:
-                    os.killpg(pgid, 0)
-                    print(f"[stop_teleop] Still alive => killpg(SIGKILL) pgid={pgid}")
-                    os.killpg(pgid, signal.SIGKILL)
-                except ProcessLookupError:
-                    print("[stop_teleop] Group ended after SIGTERM.")
-        teleop_pid = None
-    if teleop_pattern:
-        print(f"[stop_teleop] pkill -9 -f {teleop_pattern}")
-        try:
-            subprocess.run(["pkill", "-9", "-f", teleop_pattern], check=False)
-        except Exception as e:
-            print(f"[stop_teleop] pkill error: {e}")
-    teleop_pattern = None
-
-def sync_home(robot):
+    return teleop.stop()
+
+def send_movej(robot, pose_deg):
     robot.SwitchMode(flexivrdk.Mode.NRT_PRIMITIVE_EXECUTION)
-    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(HOME_POSE, [0]*6)})
+    robot.ExecutePrimitive("MoveJ", {"target": flexivrdk.JPos(pose_deg, [0]*6)})
+
+def sync_home(robots, sn_list):
+    """所有机器人同时 MoveJ 到 Home Pose，稳定到达 (或超时) 后返回是否全部到达。"""
     print(f"[SyncPose] 同步到 Home Pose: {HOME_POSE}")
-    time.sleep(2)
+    estimators = [MotionTimeEstimator(sn) for sn in sn_list]
+    results = move_and_wait(robots, estimators, HOME_POSE, RDK_DEFAULT_VEL_SCALE, send_movej, label="SyncPose")
+    for est, res in zip(estimators, results):
+        print(f"  {format_result(est.key, res)}")
+    return all(res.reached for res in results)
+
+def make_filter(channels):
+    """尖峰剔除 -> Butterworth 低通；filter_cutoff <= 0 时返回 None (直通)。"""
+    if filter_cutoff <= 0:
+        return None
+    return FilterChain(SpikeRejector(spike_window, channels=channels),
+                       Biquad.lowpass(filter_cutoff, 1.0 / sample_interval, channels=channels))
 
-def measure_stiffness_for_axis(leader_robot, slave_robot, axis):
+def measure_stiffness_for_axis(leader_robot, slave_robot, axis, sample_writer=None, trial=0):
     """
     持续采样，不设固定持续时长，直到连续 stable_count 段（每段 segment_duration 秒）
     的局部刚度值均大于 min_stiffness 且波动范围小于 max_fluctuation。
     局部刚度：对当前采样段数据计算：
       - 对平移方向，误差为主从 TCP 在该轴的差值 (m)；
       - 对旋转方向，先将四元数转换为 Euler 角，然后取对应角度差 (rad)。
-      同时计算从手与主手在该轴的外力差值 F_diff。
-      局部刚度 K_seg = (平均 |F_diff|) / (平均 |Δ|)。
-    当连续 stable_count 个段满足条件时，返回这 stable_count 段的平均刚度。
+      位置与外力先经流式滤波，主从两路按各自时间戳插值到同一时间网格后求 Δ 与从手该轴外力 F_slave。
+      局部刚度 K_seg = 平均 F_slave / 平均 Δ。
+    当连续 stable_count 个段满足条件时，返回 (这 stable_count 段的平均刚度, 末段平均 Δ, 段刚度记录, 本次全部采样)。
+    若提供 sample_writer (ResultWriter)，每段采样 (axis, trial, 列见 STIFFNESS_COLUMNS) 提交给后台线程写盘。
     """
     stable_window = []
     segment_logs = []
+    cfg = TEST_AXES[axis]
+    idx = cfg["index"]
+    seg_samples = SampleBuffer(STIFFNESS_COLUMNS, capacity=int(segment_duration/sample_interval)*2)
+    trial_samples = SampleBuffer(STIFFNESS_COLUMNS, capacity=int(30.0/sample_interval))
+    master_filter = make_filter(1)
+    slave_filter = make_filter(2)
+
+    def axis_pos(pose):
+        return pose[idx] if cfg["type"] == "linear" else quat_to_euler(pose[3:7])[idx]
+
     while True:
-        seg_samples = []
-        seg_start = time.time()
-        while time.time() - seg_start < segment_duration:
-            master_pose = leader_robot.states().tcp_pose.copy()  # [x,y,z,qw,qx,qy,qz]
-            slave_pose = slave_robot.states().tcp_pose.copy()
-            if TEST_AXES[axis]["type"] == "linear":
-                delta = slave_pose[TEST_AXES[axis]["index"]] - master_pose[TEST_AXES[axis]["index"]]
+        seg_samples.clear()
+        seg_start = tb.now()
+        while tb.now() - seg_start < segment_duration:
+            wd.check()
+            t_loop = instr.now()
+            t_m, master_states = timed_states(leader_robot, tb)
+            t_s, slave_states = timed_states(slave_robot, tb)
+            master_pos = axis_pos(master_states.tcp_pose)  # tcp_pose: [x,y,z,qw,qx,qy,qz]
+            slave_pos = axis_pos(slave_states.tcp_pose)
+            F_slave = slave_states.ext_wrench_in_world[idx]
+            if master_filter is not None:
+                master_f = master_filter.process(master_pos)
+                slave_f, F_f = slave_filter.process((slave_pos, F_slave))
             else:
-                master_euler = quat_to_euler(master_pose[3:7])
-                slave_euler  = quat_to_euler(slave_pose[3:7])
-                delta = slave_euler[TEST_AXES[axis]["index"]] - master_euler[TEST_AXES[axis]["index"]]
-            F_master = leader_robot.states().ext_wrench_in_world[TEST_AXES[axis]["index"]]
-            F_slave  = slave_robot.states().ext_wrench_in_world[TEST_AXES[axis]["index"]]
-            # F_diff = abs(F_slave - F_master)
-            # seg_samples.append((abs(delta), F_diff))
-            seg_samples.append((delta, F_slave))
+                master_f, slave_f, F_f = master_pos, slave_pos, F_slave
+            delta = slave_f - master_f
+            t0 = instr.now()
+            seg_samples.append(t_m, master_pos, t_s, slave_pos, F_slave, master_f, slave_f, F_f)
+            _T_APPEND.record(instr.now() - t0)
             if abs(delta) < 1e-6:
                 K_temp = float('inf')
             else:
-                K_temp = F_slave/delta
-            print(f"\r当前位置差:{delta: .2f} 当前F_slave {F_slave: .2f} 当前刚度{K_temp: .2f}", end="", flush=True)
-            time.sleep(sample_interval)
-        if seg_samples:
-            N = len(seg_samples)
-            avg_delta = sum(d for (d, F) in seg_samples) / N
-            avg_Fdiff = sum(F for (d, F) in seg_samples) / N
-            if abs(avg_delta) < 1e-6:
-                K_seg = float('inf')
-            else:
-                K_seg = avg_Fdiff / avg_delta
+                K_temp = F_f/delta
+            t0 = instr.now()
+            print(f"\r当前位置差:{delta: .2f} 当前F_slave {F_f: .2f} 当前刚度{K_temp: .2f}", end="", flush=True)
+            _T_PRINT.record(instr.now() - t0)
+            instr.sleep(sample_interval)
+            _T_LOOP.record(instr.now() - t_loop)
+        if len(seg_samples):
+            trial_samples.extend(seg_samples.array())
+            if sample_writer is not None:
+                sample_writer.write_samples([(axis, trial) + rec for rec in seg_samples.rows()])
+            # 主从两路 (滤波值) 插值到同一时间网格后再求位置差 (benchmark_analysis.segment_stiffness)
+            K_seg, avg_delta = segment_stiffness(seg_samples["t_leader"], seg_samples["master_pos_f"],
+                                                 seg_samples["t_follower"], seg_samples["slave_pos_f"],
+                                                 seg_samples["F_slave_f"])
+            if K_seg > min_stiffness:
+                wd.progress()
             segment_logs.append(K_seg)
             stable_window.append(K_seg)
             # 保持最近 stable_count 个段
             if len(stable_window) > stable_count:
                 stable_window.pop(0)
-            if len(stable_window) == stable_count:
-                # 判断是否满足条件：所有段均大于 min_stiffness 且波动范围小于 max_fluctuation
-                if all(val > min_stiffness for val in stable_window):
-                    fluct = max(stable_window) - min(stable_window)
-                    if fluct < max_fluctuation:
-                        print(f"\n稳定条件满足：连续 {stable_count} 段刚度 = {[f'{v:.1f}' for v in stable_window]}")
-                        return sum(stable_window)/stable_count, avg_delta, segment_logs
+            # 所有段均大于 min_stiffness 且波动范围小于 max_fluctuation
+            if len(stable_window) == stable_count and is_stable(stable_window, min_stiffness, max_fluctuation):
+                print(f"\n稳定条件满足：连续 {stable_count} 段刚度 = {[f'{v:.1f}' for v in stable_window]}")
+                return sum(stable_window)/stable_count, avg_delta, segment_logs, trial_samples
 
 def signal_handler(sig, frame):
     print("\n检测到中断，程序退出。")
@@ -207,13 +236,14 @@ def signal_handler(sig, frame):
 
 signal.signal(signal.SIGINT, signal_handler)
 
-def main():
-    global teleop_pid, leader_sn, follower_sn, SUDO_PASSWORD, nTrials
-    args = parse_args()
+def main(argv=None):
+    global leader_sn, follower_sn, SUDO_PASSWORD, nTrials, filter_cutoff
+    args = parse_args(argv)
     leader_sn = args.leader
     follower_sn = args.follower
     SUDO_PASSWORD = args.password
     trials_per_axis = args.num
+    filter_cutoff = args.filter_cutoff
 
     exes = find_executables()
     if not exes:
@@ -225,54 +255,101 @@ def main():
     idx = int(input("请选择要测试的程序序号: "))
     exe_path = exes[idx][1]
 
-    leader_robot = flexivrdk.Robot(leader_sn)
-    slave_robot = flexivrdk.Robot(follower_sn)
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    state = SessionState.open("tracking_stiffness_measure", args.resume, stamp=now_str,
+                              meta={"leader": leader_sn, "follower": follower_sn, "teleop": exes[idx][0],
+                                    "num": trials_per_axis, "filter_cutoff": filter_cutoff})
+
+    state_bus.open_from_args(args)
+    leader_robot = state_bus.tap(instr.instrument_robot(connect(leader_sn, flexivrdk), "leader"), "leader")
+    slave_robot = state_bus.tap(instr.instrument_robot(connect(follower_sn, flexivrdk), "follower"), "follower")
+    wd.configure_from_args(args, {"leader": leader_robot, "follower": slave_robot}).start()
+    profiler = instr.Profiler(args.profile).start()
 
     print("同步到 Home Pose...")
-    sync_home(leader_robot)
-    sync_home(slave_robot)
+    sync_home([leader_robot, slave_robot], [leader_sn, follower_sn])
     input("Home Pose 已同步，请按 Enter 启动遥操作程序...")
 
     start_teleop(exe_path)
     print("遥操作程序已启动，等待7秒稳定...")
     time.sleep(7)
 
+    csv_filename = f"tracking_stiffness_summary_{now_str}.csv"
+    samples_filename = f"tracking_stiffness_samples_{now_str}.csv"
+    writer = ResultWriter(csv_filename)
+    sample_writer = ResultWriter(samples_filename)
+    writer.writerow(["Tracking Stiffness Measurement Summary", now_str])
+    writer.writerow(["Session state", state.path])
+    writer.writerow(["Axis", "Trial", "Stiffness", "Avg Delta", "Segment Stiffness Log"])
+    sample_writer.writerow(["Axis", "Trial"] + list(STIFFNESS_COLUMNS))
+
     results = {}
     logs = {}
-    for axis in TEST_AXES.keys():
-        print(f"\n========== 测试 {axis} 方向的跟踪刚度 ==========")
-        trial_values = []
-        trial_logs = []
-        for i in range(trials_per_axis):
-            print(f"开始第 {i+1} 次测试，在{axis}方向作相对位移并保持相对静止，...")
-            print(f"采样 {axis} 方向数据，请保持施力……")
-            K, avg_delta, seg_log = measure_stiffness_for_axis(leader_robot, slave_robot, axis)
+    completed = False
+    try:
+        for axis in TEST_AXES.keys():
+            print(f"\n========== 测试 {axis} 方向的跟踪刚度 ==========")
+            trial_values = []
+            trial_logs = []
+            axis_resumed = True
+            for i in range(trials_per_axis):
+                unit_name = f"{axis}/{i+1}"
+                unit = "N/m" if TEST_AXES[axis]["type"]=="linear" else "Nm/rad"
+                if state.done(unit_name):
+                    # 已完成：结果与采样从检查点写入本次 CSV
+                    K, avg_delta, seg_log = state.result(unit_name)
+                    samples = state.arrays(unit_name)["samples"]
+                    sample_writer.write_samples([(axis, i+1) + tuple(r) for r in samples.tolist()])
+                    print(f"[Resume] 第 {i+1} 次 {axis} 方向刚度 = {K:.1f} {unit} (检查点)")
+                else:
+                    axis_resumed = False
+                    print(f"开始第 {i+1} 次测试，在{axis}方向作相对位移并保持相对静止，...")
+                    print(f"采样 {axis} 方向数据，请保持施力……")
+                    with wd.watch(f"{axis} trial {i+1}"):
+                        K, avg_delta, seg_log, samples = measure_stiffness_for_axis(
+                            leader_robot, slave_robot, axis, sample_writer, i+1)
+                    print(f"第 {i+1} 次 {axis} 方向刚度 = {K:.1f} {unit}（平均误差 = {avg_delta:.4f}）")
+                    state.complete_unit(unit_name, result=[K, avg_delta, seg_log],
+                                        arrays={"samples": samples.array()})
+                    time.sleep(1)
+                trial_values.append(K)
+                trial_logs.append(seg_log)
+                writer.writerow([axis, i+1, f"{K:.1f}", f"{avg_delta:.4f}", ", ".join(f"{v:.1f}" for v in seg_log)])
+                sample_writer.mark_trial_done()
+                writer.mark_trial_done()
+            avg_K = sum(trial_values) / len(trial_values)
+            results[axis] = (trial_values, avg_K, bootstrap_ci(trial_values))
+            logs[axis] = trial_logs
+            if not axis_resumed:
+                input('该方向采集完成，请复位后按enter键开启下一次测试')
+
+        print("\n========== 各方向测试结果 ==========")
+        for axis, (vals, avg_K, k_ci) in results.items():
             unit = "N/m" if TEST_AXES[axis]["type"]=="linear" else "Nm/rad"
-            print(f"第 {i+1} 次 {axis} 方向刚度 = {K:.1f} {unit}（平均误差 = {avg_delta:.4f}）")
-            trial_values.append(K)
-            trial_logs.append(seg_log)
-            time.sleep(1)
-        avg_K = sum(trial_values) / len(trial_values)
-        results[axis] = (trial_values, avg_K)
-        logs[axis] = trial_logs
-        input('该方向采集完成，请复位后按enter键开启下一次测试')
-    
-    print("\n========== 各方向测试结果 ==========")
-    for axis, (vals, avg_K) in results.items():
-        unit = "N/m" if TEST_AXES[axis]["type"]=="linear" else "Nm/rad"
-        print(f"{axis}: 试验值 = {[f'{v:.1f}' for v in vals]}, 平均刚度 = {avg_K:.1f} {unit}")
-    
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"tracking_stiffness_summary_{now_str}.csv"
-    with open(csv_filename, "w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Tracking Stiffness Measurement Summary", now_str])
-        writer.writerow(["Axis", "Trial Stiffness Values", "Average Stiffness"])
-        for axis, (vals, avg_K) in results.items():
+            print(f"{axis}: 试验值 = {[f'{v:.1f}' for v in vals]}, 平均刚度 = {format_ci(k_ci, '.1f')} {unit}")
+
+        writer.writerow([])
+        writer.writerow(["Axis", "Trial Stiffness Values", "Average Stiffness"] + ci_header() +
+                        ["Segment Stiffness Logs"])
+        for axis, (vals, avg_K, k_ci) in results.items():
             unit = "N/m" if TEST_AXES[axis]["type"]=="linear" else "Nm/rad"
             seg_logs_str = "; ".join([", ".join(f"{v:.1f}" for v in log) for log in logs[axis]])
-            writer.writerow([axis, ", ".join(f"{v:.1f}" for v in vals), f"{avg_K:.1f} {unit}", seg_logs_str])
-    print(f"测试结果已保存到 {csv_filename}。")
+            writer.writerow([axis, ", ".join(f"{v:.1f}" for v in vals), f"{avg_K:.1f} {unit}"] +
+                            ci_cells(k_ci, ".1f") + [seg_logs_str])
+        completed = True
+        state.finish()
+    except MeasurementAborted as e:
+        print(f"\n[Watchdog] 测量中止: {e.reason} ({e.detail})")
+        writer.writerow(["Aborted", e.reason, e.detail])
+    finally:
+        wd.stop()
+        sample_writer.close(complete=completed)
+        saved = writer.close(complete=completed)
+        print(f"测试结果已保存到 {saved}。")
+        if not completed:
+            print(f"已完成的测试已保存到 {state.path}，可使用 --resume 继续。")
+        profiler.stop(saved)
+        instr.write_report(saved)
     stop_teleop()
     print(f'遥操作程序已停止')
 
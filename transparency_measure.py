@@ -13,21 +13,44 @@ transparency_measure.py
    并以“slave:master”显示,当从侧力连续3秒保持在9N到11N之间时，   记录该区间数据并计算平均值，作为单次测试的结果。
 3. 整个测试过程连续进行 n 次（默认 n=5），每次测试结束后输出该次结果，
    最后输出 n 次测试结果的平均值，并将所有数据和总结保存到 CSV 文件中。
+   每次测试的结果及有效区间采样在该次测试结束时即追加写入并落盘。
+4. 记录主/从完整 6 维外力，--axis (X+/X-/Y+/Y-/Z+/Z-，默认 Z+) 指定接触方向，保持判据与实时透明度按该轴计算。
+   每次测试由 wrench_analysis 对保持区间向量化计算：各轴透明度、主从 6x6 映射矩阵、非接触轴的交叉泄漏；
+   全部测试结束后合并所有保持区间拟合会话映射矩阵 (不同接触方向的测试可在同一会话内完成)。
+5. 主从状态各带单调采集时间戳 (timebase)，分析前两路插值到同一均匀时间网格；
+   并由接触轴力的互相关估计主侧相对从侧的力反馈时延 (Lag_ms，保持区间内力几乎不变或变化不相关时为 nan)。
+6. 阶梯模式 (--staircase 5,10,15,20)：每次测试为一段连续记录，操作者依次在各力档位保持 (实时提示当前档位，
+   保持 3 秒后提示下一档)，全部档位完成后结束。记录结束后由 plateau_detect 离线向量化分割各档位的稳定平台
+   (容差带 + 滑动标准差)，每个档位取最长平台计算透明度与交叉泄漏，由整段记录的力差分 (档位切换) 估计力反馈时延；
+   汇总给出各档位透明度 (附置信区间) 与全部平台的线性度拟合 (增益、偏置、R^2、最大非线性偏差)，
+   结果写入 transparency_staircase_<时间>.csv，全部采样写入 transparency_staircase_samples_<时间>.csv。
 """
 
 import time
 import signal
 import sys
-import csv
 import os
-import subprocess
 from datetime import datetime
 import argparse
 import flexivrdk
 
-# 全局变量：Teleop进程PID及其匹配模式
-teleop_pid = None
-teleop_pattern = None
+from result_writer import ResultWriter
+from teleop_process import TeleopProcess
+from sample_buffer import SampleBuffer
+import instrumentation as instr
+import numpy as np
+from wrench_analysis import WRENCH_AXES, parse_axis, mapping_matrix, matrix_rows
+from timebase import Timebase, timed_states
+from bootstrap_stats import bootstrap_ci, format_ci, ci_header, ci_cells
+from measurement_watchdog import Watchdog, MeasurementAborted, STALLED, add_watchdog_arguments
+from plateau_detect import linearity, BAND_MIN, BAND_REL
+from benchmark_analysis import hold_transparency, staircase_results
+from robot_daemon import connect
+import state_bus
+
+# 全局变量：Teleop进程 (精确进程树管理)
+teleop = TeleopProcess()
+wd = Watchdog(teleop)
 
 # 机器人连接参数
 leader_robot_sn = None
@@ -39,6 +62,17 @@ finalDistM = 0.30  # 目标位移 (米)，例如0.30表示30cm
 startDist  = 0.05  # 从5cm开始采样
 sample_interval = 0.1  # 采样周期，0.1秒，即10Hz
 valid_duration = 3.0  # 连续有效时间3秒 
+staircase_max_s = 300.0  # 阶梯模式单次记录的预分配时长 (秒)
+
+tb = Timebase()
+
+# 保持区间采样列：主/从各自的采集时刻与 6 维外力 (world 坐标)
+WRENCH_COLUMNS = (("t_leader",) + tuple(f"m_{a}" for a in WRENCH_AXES) +
+                  ("t_follower",) + tuple(f"s_{a}" for a in WRENCH_AXES))
+
+_T_LOOP   = instr.site("transparency.loop")
+_T_APPEND = instr.site("transparency.append")
+_T_PRINT  = instr.site("transparency.print")
 
 # =========== 函数：查找可执行文件 ===========
 
@@ -55,124 +89,226 @@ def find_executables_in_current_dir():
 
 def start_teleop(executable_path):
     """
-    启动Teleop进程，并使其成为新会话的组长。
-    若文件名包含"high_transparency"，则使用参数 -l / -r，
-    否则使用 -1 / -2。返回启动进程的PID。
+    启动 Teleop 程序 (sudo, 新会话)，并记录其进程树。
+    若文件名包含 "high_transparency"，则使用 -l / -r 参数，否则使用 -1 / -2 参数。
+    返回 Teleop 进程的 PID。
     """
-    global teleop_pid, teleop_pattern
-    teleop_pattern = os.path.basename(executable_path)
-    if "high_transparency" in teleop_pattern:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -l {leader_robot_sn} -r {follower_robot_sn}"
-    else:
-        cmd = f"echo {SUDO_PASSWORD} | sudo -S {executable_path} -1 {leader_robot_sn} -2 {follower_robot_sn}"
-    pid = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid).pid
-    teleop_pid = pid
-    print(f"[StartTeleop] pattern=({teleop_pattern}), cmd=({cmd}), pid={pid}")
+    pid = teleop.start(executable_path, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD)
     time.sleep(2.0)
+    teleop.refresh_tree()
     return pid
 
 def stop_teleop():
     """
-    尝试通过 killpg(SIGTERM+SIGKILL) 结束Teleop进程组，
-    然后调用 pkill -9 -f 以确保所有相关进程被关闭。
+    结束 Teleop 进程树：SIGTERM 后等待其全部退出即返回，超时才升级为 SIGKILL。
+    返回 TeardownReport (未启动时为 None)。
     """
-    global teleop_pid, teleop_pattern
-    if teleop_pid is not None and teleop_pid > 0:
-        try:
-            pgid = os.getpgid(teleop_pid)
-        except ProcessLookupError:
-            print(f"[stop_teleop] pid {teleop_pid} not found. Possibly ended.")
-            pgid = None
-        if pgid is not None:
-            print(f"[stop_teleop] killpg(SIGTERM) pgid={pgid}")
-            try:
-                os.killpg(pgid, signal.SIGTERM)
-                time.sleep(1.0)
-            except ProcessLookupError:
-                print("[stop_teleop] Group not found, likely ended.")
-            else:
-                try:
-                    os.killpg(pgid, 0)
-                    print(f"[stop_teleop] Still alive => killpg(SIGKILL) pgid={pgid}")
-                    os.killpg(pgid, signal.SIGKILL)
-                except ProcessLookupError:
-                    print("[stop_teleop] Group ended after SIGTERM.")
-        teleop_pid = None
-    if teleop_pattern:
-        print(f"[stop_teleop] pkill -9 -f {teleop_pattern}")
-        try:
-            subprocess.run(["pkill", "-9", "-f", teleop_pattern], check=False)
-        except Exception as e:
-            print(f"[stop_teleop] pkill error: {e}")
-    teleop_pattern = None
-
-def measure_transparency_once():
+    return teleop.stop()
+
+def measure_transparency_once(contact_axis="Z+"):
     """
-    在循环中以固定频率读取主臂与从臂末端 Z 方向外力，
-    实时计算透明度 T = -F_master_z / F_slave_z（格式：slave:master），
-    并提示：若 F_slave_z < 9N 输出“请大力一些”，大于 11N 输出“请小力一些”。
-    当从侧力连续有效3秒（9N<=F_slave_z<=11N）后，记录该区间数据，
+    在循环中以固定频率读取主臂与从臂末端 6 维外力，按接触轴 contact_axis (如 "Z+") 的分量
+    实时计算透明度 T = -F_master / F_slave（格式：slave:master），
+    并提示：若接触方向从侧力 < 9N 输出“请大力一些”，大于 11N 输出“请小力一些”。
+    当从侧力连续有效3秒（9N<=F_slave<=11N）后，记录该区间数据，
     并计算平均透明度。
-    返回：平均透明度 T_avg。
+    返回：(平均透明度 T_avg, 有效区间采样 valid_data (列见 WRENCH_COLUMNS))；无有效数据时 T_avg 为 None。
     """
+    idx, sign = parse_axis(contact_axis)
+    name = contact_axis[0].lower()
     valid_start_time = None
-    valid_data = []  # 存储有效采样数据： (timestamp, F_master_z, F_slave_z)
+    valid_data = SampleBuffer(WRENCH_COLUMNS, capacity=int(valid_duration/sample_interval)*2)
     
     while True:
-        leader_states = leader_robot.states()
-        follower_states = follower_robot.states()
+        wd.check()
+        t_loop = instr.now()
+        t_master, leader_states = timed_states(leader_robot, tb)
+        t_slave, follower_states = timed_states(follower_robot, tb)
         
-        F_master_z = leader_states.ext_wrench_in_world[2]
-        F_slave_z = follower_states.ext_wrench_in_world[2]
+        w_master = leader_states.ext_wrench_in_world
+        w_slave = follower_states.ext_wrench_in_world
+        F_master = w_master[idx]
+        F_slave = w_slave[idx]
+        F_press = sign * F_slave  # 接触方向上的从侧压力
         
-        if abs(F_slave_z) < 1e-6:
+        if abs(F_slave) < 1e-6:
             T = float('inf')
         else:
-            T = -F_master_z / F_slave_z
+            T = -F_master / F_slave
         
-        msg = f"F_slave_z = {F_slave_z: .4f} N, F_master_z = {F_master_z: .4f} N, 透明度 = 1:{T:.4f}"
-        if F_slave_z < 9.0:
+        msg = f"F_slave_{name} = {F_slave: .4f} N, F_master_{name} = {F_master: .4f} N, 透明度 = 1:{T:.4f}"
+        if F_press < 9.0:
             msg += "    --> 请大力一些"
-        elif F_slave_z > 11.0:
+        elif F_press > 11.0:
             msg += "    --> 请小力一些"
         else:
             msg += "    --> 请保持3秒"
+        t0 = instr.now()
         print("\r" + msg.ljust(80), end="", flush=True)
+        _T_PRINT.record(instr.now() - t0)
         
-        current_time = time.time()
-        if 9.0 <= F_slave_z <= 11.0:
+        current_time = tb.now()
+        if 9.0 <= F_press <= 11.0:
             if valid_start_time is None:
                 valid_start_time = current_time
-                valid_data = []
-            valid_data.append((current_time, F_master_z, F_slave_z))
+                valid_data.clear()
+            wd.progress()
+            t0 = instr.now()
+            valid_data.append(t_master, *w_master[:6], t_slave, *w_slave[:6])
+            _T_APPEND.record(instr.now() - t0)
         else:
             valid_start_time = None
-            valid_data = []
+            valid_data.clear()
         
         if valid_start_time is not None and (current_time - valid_start_time) >= valid_duration:
             print("\n连续有效3秒，采集结束。")
             break
         
-        time.sleep(sample_interval)
+        instr.sleep(sample_interval)
+        _T_LOOP.record(instr.now() - t_loop)
     
-    if not valid_data:
+    if len(valid_data) == 0:
         print("未采集到有效数据，返回无效结果。")
-        return None
+        return None, valid_data
     
-    N = len(valid_data)
-    sum_F_master = sum(fm for (_, fm, _) in valid_data)
-    sum_F_slave  = sum(fs for (_, _, fs) in valid_data)
-    avg_F_master = sum_F_master / N
-    avg_F_slave  = sum_F_slave / N
+    avg_F_master = float(valid_data[f"m_F{name}"].mean())
+    avg_F_slave  = float(valid_data[f"s_F{name}"].mean())
     
     if abs(avg_F_slave) < 1e-6:
         T_avg = float('inf')
     else:
         T_avg = -avg_F_master / avg_F_slave
     
-    print(f"\n最终有效区间平均：F_slave_z = {avg_F_slave: .4f} N, F_master_z = {avg_F_master: .4f} N")
+    print(f"\n最终有效区间平均：F_slave_{name} = {avg_F_slave: .4f} N, F_master_{name} = {avg_F_master: .4f} N")
     print(f"透明度 (slave:master) = 1:{T_avg:.4f}")
-    return T_avg
+    return T_avg, valid_data
+
+
+def measure_staircase_once(contact_axis, levels):
+    """
+    连续记录主从 6 维外力，实时提示操作者依次在 levels 各档位保持 valid_duration 秒，全部完成后返回记录
+    (SampleBuffer，列见 WRENCH_COLUMNS)。实时判断只用于提示与结束，平台由 staircase_results 离线分割。
+    """
+    idx, sign = parse_axis(contact_axis)
+    name = contact_axis[0].lower()
+    rec = SampleBuffer.for_duration(WRENCH_COLUMNS, staircase_max_s, 1.0 / sample_interval)
+    k = 0
+    hold_start = None
+    print(f"请将从侧接触力保持在 {levels[0]:g} N")
+    while k < len(levels):
+        wd.check()
+        t_loop = instr.now()
+        t_master, leader_states = timed_states(leader_robot, tb)
+        t_slave, follower_states = timed_states(follower_robot, tb)
+        w_master = leader_states.ext_wrench_in_world
+        w_slave = follower_states.ext_wrench_in_world
+        t0 = instr.now()
+        rec.append(t_master, *w_master[:6], t_slave, *w_slave[:6])
+        _T_APPEND.record(instr.now() - t0)
+
+        F_press = sign * w_slave[idx]
+        target = levels[k]
+        band = max(BAND_MIN, BAND_REL * target)
+        msg = f"[{k+1}/{len(levels)}] 目标 {target:g} N, F_slave_{name} = {F_press: .3f} N"
+        if F_press < target - band:
+            msg += "    --> 请大力一些"
+            hold_start = None
+        elif F_press > target + band:
+            msg += "    --> 请小力一些"
+            hold_start = None
+        else:
+            msg += "    --> 请保持"
+            wd.progress()
+            if hold_start is None:
+                hold_start = tb.now()
+            elif tb.now() - hold_start >= valid_duration:
+                k += 1
+                hold_start = None
+                print(f"\n{target:g} N 档位完成。" + (f"请将接触力调整到 {levels[k]:g} N" if k < len(levels) else ""))
+        t0 = instr.now()
+        print("\r" + msg.ljust(80), end="", flush=True)
+        _T_PRINT.record(instr.now() - t0)
+        instr.sleep(sample_interval)
+        _T_LOOP.record(instr.now() - t_loop)
+    print("\n全部档位完成，记录结束。")
+    return rec
+
+
+def run_staircase(args, levels, now_str, profiler):
+    """阶梯模式：nTests 次阶梯记录，逐档位透明度与线性度汇总。"""
+    idx, _ = parse_axis(args.axis)
+    writer = ResultWriter(f"transparency_staircase_{now_str}.csv")
+    sample_writer = ResultWriter(f"transparency_staircase_samples_{now_str}.csv")
+    writer.writerow(["Transparency Staircase Measurement", now_str])
+    writer.writerow(["Contact Axis", args.axis])
+    writer.writerow(["Levels (N)"] + [f"{x:g}" for x in levels])
+    writer.writerow(["Test Number", "Level(N)", "Hold_s", "F_slave(N)", "F_master(N)", "Transparency (1:T)",
+                     "Leak_total", "Lag_ms"])
+    sample_writer.writerow(["Test Number"] + list(WRENCH_COLUMNS))
+    per_level = {k: [] for k in range(len(levels))}
+    points = []   # 全部平台的 (F_slave, F_master)
+    completed = False
+    aborted = None
+    try:
+        for i in range(nTests):
+            print(f"\n---------- 第 {i+1} 次阶梯测试 ----------")
+            print(f"请操控主手使末端触碰平面 (从侧 {args.axis} 方向受力)，依次在 "
+                  f"{' / '.join(f'{x:g}' for x in levels)} N 各保持约 {valid_duration:g} 秒。")
+            try:
+                with wd.watch(f"staircase test {i+1}"):
+                    rec = measure_staircase_once(args.axis, levels)
+            except MeasurementAborted as e:
+                print(f"\n[Watchdog] 第 {i+1} 次测试中止: {e.reason} ({e.detail})")
+                writer.writerow([f"Test {i+1}", "Aborted", e.reason, e.detail])
+                if e.reason != STALLED:
+                    aborted = e
+                    break
+                continue
+            sample_writer.write_samples([(i+1,) + r for r in rec.rows()])
+            sample_writer.mark_trial_done()
+            found, lag = staircase_results(rec, args.axis, levels)
+            for k, level in enumerate(levels):
+                if k not in found:
+                    print(f"  {level:g} N: 未找到稳定平台")
+                    writer.writerow([i+1, f"{level:g}", "no plateau"])
+                    continue
+                p, res, f_s, f_m = found[k]
+                T = res.ratios[idx]
+                per_level[k].append(T)
+                points.append((f_s, f_m))
+                writer.writerow([i+1, f"{level:g}", f"{p.t_end - p.t_start:.1f}", f"{f_s:.4f}", f"{f_m:.4f}",
+                                 f"1:{T:.4f}", f"{res.leakage_total:.4f}", f"{lag*1000:.1f}"])
+                print(f"  {level:g} N: 透明度 = 1:{T:.4f}，交叉泄漏 = {res.leakage_total*100:.1f}% "
+                      f"(平台 {p.t_end - p.t_start:.1f}s)")
+            writer.mark_trial_done()
+            print(f"  力反馈时延 = {lag*1000:.1f} ms")
+            time.sleep(1.0)
+
+        writer.writerow([])
+        writer.writerow(["Level(N)", "Average Transparency (1:T)"] + ci_header())
+        print("\n========== 阶梯测试结果 ==========")
+        for k, level in enumerate(levels):
+            values = [v for v in per_level[k] if np.isfinite(v)]
+            if not values:
+                continue
+            ci = bootstrap_ci(values)
+            writer.writerow([f"{level:g}", f"1:{ci.estimate:.4f}"] + ci_cells(ci))
+            print(f"{level:g} N: 平均透明度 = 1:{format_ci(ci)}")
+        lin = linearity([s for s, _ in points], [m for _, m in points])
+        if lin is not None:
+            writer.writerow([])
+            writer.writerow(["Linearity", "Gain", "Offset(N)", "R2", "MaxDev(%FS)", "N"])
+            writer.writerow(["", f"{lin.gain:.4f}", f"{lin.offset:.4f}", f"{lin.r2:.4f}", f"{lin.max_dev_pct:.2f}", lin.n])
+            print(f"线性度: -F_master = {lin.gain:.4f} * F_slave + {lin.offset:.3f} N，R2 = {lin.r2:.4f}，"
+                  f"最大非线性偏差 = {lin.max_dev_pct:.2f}% FS (N={lin.n})")
+        completed = aborted is None
+    finally:
+        wd.stop()
+        sample_writer.close(complete=completed)
+        saved = writer.close(complete=completed)
+        print(f"测试结果已保存到 {saved}。")
+        profiler.stop(saved)
+        instr.write_report(saved)
 
 # =========== 异常 / Ctrl+C 处理 ===========
 def safe_exit():
@@ -185,15 +321,22 @@ def signal_handler(sig, frame):
 
 signal.signal(signal.SIGINT, signal_handler)
 
-def main():
-    global teleop_pid, nTests, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
+def main(argv=None):
+    global nTests, leader_robot_sn, follower_robot_sn, SUDO_PASSWORD
 
     parser = argparse.ArgumentParser(description="Transparency Measurement for Master Force Feedback")
     parser.add_argument("-1", "--leader", required=True, help="主机械臂序列号")
     parser.add_argument("-2", "--follower", required=True, help="从机械臂序列号")
     parser.add_argument("-p", "--password", required=True, help="用于启动和停止 Teleop 程序的 sudo 密码")
     parser.add_argument("-n", "--num", type=int, default=5, help="连续测试次数 (默认5次)")
-    args = parser.parse_args()
+    parser.add_argument("--axis", default="Z+", choices=["X+", "X-", "Y+", "Y-", "Z+", "Z-"],
+                        help="接触方向 (从侧受力方向, 默认 Z+)")
+    parser.add_argument("--staircase", default="",
+                        help="阶梯模式：逗号分隔的力档位 (N)，如 5,10,15,20；每次测试在一段连续记录中依次保持各档位")
+    add_watchdog_arguments(parser, progress="从侧力未进入目标区间；该次测试记为无效并继续")
+    state_bus.add_bus_argument(parser)
+    instr.add_profile_argument(parser)
+    args = parser.parse_args(argv)
 
     leader_robot_sn = args.leader
     follower_robot_sn = args.follower
@@ -226,8 +369,11 @@ def main():
     print("连接到 Robot...")
     # 这里创建两个实例
     global leader_robot, follower_robot
-    leader_robot = flexivrdk.Robot(leader_robot_sn)
-    follower_robot = flexivrdk.Robot(follower_robot_sn)
+    state_bus.open_from_args(args)
+    leader_robot = state_bus.tap(instr.instrument_robot(connect(leader_robot_sn, flexivrdk), "leader"), "leader")
+    follower_robot = state_bus.tap(instr.instrument_robot(connect(follower_robot_sn, flexivrdk), "follower"), "follower")
+    wd.configure_from_args(args, {"leader": leader_robot, "follower": follower_robot}).start()
+    profiler = instr.Profiler(args.profile).start()
     
     # 3) 启动遥操作程序（只启动一次）
     start_teleop(exe_path)
@@ -236,43 +382,111 @@ def main():
     time.sleep(7.0)
     print(f"将连续测试 {nTests} 次...")
     
-    test_results = []
-    for i in range(nTests):
-        print(f"\n---------- 第 {i+1} 次测试 ----------")
-        print("请操控主手，使末端触碰到平面，并尝试使末端保持约10N压力并维持3秒。")
-        T_avg = measure_transparency_once()
-        if T_avg is not None:
-            test_results.append(T_avg)
-            print(f"第 {i+1} 次测试透明度 = 1:{T_avg:.4f}")
-        else:
-            print(f"第 {i+1} 次测试无效。")
-        time.sleep(1.0)
-    
-    # 计算n次测试平均结果
-    if test_results:
-        avg_result = sum(test_results) / len(test_results)
-        print("\n========== 测试结果 ==========")
-        for idx, res in enumerate(test_results):
-            print(f"第 {idx+1} 次透明度 = 1:{res:.4f}")
-        print(f"平均透明度 = 1:{avg_result:.4f}")
-    else:
-        print("没有有效的测试数据。")
-    
-    # 保存结果到 CSV
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.staircase:
+        run_staircase(args, [float(x) for x in args.staircase.split(",")], now_str, profiler)
+        finish_teleop()
+        return
     csv_filename = f"transparency_summary_{now_str}.csv"
-    with open(csv_filename, "w", newline='', encoding="utf-8") as fcsv:
-        writer = csv.writer(fcsv)
-        writer.writerow(["Transparency Measurement Summary", now_str])
-        writer.writerow(["Test Number", "Transparency (1:T)"])
-        for idx, res in enumerate(test_results):
-            writer.writerow([idx+1, f"1:{res:.4f}"])
-        writer.writerow([])
+    samples_filename = f"transparency_samples_{now_str}.csv"
+    writer = ResultWriter(csv_filename)
+    sample_writer = ResultWriter(samples_filename)
+    writer.writerow(["Transparency Measurement Summary", now_str])
+    writer.writerow(["Contact Axis", args.axis])
+    writer.writerow(["Test Number", "Transparency (1:T)"] + [f"T_{a}" for a in WRENCH_AXES] +
+                    ["Leak_Fx", "Leak_Fy", "Leak_Fz", "Leak_total", "Matrix rank", "Lag_ms"])
+    sample_writer.writerow(["Test Number"] + list(WRENCH_COLUMNS))
+
+    test_results = []
+    leak_results = []
+    lag_results = []
+    hold_master = []
+    hold_slave = []
+    completed = False
+    aborted = None
+    try:
+        for i in range(nTests):
+            print(f"\n---------- 第 {i+1} 次测试 ----------")
+            print(f"请操控主手，使末端触碰到平面 (从侧 {args.axis} 方向受力)，并尝试使末端保持约10N压力并维持3秒。")
+            try:
+                with wd.watch(f"transparency test {i+1}"):
+                    T_avg, valid_data = measure_transparency_once(args.axis)
+            except MeasurementAborted as e:
+                print(f"\n[Watchdog] 第 {i+1} 次测试中止: {e.reason} ({e.detail})")
+                writer.writerow([f"Test {i+1}", "Aborted", e.reason, e.detail])
+                if e.reason != STALLED:
+                    aborted = e
+                    break
+                continue
+            sample_writer.write_samples([(i+1,) + rec for rec in valid_data.rows()])
+            sample_writer.mark_trial_done()
+            if T_avg is not None:
+                test_results.append(T_avg)
+                _, res, master, slave, lag = hold_transparency(valid_data, args.axis)
+                lag_ms = lag * 1000
+                lag_results.append(lag_ms)
+                if res is None:
+                    # 主从重叠采样不足 (测试被截断)，无法对齐：只记录透明度与时延
+                    writer.writerow([len(test_results), f"1:{T_avg:.4f}"] + [""] * (len(WRENCH_AXES) + 5) +
+                                    [f"{lag_ms:.1f}"])
+                    writer.mark_trial_done()
+                    print(f"第 {i+1} 次测试透明度 = 1:{T_avg:.4f}，主从采样无法对齐，未计算交叉泄漏，"
+                          f"力反馈时延 = {lag_ms:.1f} ms")
+                    time.sleep(1.0)
+                    continue
+                hold_master.append(master)
+                hold_slave.append(slave)
+                leak_results.append(res.leakage_total)
+                writer.writerow([len(test_results), f"1:{T_avg:.4f}"] + [f"{x:.4f}" for x in res.ratios] +
+                                [f"{x:.4f}" for x in res.leakage] +
+                                [f"{res.leakage_total:.4f}", res.rank, f"{lag_ms:.1f}"])
+                writer.mark_trial_done()
+                print(f"第 {i+1} 次测试透明度 = 1:{T_avg:.4f}，交叉泄漏 = {res.leakage_total*100:.1f}% "
+                      f"(Fx {res.leakage[0]*100:.1f}%, Fy {res.leakage[1]*100:.1f}%, Fz {res.leakage[2]*100:.1f}%)，"
+                      f"力反馈时延 = {lag_ms:.1f} ms")
+            else:
+                print(f"第 {i+1} 次测试无效。")
+            time.sleep(1.0)
+
+        # 计算n次测试平均结果
         if test_results:
-            writer.writerow(["Average Transparency (1:T)", f"1:{avg_result:.4f}"])
-    print(f"测试结果已保存到 {csv_filename}。")
-    
+            avg_result = sum(test_results) / len(test_results)
+            t_ci = bootstrap_ci(test_results)
+            leak_ci = bootstrap_ci(leak_results)
+            lag_ci = bootstrap_ci(lag_results)
+            print("\n========== 测试结果 ==========")
+            for idx, res in enumerate(test_results):
+                print(f"第 {idx+1} 次透明度 = 1:{res:.4f}")
+            print(f"平均透明度 = 1:{format_ci(t_ci)}")
+            print(f"平均交叉泄漏 = {format_ci(leak_ci)}")
+            print(f"平均力反馈时延 = {format_ci(lag_ci, '.1f')} ms")
+            writer.writerow([])
+            writer.writerow(["Metric", "Value"] + ci_header())
+            writer.writerow(["Average Transparency (1:T)", f"1:{avg_result:.4f}"] + ci_cells(t_ci))
+            writer.writerow(["Average Leak_total", f"{leak_ci.estimate:.4f}"] + ci_cells(leak_ci))
+            writer.writerow(["Average Lag_ms", f"{lag_ci.estimate:.1f}"] + ci_cells(lag_ci, ".1f"))
+            # 合并全部保持区间拟合会话映射矩阵
+            if hold_master:
+                T_session, rank = mapping_matrix(np.concatenate(hold_master), np.concatenate(hold_slave))
+                writer.writerow([])
+                writer.writerows(matrix_rows(f"Session mapping T (rank {rank})", T_session))
+                print(f"会话映射矩阵 (rank {rank}) 对角线: " +
+                      ", ".join(f"{a}={T_session[k, k]:.3f}" for k, a in enumerate(WRENCH_AXES)))
+        else:
+            print("没有有效的测试数据。")
+        completed = aborted is None
+    finally:
+        wd.stop()
+        sample_writer.close(complete=completed)
+        saved = writer.close(complete=completed)
+        print(f"测试结果已保存到 {saved}。")
+        profiler.stop(saved)
+        instr.write_report(saved)
+
     # 5) 停止遥操作程序
+    finish_teleop()
+
+def finish_teleop():
     print(f"即将停止遥操作程序，建议使其远离接触物体。")
     time.sleep(3)
     stop_teleop()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+wrench_analysis.py
+
+功能：
+1. 对一个保持区间内记录的主/从 6 维外力 (N x 6 数组, [Fx,Fy,Fz,Mx,My,Mz]) 做向量化透明度分析：
+   - axis_ratios：各轴透明度 T_i = -mean(F_master_i) / mean(F_slave_i) (从侧该轴力过小时为 nan)；
+   - mapping_matrix：最小二乘拟合 F_master ≈ -T @ F_slave 的 6x6 映射矩阵 T (最小范数解)，
+     对角线为各轴透明度，非对角线为交叉耦合；区间内从侧力只沿一个方向时，只有该方向对应的列可辨识，
+     多次测试 (不同接触方向) 合并拟合可得到完整矩阵；
+   - cross_leakage：从侧沿接触轴 k 受力时，主侧在其余力轴上感受到的力占接触轴力的比例。
+2. 结果以 WrenchTransparency 返回，便于写入 CSV。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+WRENCH_AXES = ("Fx", "Fy", "Fz", "Mx", "My", "Mz")
+AXIS_INDEX = {"X": 0, "Y": 1, "Z": 2}
+MIN_FORCE = 0.5      # 从侧平均力低于该值的轴不计算比值 (N)
+MIN_MOMENT = 0.05    # 从侧平均力矩低于该值的轴不计算比值 (Nm)
+
+# ratios: 长度 6；matrix: 6x6；rank: 拟合有效秩；leakage: 长度 3 (接触轴位置为 0)；leakage_total: 合成泄漏比
+WrenchTransparency = namedtuple("WrenchTransparency",
+                                ["contact_axis", "ratios", "matrix", "rank", "leakage", "leakage_total"])
+
+
+def parse_axis(axis):
+    """'Z+' -> (2, +1.0)；'X-' -> (0, -1.0)。"""
+    axis = axis.strip().upper()
+    if len(axis) != 2 or axis[0] not in AXIS_INDEX or axis[1] not in "+-":
+        raise ValueError(f"invalid contact axis: {axis}")
+    return AXIS_INDEX[axis[0]], (1.0 if axis[1] == "+" else -1.0)
+
+
+def axis_ratios(master, slave):
+    master = np.asarray(master, dtype=np.float64)
+    slave = np.asarray(slave, dtype=np.float64)
+    m_mean = master.mean(axis=0)
+    s_mean = slave.mean(axis=0)
+    floor = np.array([MIN_FORCE] * 3 + [MIN_MOMENT] * 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.abs(s_mean) >= floor, -m_mean / s_mean, np.nan)
+
+
+def mapping_matrix(master, slave):
+    """返回 (T, rank)：F_master ≈ -T @ F_slave 的最小范数最小二乘解。"""
+    master = np.asarray(master, dtype=np.float64)
+    slave = np.asarray(slave, dtype=np.float64)
+    # 按行: master[n] = -slave[n] @ T^T  => lstsq(slave, -master) 得到 T^T
+    coef, _, rank, _ = np.linalg.lstsq(slave, -master, rcond=1e-3)
+    return coef.T, int(rank)
+
+
+def cross_leakage(master, slave, contact_idx):
+    """返回 (各力轴泄漏比, 合成泄漏比)：|mean F_master_j| / |mean F_slave_k|，j 为非接触力轴。"""
+    m_mean = np.asarray(master, dtype=np.float64)[:, :3].mean(axis=0)
+    s_k = abs(float(np.asarray(slave, dtype=np.float64)[:, contact_idx].mean()))
+    if s_k < MIN_FORCE:
+        return np.full(3, np.nan), float("nan")
+    leak = np.abs(m_mean) / s_k
+    leak[contact_idx] = 0.0
+    return leak, float(np.sqrt((leak ** 2).sum()))
+
+
+def analyze(master, slave, contact_idx):
+    ratios = axis_ratios(master, slave)
+    matrix, rank = mapping_matrix(master, slave)
+    leak, total = cross_leakage(master, slave, contact_idx)
+    return WrenchTransparency(WRENCH_AXES[contact_idx], ratios, matrix, rank, leak, total)
+
+
+def matrix_rows(title, matrix):
+    """6x6 矩阵的 CSV 行 (含表头)。"""
+    rows = [[title] + [f"S_{a}" for a in WRENCH_AXES]]
+    for a, row in zip(WRENCH_AXES, matrix):
+        rows.append([f"M_{a}"] + [f"{x:.4f}" for x in row])
+    return rows